@@ -11,6 +11,7 @@ import os
 import pprint
 import subprocess
 import sys
+import threading
 
 
 logger = logging.getLogger(__name__)
@@ -36,13 +37,61 @@ def redirect_stderr(target):
     sys.stderr = sys.__stderr__
 
 
+class _ThreadStream(object):
+    """
+    Stream that forwards to the target redirected by the current thread, or to
+    the stream that was in place before the first redirect
+    """
+    targets = threading.local()
+
+    def __init__(self, name, original):
+        self.name = name
+        self.original = original
+
+    def target(self):
+        """
+        Returns the stream of the current thread
+        """
+        target = getattr(self.targets, self.name, None)
+        if target is None:
+            return self.original
+        return target
+
+    def __getattr__(self, attr):
+        return getattr(self.target(), attr)
+
+
+_REDIRECT_LOCK = threading.Lock()
+_REDIRECTS = []
+_STREAMS = {}
+
+
 @contextlib.contextmanager
-def redirect_output(out, err):
-    sys.stdout = out
-    sys.stderr = err
-    yield
-    sys.stdout = sys.__stdout__
-    sys.stderr = sys.__stderr__
+def redirect_output(out, err=None):
+    """
+    Redirects the stdout and stderr of the current thread to the target
+    channels, other threads keep their own output. A None channel is not
+    redirected.
+    """
+    with _REDIRECT_LOCK:
+        if not _REDIRECTS:
+            _STREAMS['stdout'] = sys.stdout = _ThreadStream('stdout', sys.stdout)
+            _STREAMS['stderr'] = sys.stderr = _ThreadStream('stderr', sys.stderr)
+        _REDIRECTS.append(out)
+    prev_out = getattr(_ThreadStream.targets, 'stdout', None)
+    prev_err = getattr(_ThreadStream.targets, 'stderr', None)
+    _ThreadStream.targets.stdout = out
+    _ThreadStream.targets.stderr = err
+    try:
+        yield
+    finally:
+        _ThreadStream.targets.stdout = prev_out
+        _ThreadStream.targets.stderr = prev_err
+        with _REDIRECT_LOCK:
+            _REDIRECTS.pop()
+            if not _REDIRECTS:
+                sys.stdout = _STREAMS['stdout'].original
+                sys.stderr = _STREAMS['stderr'].original
 
 
 def check_root_privileges():
@@ -15,3 +15,10 @@ class Config(object):
 
     # the log verbosity level
     LOG_LEVEL = "info"
+
+    # the directory where rendered stages are cached, empty to disable
+    STEPS_CACHE_DIR = "/var/cache/deepsea/cli"
+
+    # the maximum age in seconds of a cached rendering, short because runners
+    # called from the sls files may return something else at any time
+    STEPS_CACHE_TTL = 300
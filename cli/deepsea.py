@@ -18,7 +18,8 @@ import click
 
 from .config import Config
 from .common import PrettyPrinter as PP, PrettyFormat as PF
-from .common import requires_root_privileges, clean_pyc_files
+from .common import requires_root_privileges, clean_pyc_files, redirect_stdout
+from .event_recorder import EventRecorder, EventReplayer
 from .monitor import Monitor
 from .monitors.terminal_outputter import StepListPrinter, SimplePrinter
 from .stage_executor import run_stage
@@ -60,13 +61,17 @@ def _setup_logging():
     })
 
 
-def _run_monitor(show_state_steps, show_dynamic_steps, simple_output):
+def _run_monitor(show_state_steps, show_dynamic_steps, simple_output, record=None):
     """
     Run the DeepSea stage monitor and progress visualizer
     """
     mon = Monitor(show_state_steps, show_dynamic_steps)
     listener = SimplePrinter() if simple_output else StepListPrinter()
     mon.add_listener(listener)
+    recorder = None
+    if record:
+        recorder = EventRecorder(record)
+        mon.record(recorder)
 
     logger = logging.getLogger(__name__)
 
@@ -108,6 +113,59 @@ def _run_monitor(show_state_steps, show_dynamic_steps, simple_output):
         while mon.is_running():
             time.sleep(2)
         mon.wait_to_finish()
+    if recorder:
+        recorder.close()
+
+
+class _NullOutput(object):
+    """
+    Output stream that only counts what is written to it
+    """
+    encoding = 'utf-8'
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text)
+
+    def flush(self):
+        pass
+
+
+def _run_replay(recording, speed, show_state_steps, show_dynamic_steps, simple_output,
+                benchmark):
+    """
+    Run the DeepSea stage monitor on a recorded stage execution
+    """
+    mon = Monitor(show_state_steps, show_dynamic_steps)
+    if simple_output:
+        listener = SimplePrinter()
+    else:
+        listener = StepListPrinter(not benchmark)
+    mon.add_listener(listener)
+
+    times = os.times()
+    if benchmark:
+        # headless, the output is discarded and only measured
+        output = _NullOutput()
+        with redirect_stdout(output):
+            stats = mon.replay(EventReplayer(recording), speed)
+    else:
+        stats = mon.replay(EventReplayer(recording), speed)
+    cpu = sum(os.times()[:2]) - sum(times[:2])
+
+    PP.println()
+    PP.println("Replayed {} events in {}s ({} events/s), cpu time {}s"
+               .format(stats['events'], round(stats['seconds'], 3),
+                       round(stats['rate'], 1) if stats['rate'] else "-", round(cpu, 3)))
+    PP.println("Event lag: max {}s in the monitor, max {}s behind the recording"
+               .format(round(stats['lag']['max'], 3), round(stats['behind'], 3)))
+    if benchmark:
+        PP.println("Output: {} bytes".format(output.bytes))
+    if isinstance(listener, StepListPrinter):
+        PP.println("Frames: {frames} drawn, {lines} lines written, {unchanged} lines unchanged"
+                   .format(**listener.stats))
 
 
 def _validate_stage_file_exists(stage_name):
@@ -266,8 +324,10 @@ def cli(log_level, log_file):
 @click.option('--show-state-steps', is_flag=True, help="shows state visible steps progress")
 @click.option('--show-dynamic-steps', is_flag=True, help="shows runtime generated steps")
 @click.option('--simple-output', is_flag=True, help="minimalistic b&w output")
+@click.option('--record', type=click.Path(dir_okay=False),
+              help="record the events to a file that can be replayed")
 @requires_root_privileges
-def monitor(show_state_steps, show_dynamic_steps, simple_output):
+def monitor(show_state_steps, show_dynamic_steps, simple_output, record):
     """
     Starts DeepSea progress monitor.
 
@@ -275,7 +335,29 @@ def monitor(show_state_steps, show_dynamic_steps, simple_output):
     using salt-run commands in other terminal sessions.
     """
     _setup_logging()
-    _run_monitor(show_state_steps, show_dynamic_steps, simple_output)
+    _run_monitor(show_state_steps, show_dynamic_steps, simple_output, record)
+
+
+@click.command(name='replay')
+@click.argument('recording', type=click.Path(exists=True, dir_okay=False))
+@click.option('--speed', default=1.0, type=float,
+              help="replay speed factor, 0 replays as fast as possible (default: 1)")
+@click.option('--show-state-steps', is_flag=True, help="shows state visible steps progress")
+@click.option('--show-dynamic-steps', is_flag=True, help="shows runtime generated steps")
+@click.option('--simple-output', is_flag=True, help="minimalistic b&w output")
+@click.option('--benchmark', is_flag=True,
+              help="discard the output and only report the rendering statistics")
+def replay(recording, speed, show_state_steps, show_dynamic_steps, simple_output, benchmark):
+    """
+    Replays a recorded stage execution.
+
+    This runs the progress monitor on the events recorded with
+    "monitor --record" or "stage run --record", without a Salt master, and
+    reports the event throughput and lag.
+    """
+    _setup_logging()
+    _run_replay(recording, speed, show_state_steps, show_dynamic_steps, simple_output,
+                benchmark)
 
 
 @click.group(short_help='stage related commands')
@@ -310,8 +392,10 @@ def stage_dryrun(stage_name, hide_state_steps, only_visible_steps, clear_cache):
 @click.option('--hide-state-steps', is_flag=True, help="shows state visible steps progress")
 @click.option('--hide-dynamic-steps', is_flag=True, help="shows runtime generated steps")
 @click.option('--simple-output', is_flag=True, help="minimalistic b&w output")
+@click.option('--record', type=click.Path(dir_okay=False),
+              help="record the events to a file that can be replayed")
 @requires_root_privileges
-def stage_run(stage_name, hide_state_steps, hide_dynamic_steps, simple_output):
+def stage_run(stage_name, hide_state_steps, hide_dynamic_steps, simple_output, record):
     """
     Runs a DeepSea stage
 
@@ -323,7 +407,7 @@ def stage_run(stage_name, hide_state_steps, hide_dynamic_steps, simple_output):
     _setup_logging()
     _validate_stage_file_exists(stage_name)
 
-    ret = run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output)
+    ret = run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output, record)
     PP.flush()
     sys.exit(ret)
 
@@ -362,6 +446,7 @@ def main():
     CLI main function
     """
     cli.add_command(monitor)
+    cli.add_command(replay)
     cli.add_command(stage)
     cli.add_command(salt_run)
     stage.add_command(stage_dryrun)
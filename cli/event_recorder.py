@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Recording and replay of the Salt events seen by the DeepSea monitor
+
+A recording is a gzip compressed stream of pickled (timestamp, tag, data)
+records. Besides the raw Salt events it also stores the stage renderings, so
+that a recording can be replayed on a machine without a Salt master:
+
+    $ deepsea monitor --record /tmp/stage3.rec
+    $ deepsea replay /tmp/stage3.rec --speed 0
+
+Only replay recordings you trust, they are loaded with pickle.
+"""
+from __future__ import absolute_import
+
+import gzip
+import logging
+import pickle
+import threading
+import time
+
+from .stage_parser import StepsCache, StageRenderingException, StateRenderingException
+
+
+# pylint: disable=C0103
+logger = logging.getLogger(__name__)
+
+# the tag of the records that hold a stage or state rendering
+RENDER_TAG = 'deepsea/cli/render'
+
+
+def read_records(path):
+    """
+    Yields the (timestamp, tag, data) records of a recording
+    """
+    with gzip.open(path, 'rb') as rec_file:
+        while True:
+            try:
+                yield pickle.load(rec_file)
+            except EOFError:
+                return
+
+
+class EventRecorder(object):
+    """
+    Writes the Salt events and the stage renderings to a recording
+    """
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = gzip.open(path, 'wb')
+        self._lock = threading.Lock()
+
+    def record(self, tag, data, stamp=None):
+        """
+        Appends a record, events arrive in the Salt event thread while
+        renderings happen in the monitor and rendering threads
+        Args:
+            tag (str): the Salt event tag
+            data (dict): the Salt event data
+            stamp (float): the time the event was received, defaults to now
+        """
+        if stamp is None:
+            stamp = time.time()
+        with self._lock:
+            if self._file is None:
+                return
+            pickle.dump((stamp, tag, data), self._file, 2)
+            self.count += 1
+
+    def record_render(self, state_name, target, result):
+        """
+        Appends the result of SLSRenderer.render
+        """
+        self.record(RENDER_TAG, {'names': StepsCache.names(state_name),
+                                 'target': target,
+                                 'result': result})
+
+    def close(self):
+        """
+        Flushes and closes the recording
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        logger.info("recorded %s events to %s", self.count, self.path)
+
+
+class EventReplayer(object):
+    """
+    Feeds the events of a recording to a SaltEventProcessor and provides the
+    recorded renderings to SLSRenderer
+    """
+    def __init__(self, path):
+        self.path = path
+        self.renders = {}
+        for _, tag, data in read_records(path):
+            if tag == RENDER_TAG:
+                key = (tuple(data['names']), data['target'])
+                self.renders[key] = data['result']
+
+    def render(self, state_name, target=None):
+        """
+        Returns the recorded rendering with the same result as
+        SLSRenderer.render
+        """
+        key = (tuple(StepsCache.names(state_name)), target)
+        if key not in self.renders:
+            error = ["{} was not rendered in {}".format(state_name, self.path)]
+            if target:
+                raise StateRenderingException(target, state_name, error)
+            raise StageRenderingException(state_name, error)
+        return self.renders[key]
+
+    def replay(self, processor, speed=1.0):
+        """
+        Processes the recorded events
+        Args:
+            processor (SaltEventProcessor): the processor of the events
+            speed (float): the speed factor of the recorded timing, 0 feeds
+                           the events as fast as possible
+        Returns:
+            dict: the number of events, the seconds it took, the events per
+                  second, and the maximum delay behind the recorded timing
+        """
+        count = 0
+        behind = 0.0
+        start = time.time()
+        first = None
+        for stamp, tag, data in read_records(self.path):
+            if tag == RENDER_TAG:
+                continue
+            if speed:
+                if first is None:
+                    first = stamp
+                delay = start + (stamp - first) / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    behind = max(behind, -delay)
+            # pylint: disable=W0212
+            processor._process({'tag': tag, 'data': data})
+            count += 1
+        seconds = time.time() - start
+        return {'events': count,
+                'seconds': seconds,
+                'rate': count / seconds if seconds > 0 else None,
+                'behind': behind}
@@ -6,9 +6,13 @@ DeepSea stage's progress monitor
 from __future__ import absolute_import
 from __future__ import print_function
 
+import calendar
+import datetime
 import logging
 import operator
 import threading
+import time
+from collections import deque, OrderedDict
 from functools import reduce
 
 from six.moves import range
@@ -17,8 +21,8 @@ from .common import PrettyPrinter as PP
 from .salt_event import SaltEventProcessor
 from .salt_event import EventListener
 from .salt_event import NewJobEvent, NewRunnerEvent, RetJobEvent, RetRunnerEvent
-from .stage_parser import SLSParser, SaltRunner, SaltState, SaltStateFunction, \
-                          SaltExecutionFunction, RenderingException
+from .stage_parser import SLSParser, SLSRenderer, SaltRunner, SaltState, \
+                          SaltStateFunction, SaltExecutionFunction, RenderingException
 
 
 # pylint: disable=C0111
@@ -436,6 +440,18 @@ class MonitorListener(object):
         """
         pass
 
+    def step_state_results(self, step, events):
+        """
+        This function is called with the Salt state results of a step that
+        were received together. By default it calls step_state_result for each
+        one, listeners that only redraw the step may override it.
+        Args:
+            step (Stage.TargetedStep): the step upon these state results were stored
+            events (list): the saltevent.StateResultEvent objects
+        """
+        for event in events:
+            self.step_state_result(step, event)
+
     def step_state_finished(self, step):
         """
         This function is called when a Salt state finishes executing in all targets
@@ -463,6 +479,7 @@ class Monitor(threading.Thread):
             self.monitor = monitor
             self.func = func
             self.event = event
+            self.received = time.time()
 
         def call(self):
             logger.debug("handle: %s", self.event)
@@ -472,12 +489,23 @@ class Monitor(threading.Thread):
         """
         Salt event listener for DeepSea
         """
+        JOB_HANDLERS = ('handle_new_job_event', 'handle_ret_job_event')
+
         def __init__(self, monitor):
             self.monitor = monitor
 
+        def accepts(self, handler, data):
+            if handler == 'handle_state_result_event':
+                # pylint: disable=W0212
+                return self.monitor._show_state_steps
+            fun = data.get('fun') or ''
+            if 'pillar' in fun or 'saltutil.find_job' in fun:
+                return False
+            if handler in self.JOB_HANDLERS:
+                return 'grains' not in fun and fun != 'deepsea.render_sls'
+            return True
+
         def handle_new_runner_event(self, event):
-            if 'pillar' in event.fun or 'saltutil.find_job' in event.fun:
-                return
             logger.debug("buffer: %s", event)
             if event.fun == 'runner.state.orch':
                 self.monitor.append_event(Monitor.Event(self.monitor, 'start_stage', event))
@@ -485,8 +513,6 @@ class Monitor(threading.Thread):
                 self.monitor.append_event(Monitor.Event(self.monitor, 'start_step', event))
 
         def handle_ret_runner_event(self, event):
-            if 'pillar' in event.fun or 'saltutil.find_job' in event.fun:
-                return
             logger.debug("buffer: %s", event)
             if event.fun == 'runner.state.orch':
                 self.monitor.append_event(Monitor.Event(self.monitor, 'end_stage', event))
@@ -494,18 +520,10 @@ class Monitor(threading.Thread):
                 self.monitor.append_event(Monitor.Event(self.monitor, 'end_step', event))
 
         def handle_new_job_event(self, event):
-            if 'pillar' in event.fun or 'saltutil.find_job' in event.fun or 'grains' in event.fun:
-                return
-            if event.fun == 'deepsea.render_sls':
-                return
             logger.debug("buffer: %s", event)
             self.monitor.append_event(Monitor.Event(self.monitor, 'start_step', event))
 
         def handle_ret_job_event(self, event):
-            if 'pillar' in event.fun or 'saltutil.find_job' in event.fun or 'grains' in event.fun:
-                return
-            if event.fun == 'deepsea.render_sls':
-                return
             logger.debug("buffer: %s", event)
             self.monitor.append_event(Monitor.Event(self.monitor, 'end_step', event))
 
@@ -523,9 +541,12 @@ class Monitor(threading.Thread):
         self._monitor_listeners = []
         self._event_lock = threading.Lock()
         self._event_cond = threading.Condition(self._event_lock)
-        self._event_buffer = []
+        self._event_buffer = deque()
         self._running = False
+        self._draining = False
         self._stage_steps = {}
+        self._lag = {'events': 0, 'batches': 0, 'last': 0.0, 'max': 0.0,
+                     'bus_last': None, 'bus_max': None}
 
     def parse_stage(self, stage_name):
         self._fire_event('stage_started', stage_name)
@@ -549,6 +570,7 @@ class Monitor(threading.Thread):
         Start the monitoring thread
         """
         logger.info("Starting the DeepSea event monitoring")
+        self._running = True
         self._processor.start()
         super(Monitor, self).start()
 
@@ -557,7 +579,9 @@ class Monitor(threading.Thread):
         Stop the monitoring thread
         """
         logger.info("Stopping the DeepSea event monitoring")
-        self._running = False
+        with self._event_cond:
+            self._running = False
+            self._event_cond.notify()
         self._processor.stop()
 
         if wait:
@@ -577,14 +601,92 @@ class Monitor(threading.Thread):
         return self._processor.is_running() and self._running
 
     def run(self):
-        self._running = True
-        while self._running:
+        while True:
             with self._event_cond:
-                if self._event_buffer:
-                    event = self._event_buffer.pop(0)
-                    event.call()
-                else:
-                    self._event_cond.wait(0.2)
+                while self._running and not self._event_buffer and not self._draining:
+                    self._event_cond.wait()
+                if not self._running or not self._event_buffer:
+                    break
+                batch = self._event_buffer
+                self._event_buffer = deque()
+            # listeners may take a while to render, handle the batch without
+            # holding the lock so that the Salt event thread is never blocked
+            self._handle_batch(batch)
+
+    def _handle_batch(self, batch):
+        """
+        Calls the handler of each event in order, passing consecutive state
+        results to state_result_steps together
+        """
+        results = []
+        for event in batch:
+            if event.func == 'state_result_step':
+                results.append(event.event)
+                continue
+            if results:
+                self.state_result_steps(results)
+                results = []
+            event.call()
+        if results:
+            self.state_result_steps(results)
+        self._track_lag(batch)
+
+    def _track_lag(self, batch):
+        """
+        Records how long the events of a batch waited in the buffer and how
+        far behind the Salt event bus the last one was handled
+        """
+        now = time.time()
+        lag = now - batch[0].received
+        self._lag['events'] += len(batch)
+        self._lag['batches'] += 1
+        self._lag['last'] = lag
+        self._lag['max'] = max(self._lag['max'], lag)
+        bus_lag = _stamp_age(batch[-1].event.stamp, now)
+        if bus_lag is not None:
+            self._lag['bus_last'] = bus_lag
+            self._lag['bus_max'] = max(self._lag['bus_max'] or 0.0, bus_lag)
+        logger.debug("handled %s events, lag=%.3fs bus lag=%s", len(batch), lag,
+                     bus_lag)
+
+    def lag(self):
+        """
+        Returns the event lag statistics: the number of events and batches
+        handled, the last and maximum time events waited in the buffer, and
+        the last and maximum delay since Salt fired the event
+        """
+        return dict(self._lag)
+
+    def record(self, recorder):
+        """
+        Stores the Salt events and the stage renderings in a recording
+        Args:
+            recorder (event_recorder.EventRecorder): the recorder object
+        """
+        self._processor.recorder = recorder
+        SLSRenderer.recorder = recorder
+
+    def replay(self, replayer, speed=1.0):
+        """
+        Runs the monitor on the events of a recording instead of the Salt
+        event bus. Blocks until every event is handled.
+        Args:
+            replayer (event_recorder.EventReplayer): the recording
+            speed (float): the speed factor, 0 replays as fast as possible
+        Returns:
+            dict: the replay statistics, including the monitor event lag
+        """
+        SLSRenderer.replayer = replayer
+        self._running = True
+        super(Monitor, self).start()
+        stats = replayer.replay(self._processor, speed)
+        with self._event_cond:
+            # let the monitor thread handle the remaining events and exit
+            self._draining = True
+            self._event_cond.notify()
+        self.join()
+        stats['lag'] = self.lag()
+        return stats
 
     def add_listener(self, listener):
         """
@@ -639,6 +741,9 @@ class Monitor(threading.Thread):
         tmp_stage = self._running_stage
         self._running_stage = None
         logger.info("End stage: %s jid=%s success=%s", tmp_stage.name, tmp_stage.jid, event.success)
+        logger.info("Event lag: events=%s batches=%s max=%.3fs bus max=%ss",
+                    self._lag['events'], self._lag['batches'], self._lag['max'],
+                    self._lag['bus_max'])
         self._fire_event('stage_finished', tmp_stage)
 
     def start_step(self, event):
@@ -750,3 +855,41 @@ class Monitor(threading.Thread):
             return
         logger.info("State Result: %s: %s result=%s", event.state_id, event.name, event.result)
         self._fire_event('step_state_result', step, event)
+
+    def state_result_steps(self, events):
+        """
+        Handles a batch of state results. Repeated results of the same state
+        only keep the latest one, and each step is notified once.
+        """
+        if not self._show_state_steps:
+            return
+        if not self._running_stage:
+            # not inside a running stage, igore step
+            return
+        latest = OrderedDict()
+        for event in events:
+            latest[(event.jid, event.minion, event.state_id, event.name)] = event
+        notify = []
+        for event in latest.values():
+            step = self._running_stage.state_result_step(event)
+            if not step:
+                continue
+            logger.info("State Result: %s: %s result=%s", event.state_id, event.name,
+                        event.result)
+            if notify and notify[-1][0] is step:
+                notify[-1][1].append(event)
+            else:
+                notify.append((step, [event]))
+        for step, step_events in notify:
+            self._fire_event('step_state_results', step, step_events)
+
+
+def _stamp_age(stamp, now):
+    """
+    Returns the seconds elapsed since a Salt event _stamp, which is in UTC
+    """
+    try:
+        fired = datetime.datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%f")
+    except (TypeError, ValueError):
+        return None
+    return now - calendar.timegm(fired.timetuple()) - fired.microsecond / 1e6
@@ -13,7 +13,7 @@ import re
 import threading
 import time
 
-from ..common import PrettyPrinter as PP, check_terminal_utf8_support
+from ..common import PrettyPrinter as PP, check_terminal_utf8_support, redirect_output
 from ..monitor import MonitorListener
 from ..stage_parser import StateRenderingException
 
@@ -339,11 +339,6 @@ class StepListPrinter(MonitorListener):
 
         desc_width = step_desc_width - (offset - step_order_width)
 
-        if not step.reprint:
-            step.reprint = True
-        elif depth == 0:
-            step.clean(desc_width)
-
         if depth == 0:
             PP.print(PP.bold("{}{} ".format(step_order, " " * rest)))
         else:
@@ -378,7 +373,6 @@ class StepListPrinter(MonitorListener):
             self.printer = printer
             self.step = step
             self.finished = False
-            self.reprint = False
             self.substeps = OrderedDict()
             self.args = step.args_str
             if step.start_event:
@@ -418,16 +412,6 @@ class StepListPrinter(MonitorListener):
             """
             Prints the status of a step
             """
-            # if not self.reprint:
-            #     self.reprint = True
-            # else:
-            #     self.clean(desc_width)
-
-        def clean(self, desc_width):
-            """
-            Prepare for re-print of step
-            """
-            raise NotImplementedError()
 
         @staticmethod
         def ftime(tr):
@@ -436,14 +420,6 @@ class StepListPrinter(MonitorListener):
             return "{}s".format(round(tr.seconds+tr.microseconds/1000000.0, 1))
 
     class Runner(Step):
-        def clean(self, desc_width):
-            for substep in self.substeps.values():
-                if substep.reprint:
-                    substep.clean(desc_width-5)
-            PP.print("\x1B[A\x1B[K")
-            if self.args and len(self.step.name) + len(self.args)+2 >= desc_width:
-                PP.print("\x1B[A\x1B[K" * len(SP.format_desc(self.args, desc_width)))
-
         def print(self, offset, desc_width, depth):
             super(SP.Runner, self).print(offset, desc_width, depth)
 
@@ -494,21 +470,6 @@ class StepListPrinter(MonitorListener):
                 self.printer.print_step(substep, depth+1)
 
     class State(Step):
-        def clean(self, desc_width):
-            if self.args and len(self.step.name) + len(self.args) + 5 >= desc_width:
-                PP.print("\x1B[A\x1B[K" * len(SP.format_desc(self.args, desc_width)))
-
-            if self.step.skipped:
-                PP.print("\x1B[A\x1B[K")
-            else:
-                for substep in self.substeps.values():
-                    if substep.reprint:
-                        substep.clean(desc_width-5)
-
-                for target in self.step.targets.values():
-                    PP.print("\x1B[A\x1B[K" * (len(target['states'])+1))
-                PP.print("\x1B[A\x1B[K")
-
         def print(self, offset, desc_width, depth):
             super(SP.State, self).print(offset, desc_width, depth)
 
@@ -582,6 +543,57 @@ class StepListPrinter(MonitorListener):
                     else:
                         PP.println(SP.WAITING)
 
+    class Frame(object):
+        """
+        The lines of the step being printed, as they were last written to the
+        terminal. Only the lines that changed since are written again.
+        """
+        def __init__(self):
+            self.lines = []
+
+        def update(self, lines):
+            """
+            Returns the terminal output that turns the previous lines into the
+            new ones, and the number of lines it writes
+            """
+            output = []
+            written = 0
+            skip = 0
+            if self.lines:
+                # back to the first line of the frame
+                output.append("\x1B[{}A".format(len(self.lines)))
+            for idx, line in enumerate(lines):
+                if idx < len(self.lines) and self.lines[idx] == line:
+                    skip += 1
+                    continue
+                if skip:
+                    output.append("\x1B[{}B".format(skip))
+                    skip = 0
+                output.append(u"\r\x1B[K{}\n".format(line))
+                written += 1
+            if skip:
+                output.append("\x1B[{}B".format(skip))
+            if len(lines) < len(self.lines):
+                output.append("\r\x1B[J")
+            self.lines = lines
+            return u"".join(output), written
+
+    class Collector(object):
+        """
+        Stream that keeps the text written to it
+        """
+        def __init__(self):
+            self.parts = []
+
+        def write(self, text):
+            self.parts.append(text)
+
+        def flush(self):
+            pass
+
+        def lines(self):
+            return u"".join(self.parts).split(u"\n")[:-1]
+
     class PrinterThread(threading.Thread):
         def __init__(self, printer):
             super(StepListPrinter.PrinterThread, self).__init__()
@@ -590,20 +602,34 @@ class StepListPrinter(MonitorListener):
             self.running = True
 
         def stop(self):
-            self.running = False
+            with self.printer.print_cond:
+                self.running = False
+                self.printer.print_cond.notify()
             self.join()
 
         def run(self):
             self.running = True
             PP.print("\x1B[?25l")  # hides cursor
-            while self.running:
-                time.sleep(0.5)
-                with self.printer.print_lock:
+            while True:
+                with self.printer.print_cond:
+                    if self.running and not self.printer.dirty:
+                        # wait for changes, or for the running time to tick
+                        self.printer.print_cond.wait(SP.TICK)
+                    if not self.running:
+                        break
                     if self.printer.step:
-                        self.printer.print_step(self.printer.step)
+                        self.printer.draw()
+                # changes arriving meanwhile are drawn together in the next frame
+                time.sleep(1.0 / SP.REFRESH_RATE)
 
             PP.print("\x1B[?25h")  # shows cursor
 
+    # maximum number of frames drawn per second
+    REFRESH_RATE = 10
+
+    # seconds between frames of a step without changes, to update its running time
+    TICK = 0.5
+
     def __init__(self, clear_screen=True):
         super(StepListPrinter, self).__init__()
         self._clear_screen = clear_screen
@@ -614,9 +640,47 @@ class StepListPrinter(MonitorListener):
         self.step = None
         self.thread = None
         self.print_lock = threading.Lock()
+        self.print_cond = threading.Condition(self.print_lock)
+        self.frame = None
+        self.dirty = False
+        self.stats = {'frames': 0, 'lines': 0, 'unchanged': 0, 'bytes': 0}
         self.init_output = None
         self.init_output_printed = False
 
+    def draw(self):
+        """
+        Writes the lines of the current step that changed since the last frame.
+        Must be called with print_lock held.
+        """
+        collector = SP.Collector()
+        with redirect_output(collector):
+            self.print_step(self.step)
+        lines = collector.lines()
+        output, written = self.frame.update(lines)
+        self.dirty = False
+        self.stats['frames'] += 1
+        self.stats['lines'] += written
+        self.stats['unchanged'] += len(lines) - written
+        if output:
+            self.stats['bytes'] += len(output)
+            PP.print(output)
+
+    def damage(self):
+        """
+        Schedules a redraw of the current step. Must be called with print_lock
+        held.
+        """
+        self.dirty = True
+        self.print_cond.notify()
+
+    def _start_frame(self, step):
+        """
+        Starts printing a new step below the previous ones
+        """
+        self.step = step
+        self.frame = SP.Frame()
+        self.draw()
+
     def stage_started(self, stage_name):
         if self._clear_screen:
             os.system('clear')
@@ -795,8 +859,8 @@ class StepListPrinter(MonitorListener):
             if self.step:
                 # substep starting
                 self.step.start_runner_substep(step)
+                self.damage()
             else:
-                self.step = SP.Runner(self, step)
                 if step.order == 1:
                     PP.println()
                     # first step, need to output initialization stdout
@@ -807,7 +871,7 @@ class StepListPrinter(MonitorListener):
                     PP.println()
                 elif step.order > 1:
                     PP.println()
-            self.print_step(self.step)
+                self._start_frame(SP.Runner(self, step))
 
     def step_runner_finished(self, step):
         if step.order > 0 and not step.success:
@@ -819,9 +883,10 @@ class StepListPrinter(MonitorListener):
                 # maybe it's a substep
                 if not self.step.finish_substep(step):
                     logger.error("substep jid=%s not found: event=\n%s", step.jid, step.end_event)
+                self.damage()
             elif self.step:
                 self.step.finished = True
-                self.print_step(self.step)
+                self.draw()
                 self.step = None
 
     def step_runner_skipped(self, step):
@@ -833,8 +898,8 @@ class StepListPrinter(MonitorListener):
         with self.print_lock:
             if self.step:
                 self.step.start_state_substep(step)
+                self.damage()
             else:
-                self.step = SP.State(self, step)
                 if step.order == 1:
                     PP.println()
                     # first step, need to output initialization stdout
@@ -845,7 +910,7 @@ class StepListPrinter(MonitorListener):
                     PP.println()
                 elif step.order > 1:
                     PP.println()
-            self.print_step(self.step)
+                self._start_frame(SP.State(self, step))
 
     def step_state_minion_finished(self, step, minion):
         if step.order > 0 and not step.targets[minion]['success']:
@@ -858,20 +923,22 @@ class StepListPrinter(MonitorListener):
                 # maybe it's a substep
                 if not self.step.finish_substep(step):
                     logger.error("substep jid=%s not found: event=\n%s", step.jid, step.end_event)
+                self.damage()
             elif self.step:
-                self.print_step(self.step)
+                self.damage()
 
     def step_state_finished(self, step):
         with self.print_lock:
             if self.step and self.step.step.jid == step.jid:
                 self.step.finished = True
+                self.draw()
                 self.step = None
 
     def step_state_result(self, step, event):
         with self.print_lock:
             assert self.step
             assert isinstance(self.step, StepListPrinter.State)
-            self.print_step(self.step)
+            self.damage()
 
     def step_state_skipped(self, step):
         # the step_state_started already handles skipped steps
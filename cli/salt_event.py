@@ -4,7 +4,6 @@ Salt Event Processor module
 """
 from __future__ import absolute_import
 
-import fnmatch
 import logging
 import threading
 
@@ -120,6 +119,14 @@ class EventListener(object):
     This class represents a listener object that listens to particular Salt events.
     """
 
+    def accepts(self, handler, data):
+        """Checks whether the listener wants an event, before the event object is built
+        Args:
+            handler (str): the name of the handler the event is routed to
+            data (dict): the raw event data
+        """
+        return True
+
     def handle_salt_event(self, event):
         """Handle generic salt event
         Args:
@@ -163,6 +170,32 @@ class EventListener(object):
         pass
 
 
+# (second tag field, fourth tag field, has fifth field) -> event class, handler
+ROUTES = {
+    ('job', 'new', False): (NewJobEvent, 'handle_new_job_event'),
+    ('job', 'ret', True): (RetJobEvent, 'handle_ret_job_event'),
+    ('run', 'new', False): (NewRunnerEvent, 'handle_new_runner_event'),
+    ('run', 'ret', False): (RetRunnerEvent, 'handle_ret_runner_event'),
+}
+
+STATE_RESULT_ROUTE = (StateResultEvent, 'handle_state_result_event')
+
+
+def route(tag):
+    """
+    Returns the (event class, handler name) of a Salt event tag, or None for
+    the events we don't handle
+    """
+    parts = tag.split('/', 4)
+    if len(parts) < 3 or parts[0] != 'salt':
+        return None
+    if parts[1] == 'state_result':
+        return STATE_RESULT_ROUTE
+    if len(parts) < 4:
+        return None
+    return ROUTES.get((parts[1], parts[3], len(parts) == 5))
+
+
 class SaltEventProcessor(threading.Thread):
     """
     This class implements an execution loop to listen for the Salt event BUS.
@@ -173,6 +206,8 @@ class SaltEventProcessor(threading.Thread):
         self.listeners = []
         self.io_loop = None
         self.event = threading.Event()
+        self.recorder = None
+        self._handlers = {}
 
     def add_listener(self, listener):
         """Adds an event listener to the listener list
@@ -180,6 +215,9 @@ class SaltEventProcessor(threading.Thread):
             listener (EventListener): the listener object
         """
         self.listeners.append(listener)
+        for _, handler in list(ROUTES.values()) + [STATE_RESULT_ROUTE]:
+            self._handlers.setdefault(handler, []).append(
+                (listener.accepts, listener.handle_salt_event, getattr(listener, handler)))
 
     def is_running(self):
         """
@@ -218,6 +256,8 @@ class SaltEventProcessor(threading.Thread):
         Handles the asynchronous reception of raw events
         """
         mtag, data = salt.utils.event.SaltEvent.unpack(raw)
+        if self.recorder is not None:
+            self.recorder.record(mtag, data)
         self._process({'tag': mtag, 'data': data})
 
     def _process(self, event):
@@ -228,30 +268,16 @@ class SaltEventProcessor(threading.Thread):
         Args:
             event (dict): the raw event data
         """
-        logger.debug("Process event -> %s", event)
+        target = route(event['tag'])
+        if target is None:
+            return
+        wrapper_class, handler = target
         wrapper = None
-        if fnmatch.fnmatch(event['tag'], 'salt/job/*/new'):
-            wrapper = NewJobEvent(event)
-            for listener in self.listeners:
-                listener.handle_salt_event(wrapper)
-                listener.handle_new_job_event(wrapper)
-        elif fnmatch.fnmatch(event['tag'], 'salt/run/*/new'):
-            wrapper = NewRunnerEvent(event)
-            for listener in self.listeners:
-                listener.handle_salt_event(wrapper)
-                listener.handle_new_runner_event(wrapper)
-        elif fnmatch.fnmatch(event['tag'], 'salt/job/*/ret/*'):
-            wrapper = RetJobEvent(event)
-            for listener in self.listeners:
-                listener.handle_salt_event(wrapper)
-                listener.handle_ret_job_event(wrapper)
-        elif fnmatch.fnmatch(event['tag'], 'salt/run/*/ret'):
-            wrapper = RetRunnerEvent(event)
-            for listener in self.listeners:
-                listener.handle_salt_event(wrapper)
-                listener.handle_ret_runner_event(wrapper)
-        elif fnmatch.fnmatch(event['tag'], 'salt/state_result/*'):
-            wrapper = StateResultEvent(event)
-            for listener in self.listeners:
-                listener.handle_salt_event(wrapper)
-                listener.handle_state_result_event(wrapper)
+        for accepts, handle_salt_event, handle_event in self._handlers.get(handler, []):
+            if not accepts(handler, event['data']):
+                continue
+            if wrapper is None:
+                logger.debug("Process event -> %s", event)
+                wrapper = wrapper_class(event)
+            handle_salt_event(wrapper)
+            handle_event(wrapper)
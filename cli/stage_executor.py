@@ -20,6 +20,7 @@ import time
 import sys
 
 from .common import clean_pyc_files
+from .event_recorder import EventRecorder
 from .monitor import Monitor
 from .monitors.terminal_outputter import SimplePrinter, StepListPrinter
 from .stage_parser import RenderingException
@@ -63,7 +64,7 @@ class StageExecutor(threading.Thread):
         return self.proc is not None and self.retcode is None
 
 
-def run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output):
+def run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output, record=None):
     """
     Runs a stage
     Args:
@@ -71,13 +72,20 @@ def run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output):
         hide_state_steps (bool): don't show state result steps
         hide_dynamic_steps (bool): don't show runtime generated steps
         simple_output (bool): use the minimal outputter
+        record (str): the path of a file to record the events to
     """
     mon = Monitor(not hide_state_steps, not hide_dynamic_steps)
     printer = SimplePrinter() if simple_output else StepListPrinter(False)
     mon.add_listener(printer)
+    recorder = None
+    if record:
+        recorder = EventRecorder(record)
+        mon.record(recorder)
     try:
         mon.parse_stage(stage_name)
     except RenderingException:
+        if recorder:
+            recorder.close()
         return 2
 
     mon.start()
@@ -94,6 +102,8 @@ def run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output):
         else:
             if mon.is_running():
                 mon.stop(True)
+            if recorder:
+                recorder.close()
             sys.exit(0)
 
     signal.signal(signal.SIGINT, sigint_handler)
@@ -111,4 +121,6 @@ def run_stage(stage_name, hide_state_steps, hide_dynamic_steps, simple_output):
 
     time.sleep(1)
     mon.stop(True)
+    if recorder:
+        recorder.close()
     return executor.retcode
@@ -5,9 +5,13 @@ This module is responsible for the parsing of DeepSea stage files
 from __future__ import absolute_import
 from __future__ import print_function
 
+import hashlib
+import json
 import logging
 import os
 import pwd
+import tempfile
+import threading
 import time
 import sys
 
@@ -15,12 +19,14 @@ from collections import defaultdict
 from io import BytesIO
 from io import StringIO
 from multiprocessing import Process, Queue
+from multiprocessing.dummy import Pool as ThreadPool
 
 import salt.client
 import salt.minion
 import salt.exceptions
 
 from .common import redirect_output
+from .config import Config
 
 
 # pylint: disable=C0103
@@ -82,8 +88,9 @@ class StageRenderingException(RenderingException):
 
 class SaltClient(object):
     _OPTS_ = None
+    _MASTER_OPTS_ = None
     _CALLER_ = None
-    _LOCAL_ = None
+    _LOCAL_ = threading.local()
     _MASTER_ = None
 
     @classmethod
@@ -107,37 +114,251 @@ class SaltClient(object):
     @classmethod
     def local(cls):
         """
-        Initializes and retrieves the Salt local client instance
+        Initializes and retrieves the Salt local client instance of the
+        current thread
         """
-        if cls._LOCAL_ is None:
-            cls._LOCAL_ = salt.client.LocalClient()
-        return cls._LOCAL_
+        if getattr(cls._LOCAL_, 'client', None) is None:
+            cls._LOCAL_.client = salt.client.LocalClient()
+        return cls._LOCAL_.client
+
+    @classmethod
+    def master_opts(cls):
+        """
+        Initializes and retrieves the Salt master opts structure
+        """
+        if cls._MASTER_OPTS_ is None:
+            cls._MASTER_OPTS_ = salt.config.master_config('/etc/salt/master')
+        return cls._MASTER_OPTS_
 
     @classmethod
     def master(cls):
         if cls._MASTER_ is None:
-            _opts = salt.config.master_config('/etc/salt/master')
+            _opts = dict(cls.master_opts())
             _opts['file_client'] = 'local'
             cls._MASTER_ = salt.minion.MasterMinion(_opts)
         return cls._MASTER_
 
 
+class StepsCache(object):
+    """
+    On-disk cache of rendered sls files.
+
+    Rendering a stage forks a process in the master and every state of the
+    stage is then rendered in the minions.  The result only changes when the
+    sls files, the modules they call, the pillar or the set of minions
+    change, so it is stored under a key made of the state names, the target,
+    the stage they belong to and a fingerprint of each of those.  The
+    renderings are stored as JSON, never as pickles, since the CLI runs as
+    root.  Runners
+    called from the sls files may return something else at any time, which
+    the short Config.STEPS_CACHE_TTL bounds.
+    """
+
+    @staticmethod
+    def _roots(opts, option):
+        """
+        Returns the directories of a master option, which is either a list or
+        a dict of lists per environment
+        """
+        value = opts.get(option) or []
+        if isinstance(value, dict):
+            value = [path for paths in value.values() for path in paths]
+        return sorted(set(value))
+
+    @staticmethod
+    def _fingerprint(roots):
+        """
+        Hashes the path, size and modification time of every file under the
+        roots
+        """
+        digest = hashlib.sha1()
+        for root in roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith('.pyc'):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    digest.update("{}:{}:{}\n".format(path, stat.st_size,
+                                                      stat.st_mtime).encode('utf-8'))
+        return digest.hexdigest()
+
+    @classmethod
+    def fingerprint(cls):
+        """
+        Returns the fingerprints of the sls files and modules, the pillar and
+        the accepted minions.  Walking the roots is not free, compute it once
+        per stage and pass it along.
+        """
+        opts = SaltClient.master_opts()
+        sls = cls._fingerprint(cls._roots(opts, 'file_roots') +
+                               cls._roots(opts, 'runner_dirs') +
+                               cls._roots(opts, 'module_dirs') +
+                               cls._roots(opts, 'utils_dirs'))
+        pillar = cls._fingerprint(cls._roots(opts, 'pillar_roots'))
+        minions = cls._fingerprint([os.path.join(opts.get('pki_dir', ''),
+                                                 'minions')])
+        return [sls, pillar, minions]
+
+    @classmethod
+    def key(cls, state_name, target, stage=None, fingerprint=None):
+        """
+        Returns the cache key of a rendering
+        """
+        if fingerprint is None:
+            fingerprint = cls.fingerprint()
+        data = json.dumps([cls.names(state_name), target, stage] + fingerprint)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def names(state_name):
+        """
+        States rendered together come from a set, sort them for the key
+        """
+        if isinstance(state_name, (list, tuple, set)):
+            return sorted(state_name)
+        return [state_name]
+
+    @staticmethod
+    def _path(key):
+        return os.path.join(Config.STEPS_CACHE_DIR, "{}.json".format(key))
+
+    @classmethod
+    def get(cls, state_name, target, stage=None, fingerprint=None):
+        """
+        Returns the cached rendering result or None
+        """
+        if not Config.STEPS_CACHE_DIR:
+            return None
+        path = cls._path(cls.key(state_name, target, stage, fingerprint))
+        try:
+            with open(path, 'r') as cache_file:
+                entry = json.load(cache_file)
+        except (IOError, OSError, ValueError):
+            return None
+        if time.time() - entry['time'] > Config.STEPS_CACHE_TTL:
+            logger.debug("cached rendering of %s expired", state_name)
+            return None
+        logger.info("using cached rendering of states=%s on=%s", state_name,
+                    target if target else "master")
+        # the rendering is a (result, out, err) tuple, which JSON stores as
+        # a list
+        return tuple(entry['result'])
+
+    @classmethod
+    def put(cls, state_name, target, result, stage=None, fingerprint=None):
+        """
+        Stores a rendering result
+        """
+        if not Config.STEPS_CACHE_DIR:
+            return
+        entry = {'names': cls.names(state_name), 'target': target,
+                 'stage': stage, 'time': time.time(), 'result': result}
+        try:
+            if not os.path.exists(Config.STEPS_CACHE_DIR):
+                os.makedirs(Config.STEPS_CACHE_DIR, 0o700)
+            path = cls._path(cls.key(state_name, target, stage, fingerprint))
+            fd, tmp = tempfile.mkstemp(dir=Config.STEPS_CACHE_DIR)
+            try:
+                with os.fdopen(fd, 'w') as cache_file:
+                    json.dump(entry, cache_file)
+                os.rename(tmp, path)
+            except (IOError, OSError, TypeError, ValueError):
+                os.remove(tmp)
+                raise
+            cls._prune()
+        except (IOError, OSError, TypeError, ValueError) as ex:
+            logger.warning("failed to cache rendering of %s: %s", state_name,
+                           ex)
+
+    @staticmethod
+    def _prune():
+        """
+        Removes the renderings that have expired, including those left behind
+        by changed sls files
+        """
+        now = time.time()
+        for filename in os.listdir(Config.STEPS_CACHE_DIR):
+            path = os.path.join(Config.STEPS_CACHE_DIR, filename)
+            try:
+                if now - os.path.getmtime(path) > Config.STEPS_CACHE_TTL:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @classmethod
+    def clean(cls, state_name=None):
+        """
+        Removes the cached renderings that include state_name, together with
+        the renderings of the states of the stage state_name, or all of them
+        """
+        if not Config.STEPS_CACHE_DIR or \
+                not os.path.isdir(Config.STEPS_CACHE_DIR):
+            return
+        for filename in os.listdir(Config.STEPS_CACHE_DIR):
+            path = os.path.join(Config.STEPS_CACHE_DIR, filename)
+            if state_name is not None:
+                try:
+                    with open(path, 'r') as cache_file:
+                        entry = json.load(cache_file)
+                    if state_name not in entry['names'] and \
+                            state_name != entry.get('stage'):
+                        continue
+                except (IOError, OSError, KeyError, ValueError):
+                    pass
+            logger.info("removing cached rendering %s", filename)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
 class SLSRenderer(object):
     """
     Helper class to render sls files
     """
 
+    # event_recorder.EventRecorder that stores every rendering
+    recorder = None
+
+    # event_recorder.EventReplayer that provides the renderings instead of salt
+    replayer = None
+
     @classmethod
-    def render(cls, state_name, target=None):
+    def render(cls, state_name, target=None, cache=True, stage=None,
+               fingerprint=None):
         """
         This function makes use of state.show_low_sls to render sls files
         Args:
             state_name (str): the salt state name (can be an orchestrator state)
+            cache (bool): whether to use the steps cache
+            stage (str): the stage that runs the state, for the steps cache
+            fingerprint (list): the StepsCache.fingerprint() of this parse
         """
-        if target:
-            return cls._render_in_minion(state_name, target)
+        if cls.replayer is not None:
+            return cls.replayer.render(state_name, target)
+
+        result = None
+        if cache:
+            if fingerprint is None:
+                fingerprint = StepsCache.fingerprint()
+            result = StepsCache.get(state_name, target, stage, fingerprint)
 
-        return cls._render_in_master(state_name)
+        if result is None:
+            if target:
+                result = cls._render_in_minion(state_name, target)
+            else:
+                result = cls._render_in_master(state_name)
+            if cache:
+                StepsCache.put(state_name, target, result, stage, fingerprint)
+
+        if cls.recorder is not None:
+            cls.recorder.record_render(state_name, target, result)
+        return result
 
     @classmethod
     def _render_in_minion(cls, state_name, target, retry=True):
@@ -260,6 +481,9 @@ class SLSParser(object):
     SLS files parser
     """
 
+    # maximum number of targets rendering their states at the same time
+    RENDER_WORKERS = 8
+
     @classmethod
     def parse_step(cls, step_dict, target=None):
         logger.debug("parsing step [%s] %s", target, step_dict)
@@ -286,6 +510,14 @@ class SLSParser(object):
         for l in listeners:
             l.stage_parsing_state(states, minion)
 
+    @staticmethod
+    def clean_cache(stage_name):
+        """
+        Evicts the cached renderings of a stage, or of everything when
+        stage_name is None
+        """
+        StepsCache.clean(stage_name)
+
     @classmethod
     def parse_stage(cls, stage_name, hide_state_steps, only_visible_steps,
                     monitor_listeners=None):
@@ -295,7 +527,10 @@ class SLSParser(object):
         steps = []
         t0 = time.time()
         SLSParser.notify_listener(monitor_listeners, [stage_name])
-        stage, out, _ = SLSRenderer.render(stage_name)
+        fingerprint = None
+        if Config.STEPS_CACHE_DIR and SLSRenderer.replayer is None:
+            fingerprint = StepsCache.fingerprint()
+        stage, out, _ = SLSRenderer.render(stage_name, fingerprint=fingerprint)
         t1 = time.time()
         logger.info("parsing stage sls file took: %ss", t1-t0)
         for step_dict in stage:
@@ -319,7 +554,8 @@ class SLSParser(object):
             lambda: defaultdict(dict)))
         for target, states in states_to_render.items():
             SLSParser.notify_listener(monitor_listeners, states, target)
-            res, _, _ = SLSRenderer.render(list(states), target)
+        for target, states, res in cls._render_targets(states_to_render,
+                                                       stage_name, fingerprint):
             for minion, state_res in res.items():
                 if isinstance(state_res, list):
                     assert len(states) == 1
@@ -346,6 +582,33 @@ class SLSParser(object):
 
         return steps, out
 
+    @classmethod
+    def _render_targets(cls, states_to_render, stage_name=None,
+                        fingerprint=None):
+        """
+        Renders the states of every target concurrently and yields each
+        (target, states, result) as soon as it returns
+        """
+        def _render(target):
+            states = states_to_render[target]
+            res, _, _ = SLSRenderer.render(list(states), target,
+                                           stage=stage_name,
+                                           fingerprint=fingerprint)
+            return target, states, res
+
+        targets = list(states_to_render)
+        if len(targets) < 2:
+            for target in targets:
+                yield _render(target)
+            return
+
+        pool = ThreadPool(min(len(targets), cls.RENDER_WORKERS))
+        try:
+            for result in pool.imap_unordered(_render, targets):
+                yield result
+        finally:
+            pool.terminate()
+
     @classmethod
     def _search_step(cls, steps, state, sid):
         """
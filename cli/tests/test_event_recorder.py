@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..event_recorder import EventRecorder, EventReplayer, read_records, RENDER_TAG
+from ..monitor import Monitor, MonitorListener
+from ..stage_parser import SLSRenderer, StageRenderingException
+
+
+class ReplayListener(MonitorListener):
+    def __init__(self):
+        self.calls = []
+
+    def stage_parsing_finished(self, stage, output, exception):
+        self.calls.append(('parsed', stage.total_steps() if stage else exception))
+
+    def step_runner_started(self, step):
+        self.calls.append(('started', step.name))
+
+    def step_runner_finished(self, step):
+        self.calls.append(('finished', step.name, step.success))
+
+    def stage_finished(self, stage):
+        self.calls.append(('stage', stage.name, stage.success))
+
+
+def _runner_event(jid, fun, arg, ret=None):
+    data = {'jid': jid, 'fun': fun, 'fun_args': arg,
+            '_stamp': '2017-08-01T12:00:00.000000'}
+    if ret is None:
+        return 'salt/run/{}/new'.format(jid), data
+    data.update({'return': ret, 'success': True})
+    return 'salt/run/{}/ret'.format(jid), data
+
+
+class TestEventRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'stage.rec')
+
+    def tearDown(self):
+        SLSRenderer.recorder = None
+        SLSRenderer.replayer = None
+        shutil.rmtree(self.tmpdir)
+
+    def _record(self):
+        recorder = EventRecorder(self.path)
+        recorder.record_render('test.orch', None, ([{
+            '__id__': 'test runner', 'state': 'salt', 'fun': 'runner',
+            'name': 'jobs.active'}], '', ''))
+        stamp = 1000.0
+        for tag, data in [
+                _runner_event('1', 'runner.state.orch', ['test.orch']),
+                ('salt/auth', {'id': 'minion1', '_stamp': ''}),
+                _runner_event('2', 'runner.jobs.active', []),
+                _runner_event('2', 'runner.jobs.active', [], {}),
+                _runner_event('1', 'runner.state.orch', ['test.orch'], {})]:
+            recorder.record(tag, data, stamp)
+            stamp += 0.01
+        recorder.close()
+
+    def test_record(self):
+        self._record()
+        records = list(read_records(self.path))
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0][1], RENDER_TAG)
+        self.assertEqual(records[1][0], 1000.0)
+        self.assertEqual(records[1][1], 'salt/run/1/new')
+
+    def test_replay(self):
+        self._record()
+        listener = ReplayListener()
+        mon = Monitor(False, False)
+        mon.add_listener(listener)
+
+        stats = mon.replay(EventReplayer(self.path), 0)
+
+        self.assertEqual(stats['events'], 5)
+        self.assertEqual(stats['lag']['events'], 4)
+        self.assertEqual(listener.calls, [
+            ('parsed', 1),
+            ('started', 'jobs.active'),
+            ('finished', 'jobs.active', True),
+            ('stage', 'test.orch', True)])
+
+    def test_replay_recorded_speed(self):
+        self._record()
+        mon = Monitor(False, False)
+        stats = mon.replay(EventReplayer(self.path), 1)
+        self.assertGreaterEqual(stats['seconds'], 0.03)
+
+    def test_replay_missing_render(self):
+        self._record()
+        replayer = EventReplayer(self.path)
+        with self.assertRaises(StageRenderingException):
+            replayer.render('test.other')
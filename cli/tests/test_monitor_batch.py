@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+from mock import Mock, patch
+
+from .. import monitor
+from ..monitor import Monitor, MonitorListener
+
+# 2017-08-01T12:00:00 UTC
+STAMP = '2017-08-01T12:00:00.000000'
+STAMP_TIME = 1501588800.0
+
+
+class RecordingMonitor(Monitor):
+    def __init__(self):
+        super(RecordingMonitor, self).__init__(True, False)
+        self.calls = []
+
+    def start_step(self, event):
+        self.calls.append(('start_step', event.jid))
+
+    def end_step(self, event):
+        self.calls.append(('end_step', event.jid))
+
+    def state_result_steps(self, events):
+        self.calls.append(('state_result_steps', [e.jid for e in events]))
+
+
+class ResultListener(MonitorListener):
+    def __init__(self):
+        self.calls = []
+
+    def step_state_results(self, step, events):
+        self.calls.append((step, [e.name for e in events]))
+
+
+def _event(mon, func, jid, received, stamp=STAMP):
+    event = Monitor.Event(mon, func, Mock(jid=jid, stamp=stamp))
+    event.received = received
+    return event
+
+
+def _result(name, state_id='state', jid='1', minion='minion1'):
+    event = Mock(jid=jid, minion=minion, state_id=state_id, result=True)
+    event.name = name
+    return event
+
+
+class TestHandleBatch(unittest.TestCase):
+
+    def test_mixed_batch(self):
+        mon = RecordingMonitor()
+        batch = [_event(mon, 'start_step', '1', STAMP_TIME + 8),
+                 _event(mon, 'state_result_step', '2', STAMP_TIME + 8),
+                 _event(mon, 'state_result_step', '3', STAMP_TIME + 9),
+                 _event(mon, 'end_step', '1', STAMP_TIME + 9),
+                 _event(mon, 'state_result_step', '4', STAMP_TIME + 9)]
+
+        with patch.object(monitor.time, 'time', return_value=STAMP_TIME + 10):
+            mon._handle_batch(batch)
+
+        self.assertEqual(mon.calls, [
+            ('start_step', '1'),
+            ('state_result_steps', ['2', '3']),
+            ('end_step', '1'),
+            ('state_result_steps', ['4'])])
+        self.assertEqual(mon.lag(), {'events': 5, 'batches': 1,
+                                     'last': 2.0, 'max': 2.0,
+                                     'bus_last': 10.0, 'bus_max': 10.0})
+
+    def test_lag_accumulates(self):
+        mon = RecordingMonitor()
+        with patch.object(monitor.time, 'time', return_value=STAMP_TIME + 10):
+            mon._handle_batch([_event(mon, 'start_step', '1', STAMP_TIME + 5)])
+            mon._handle_batch([_event(mon, 'end_step', '1', STAMP_TIME + 9,
+                                      stamp=None)])
+
+        lag = mon.lag()
+        self.assertEqual((lag['events'], lag['batches']), (2, 2))
+        self.assertEqual((lag['last'], lag['max']), (1.0, 5.0))
+        self.assertEqual((lag['bus_last'], lag['bus_max']), (10.0, 10.0))
+
+
+class TestStateResultSteps(unittest.TestCase):
+
+    def setUp(self):
+        self.steps = {'a1': 'step a', 'a2': 'step a', 'b1': 'step b'}
+        self.mon = Monitor(True, False)
+        self.mon._running_stage = Mock()
+        self.mon._running_stage.state_result_step.side_effect = \
+            lambda event: self.steps.get(event.state_id)
+        self.listener = ResultListener()
+        self.mon.add_listener(self.listener)
+
+    def test_grouped_by_step(self):
+        self.mon.state_result_steps([_result('first', 'a1'),
+                                     _result('other', 'a2'),
+                                     _result('first', 'b1'),
+                                     _result('unknown', 'c1')])
+
+        self.assertEqual(self.listener.calls, [('step a', ['first', 'other']),
+                                               ('step b', ['first'])])
+
+    def test_latest_result_kept(self):
+        first = _result('name', 'a1')
+        latest = _result('name', 'a1')
+        self.mon.state_result_steps([first, _result('other', 'a2'), latest])
+
+        self.assertEqual(self.mon._running_stage.state_result_step.call_count, 2)
+        self.mon._running_stage.state_result_step.assert_any_call(latest)
+        self.assertEqual(self.listener.calls, [('step a', ['name', 'other'])])
+
+    def test_hidden_state_steps(self):
+        self.mon._show_state_steps = False
+        self.mon.state_result_steps([_result('first', 'a1')])
+        self.assertEqual(self.listener.calls, [])
+
+    def test_no_running_stage(self):
+        self.mon._running_stage = None
+        self.mon.state_result_steps([_result('first', 'a1')])
+        self.assertEqual(self.listener.calls, [])
+
+
+class TestStampAge(unittest.TestCase):
+
+    def test_age(self):
+        self.assertEqual(monitor._stamp_age(STAMP, STAMP_TIME + 3.5), 3.5)
+        self.assertEqual(monitor._stamp_age('2017-08-01T12:00:00.250000',
+                                            STAMP_TIME + 1), 0.75)
+
+    def test_invalid(self):
+        self.assertIsNone(monitor._stamp_age(None, STAMP_TIME))
+        self.assertIsNone(monitor._stamp_age('', STAMP_TIME))
+        self.assertIsNone(monitor._stamp_age('yesterday', STAMP_TIME))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+import threading
+import unittest
+from io import StringIO
+
+from mock import patch
+
+from ..common import redirect_output
+from ..config import Config
+from ..stage_parser import SaltClient, SLSParser, SLSRenderer
+
+
+class FakeLocalClient(object):
+    """
+    Both renders print only after the other one started, so that their output
+    is interleaved
+    """
+    def __init__(self):
+        self.barrier = threading.Barrier(2, timeout=5)
+
+    def cmd(self, target, fun, arg, tgt_type=None):
+        self.barrier.wait()
+        print("rendering {}".format(target))
+        print("warning from {}".format(target), file=sys.stderr)
+        self.barrier.wait()
+        return {target: {arg[0]: [{'__id__': target}]}}
+
+
+class RenderRecorder(object):
+    def __init__(self):
+        self.renders = {}
+
+    def record_render(self, state_name, target, result):
+        self.renders[target] = result
+
+
+class TestRenderTargets(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = Config.STEPS_CACHE_DIR
+        Config.STEPS_CACHE_DIR = ""
+        SLSRenderer.recorder = RenderRecorder()
+
+    def tearDown(self):
+        Config.STEPS_CACHE_DIR = self.cache_dir
+        SLSRenderer.recorder = None
+
+    @patch.object(SaltClient, 'local')
+    def test_concurrent_renders(self, local):
+        local.return_value = FakeLocalClient()
+        stdout, stderr = sys.stdout, sys.stderr
+
+        results = list(SLSParser._render_targets({'minion1': {'test.a'},
+                                                  'minion2': {'test.b'}},
+                                                 'test.orch', []))
+
+        self.assertEqual(sorted((target, res) for target, _, res in results), [
+            ('minion1', {'minion1': {'test.a': [{'__id__': 'minion1'}]}}),
+            ('minion2', {'minion2': {'test.b': [{'__id__': 'minion2'}]}})])
+        renders = SLSRenderer.recorder.renders
+        for target in ['minion1', 'minion2']:
+            self.assertEqual(renders[target][1], "rendering {}\n".format(target))
+            self.assertEqual(renders[target][2],
+                             "warning from {}\n".format(target))
+        self.assertIs(sys.stdout, stdout)
+        self.assertIs(sys.stderr, stderr)
+
+
+class TestRedirectOutput(unittest.TestCase):
+
+    def test_threads_keep_their_output(self):
+        stdout = sys.stdout
+        outputs = {}
+        barrier = threading.Barrier(2, timeout=5)
+
+        def _print(name):
+            outputs[name] = StringIO()
+            with redirect_output(outputs[name]):
+                barrier.wait()
+                sys.stdout.write(name)
+                barrier.wait()
+
+        threads = [threading.Thread(target=_print, args=(name,))
+                   for name in ['a', 'b']]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outputs['a'].getvalue(), 'a')
+        self.assertEqual(outputs['b'].getvalue(), 'b')
+        self.assertIs(sys.stdout, stdout)
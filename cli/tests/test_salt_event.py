@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+from mock import Mock, patch
+
+from ..salt_event import EventListener, NewJobEvent, NewRunnerEvent, RetJobEvent, \
+                         RetRunnerEvent, SaltEventProcessor, StateResultEvent, \
+                         ROUTES, route
+
+
+class TestRoute(unittest.TestCase):
+
+    ROUTED = [
+        ('salt/job/20170801120000000000/new',
+         NewJobEvent, 'handle_new_job_event'),
+        ('salt/job/20170801120000000000/ret/minion1',
+         RetJobEvent, 'handle_ret_job_event'),
+        ('salt/job/20170801120000000000/ret/minion1.ceph/with/slashes',
+         RetJobEvent, 'handle_ret_job_event'),
+        ('salt/run/20170801120000000000/new',
+         NewRunnerEvent, 'handle_new_runner_event'),
+        ('salt/run/20170801120000000000/ret',
+         RetRunnerEvent, 'handle_ret_runner_event'),
+        ('salt/state_result/20170801120000000000/minion1',
+         StateResultEvent, 'handle_state_result_event'),
+        ('salt/state_result/20170801120000000000',
+         StateResultEvent, 'handle_state_result_event'),
+    ]
+
+    DROPPED = [
+        'salt/auth',
+        'salt/key',
+        'salt/minion/minion1/start',
+        'salt/job/20170801120000000000/ret',
+        'salt/job/20170801120000000000/prog/minion1/0',
+        'salt/run/20170801120000000000/args',
+        'salt/run/20170801120000000000/ret/minion1',
+        'salt/run/20170801120000000000/new/minion1',
+        'salt/job',
+        'minion/refresh/minion1',
+        '20170801120000000000',
+        '',
+    ]
+
+    def test_routed(self):
+        for tag, wrapper_class, handler in self.ROUTED:
+            self.assertEqual(route(tag), (wrapper_class, handler), tag)
+
+    def test_dropped(self):
+        for tag in self.DROPPED:
+            self.assertIsNone(route(tag), tag)
+
+
+class RecordingListener(EventListener):
+    def __init__(self, accept):
+        self.accept = accept
+        self.calls = []
+
+    def accepts(self, handler, data):
+        self.calls.append(('accepts', handler))
+        return self.accept
+
+    def handle_new_job_event(self, event):
+        self.calls.append(('handle_new_job_event', event))
+
+
+class TestProcess(unittest.TestCase):
+
+    EVENT = {'tag': 'salt/job/20170801120000000000/new',
+             'data': {'jid': '20170801120000000000', 'minions': ['minion1'],
+                      'fun': 'test.ping', '_stamp': '2017-08-01T12:00:00.000000'}}
+
+    def _process(self, *listeners):
+        wrapper_class = Mock()
+        processor = SaltEventProcessor()
+        for listener in listeners:
+            processor.add_listener(listener)
+        with patch.dict(ROUTES, {('job', 'new', False): (wrapper_class,
+                                                         'handle_new_job_event')}):
+            processor._process(self.EVENT)
+        return wrapper_class
+
+    def test_not_accepted(self):
+        listener = RecordingListener(False)
+        wrapper_class = self._process(listener)
+        wrapper_class.assert_not_called()
+        self.assertEqual(listener.calls, [('accepts', 'handle_new_job_event')])
+
+    def test_wrapper_built_once(self):
+        listeners = [RecordingListener(False), RecordingListener(True),
+                     RecordingListener(True)]
+        wrapper_class = self._process(*listeners)
+        wrapper_class.assert_called_once_with(self.EVENT)
+        self.assertEqual(listeners[0].calls, [('accepts', 'handle_new_job_event')])
+        for listener in listeners[1:]:
+            self.assertEqual(listener.calls, [
+                ('accepts', 'handle_new_job_event'),
+                ('handle_new_job_event', wrapper_class.return_value)])
+
+    def test_dropped_tag(self):
+        listener = RecordingListener(True)
+        processor = SaltEventProcessor()
+        processor.add_listener(listener)
+        processor._process({'tag': 'salt/auth', 'data': {'id': 'minion1'}})
+        self.assertEqual(listener.calls, [])
@@ -1,16 +1,32 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
+import json
+import os
+import shutil
+import tempfile
+
 from .helper import SaltTestCase
 from ..stage_parser import SLSParser, SaltRunner, SaltExecutionFunction, \
                            StageRenderingException, SaltState, \
-                           SaltStateFunction, StateRenderingException
+                           SaltStateFunction, StateRenderingException, \
+                           StepsCache
+from ..config import Config
 
 
 class TestStageParser(SaltTestCase):
 
     CLEAN_STATE_FILES = True
 
+    def setUp(self):
+        self.cache_dir = Config.STEPS_CACHE_DIR
+        Config.STEPS_CACHE_DIR = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(Config.STEPS_CACHE_DIR)
+        Config.STEPS_CACHE_DIR = self.cache_dir
+        super(TestStageParser, self).tearDown()
+
     def test_parse_stage_runner_1(self):
         self.write_state_file("test.test-orch1", [
             ('test runner', {
@@ -480,3 +496,58 @@ error state:
         self.assertIsInstance(ctx.exception.pretty_error_desc_str(), str)
         self.assertIn("No minions matched the target",
                       ctx.exception.pretty_error_desc_str())
+
+    def test_parse_stage_cached(self):
+        self.write_state_file("test.test-orch105", {
+            'test state': {
+                'salt.state': [{
+                    'sls': 'test.test-state105',
+                    'tgt': self.minions()[0]
+                }]
+            }
+        })
+
+        self.write_state_file("test.test-state105", {
+            'cmd.run': [{'name': 'ls'}]
+        })
+
+        steps, _ = SLSParser.parse_stage("test.test-orch105", False, False)
+        self.assertIsNotNone(StepsCache.get("test.test-orch105", None))
+        self.assertIsNotNone(StepsCache.get(["test.test-state105"],
+                                            self.minions()[0],
+                                            "test.test-orch105"))
+
+        for filename in os.listdir(Config.STEPS_CACHE_DIR):
+            with open(os.path.join(Config.STEPS_CACHE_DIR, filename)) as cache_file:
+                self.assertIn('result', json.load(cache_file))
+
+        cached, _ = SLSParser.parse_stage("test.test-orch105", False, False)
+        self.assertEqual(len(cached), len(steps))
+        self.assertEqual(cached[0].desc, steps[0].desc)
+
+        SLSParser.clean_cache("test.test-orch105")
+        self.assertIsNone(StepsCache.get("test.test-orch105", None))
+        self.assertIsNone(StepsCache.get(["test.test-state105"],
+                                         self.minions()[0],
+                                         "test.test-orch105"))
+
+    def test_parse_stage_cache_invalidated(self):
+        self.write_state_file("test.test-orch106", [
+            ('test runner', {
+                'salt.runner': [{
+                    'name': 'jobs.active'
+                }]
+            })
+        ])
+        steps, _ = SLSParser.parse_stage("test.test-orch106", False, False)
+        self.assertEqual(len(steps), 1)
+
+        self.write_state_file("test.test-orch106", [
+            ('test runner 2', {
+                'salt.runner': [{
+                    'name': 'jobs.last_run'
+                }]
+            })
+        ], append=True)
+        steps, _ = SLSParser.parse_stage("test.test-orch106", False, False)
+        self.assertEqual(len(steps), 2)
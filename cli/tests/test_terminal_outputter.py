@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+
+import unittest
+
+from ..monitors.terminal_outputter import StepListPrinter
+
+
+class TestFrame(unittest.TestCase):
+
+    def test_first_frame(self):
+        frame = StepListPrinter.Frame()
+        output, written = frame.update(["a", "b"])
+        self.assertEqual(output, "\r\x1B[Ka\n\r\x1B[Kb\n")
+        self.assertEqual(written, 2)
+
+    def test_unchanged_frame(self):
+        frame = StepListPrinter.Frame()
+        frame.update(["a", "b", "c"])
+        output, written = frame.update(["a", "b", "c"])
+        self.assertEqual(output, "\x1B[3A\x1B[3B")
+        self.assertEqual(written, 0)
+
+    def test_changed_lines(self):
+        frame = StepListPrinter.Frame()
+        frame.update(["a", "b", "c", "d"])
+        output, written = frame.update(["a", "B", "c", "d", "e"])
+        self.assertEqual(output, "\x1B[4A\x1B[1B\r\x1B[KB\n\x1B[2B\r\x1B[Ke\n")
+        self.assertEqual(written, 2)
+
+    def test_shorter_frame(self):
+        frame = StepListPrinter.Frame()
+        frame.update(["a", "b", "c"])
+        output, written = frame.update(["a"])
+        self.assertEqual(output, "\x1B[3A\x1B[1B\r\x1B[J")
+        self.assertEqual(written, 0)
+        self.assertEqual(frame.lines, ["a"])
+
+
+class TestCollector(unittest.TestCase):
+
+    def test_lines(self):
+        collector = StepListPrinter.Collector()
+        collector.write("[1/2] ")
+        collector.write("step\n")
+        collector.write("  |_ sub\n")
+        self.assertEqual(collector.lines(), ["[1/2] step", "  |_ sub"])
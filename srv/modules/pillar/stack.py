@@ -364,16 +364,96 @@ You can also select a custom merging strategy using a ``__`` object in a list:
 
 from __future__ import absolute_import
 import os
+import copy
+import hashlib
 import logging
+from collections import OrderedDict
 from functools import partial
 
 import yaml
 from jinja2 import FileSystemLoader, Environment, TemplateNotFound
+from jinja2.bccache import BytecodeCache
 import six
 
 
 log = logging.getLogger(__name__)
 strategies = ('overwrite', 'merge-first', 'merge-last', 'remove')
+cache_size = 2048
+
+
+class _LRUCache(object):
+    '''
+    Bounded mapping that evicts the least recently used entry
+    '''
+    def __init__(self, size):
+        self.size = size
+        self.data = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self.data.pop(key)
+        except KeyError:
+            return None
+        self.data[key] = value
+        return value
+
+    def set(self, key, value):
+        self.data.pop(key, None)
+        self.data[key] = value
+        while len(self.data) > self.size:
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+
+
+class _MemoryBytecodeCache(BytecodeCache):
+    '''
+    Keep compiled templates in memory.  Jinja keys the bucket by template
+    name and verifies it against the checksum of the template source, so an
+    edited template is compiled again.
+    '''
+    def __init__(self, cache):
+        self.cache = cache
+
+    def load_bytecode(self, bucket):
+        code = self.cache.get(bucket.key)
+        if code is not None:
+            bucket.bytecode_from_string(code)
+
+    def dump_bytecode(self, bucket):
+        self.cache.set(bucket.key, bucket.bytecode_to_string())
+
+    def clear(self):
+        self.cache.clear()
+
+
+# Salt loads this module again for every pillar compilation.  Keep the caches
+# of the first load so that they are shared by every minion this process
+# compiles pillar for.
+try:
+    _bytecode_cache  # pylint: disable=used-before-assignment
+except NameError:
+    _bytecode_cache = _MemoryBytecodeCache(_LRUCache(cache_size))
+    _yaml_cache = _LRUCache(cache_size)
+
+
+def _load_yaml(path, content):
+    '''
+    Parse rendered content once.  The key includes a digest of the content,
+    which already reflects every input to the rendering.  Callers receive a
+    copy since merging modifies the parsed data.
+    '''
+    if isinstance(content, six.text_type):
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+    else:
+        digest = hashlib.sha1(content).hexdigest()
+    key = (path, digest)
+    obj = _yaml_cache.get(key)
+    if obj is None:
+        obj = yaml.safe_load(content)
+        _yaml_cache.set(key, obj)
+    return copy.deepcopy(obj)
 
 
 def ext_pillar(minion_id, pillar, *args, **kwargs):
@@ -406,7 +486,8 @@ def ext_pillar(minion_id, pillar, *args, **kwargs):
 def _process_stack_cfg(cfg, stack, minion_id, pillar):
     log.debug('Config: {0}'.format(cfg))
     basedir, filename = os.path.split(cfg)
-    jenv = Environment(loader=FileSystemLoader(basedir))
+    jenv = Environment(loader=FileSystemLoader(basedir),
+                       bytecode_cache=_bytecode_cache)
     jenv.globals.update({
         "__opts__": __opts__,
         "__salt__": __salt__,
@@ -417,7 +498,7 @@ def _process_stack_cfg(cfg, stack, minion_id, pillar):
     for path in _parse_stack_cfg(jenv.get_template(filename).render(stack=stack)):
         try:
             log.debug('YAML: basedir={0}, path={1}'.format(basedir, path))
-            obj = yaml.safe_load(jenv.get_template(path).render(stack=stack))
+            obj = _load_yaml(path, jenv.get_template(path).render(stack=stack))
             log.debug('obj: {0}'.format(obj))
             
             if not isinstance(obj, dict):
@@ -445,9 +526,12 @@ def _cleanup(obj):
             obj.pop('__', None)
             for k, v in six.iteritems(obj):
                 obj[k] = _cleanup(v)
-        elif isinstance(obj, list) and isinstance(obj[0], dict) \
-                and '__' in obj[0]:
-            del obj[0]
+        elif isinstance(obj, list):
+            if isinstance(obj[0], dict) and '__' in obj[0]:
+                del obj[0]
+            # The stack extends its lists in place, so it keeps its own copy
+            # of a list that YAML aliases may share with other keys
+            obj = list(obj)
     return obj
 
 
@@ -493,14 +577,44 @@ def _merge_list(stack, obj):
     if strategy not in strategies:
         raise Exception('Unknown strategy "{0}", should be one of {1}'.format(
             strategy, strategies))
+    # The stack's lists are modified in place rather than rebuilt so that
+    # merging many files into a large list does not copy it every time.  obj
+    # is never modified, YAML aliases may share it with other keys.
     if strategy == 'overwrite':
-        return obj
+        return list(obj)
     elif strategy == 'remove':
-        return [item for item in stack if item not in obj]
+        removed = _Membership(obj)
+        stack[:] = [item for item in stack if item not in removed]
+        return stack
     elif strategy == 'merge-first':
-        return obj + stack
+        stack[:0] = obj
+        return stack
     else:
-        return stack + obj
+        stack.extend(obj)
+        return stack
+
+
+class _Membership(object):
+    '''
+    Membership test for the remove strategy.  Hashable items are looked up
+    in a set, unhashable items such as dicts are compared one by one.
+    '''
+    def __init__(self, items):
+        self.hashed = set()
+        self.unhashable = []
+        for item in items:
+            try:
+                self.hashed.add(item)
+            except TypeError:
+                self.unhashable.append(item)
+
+    def __contains__(self, item):
+        try:
+            if item in self.hashed:
+                return True
+        except TypeError:
+            pass
+        return item in self.unhashable
 
 
 def _parse_stack_cfg(content):
@@ -9,13 +9,11 @@ import salt.config
 import ast
 import logging
 import datetime
-import ipaddress
 import jinja2
 import os
 import subprocess
 import sys
 import yaml
-from six.moves import filter
 from six.moves import zip
 from functools import reduce
 
@@ -53,10 +51,8 @@ class Fio(object):
             raise Exception('No minions found for glob {}'.format(client_glob))
 
         clients = []
-        ip_filter = lambda add: ipaddress.ip_address(
-            add.decode()) in ipaddress.ip_network(public_network.decode())
         for minion, ip_list in minion_ip_lists.items():
-            clients.extend(list(filter(ip_filter, ip_list)))
+            clients.extend(__utils__['networks.matching'](ip_list, public_network))
 
         if not clients:
             raise Exception(
@@ -12,11 +12,11 @@ from __future__ import absolute_import
 import pprint
 import os
 import sys
+import time
 import logging
 # pylint: disable=import-error,3rd-party-module-not-gated,redefined-builtin
 import salt.client
 import salt.utils
-import salt.utils.master
 import salt.ext.six as six
 
 log = logging.getLogger(__name__)
@@ -152,7 +152,9 @@ def need_restart(role=None, cluster='ceph'):
 
 def _status(search, roles, quiet):
     """
-    Return a structure of roles with module results
+    Return a structure of roles with module results.  Publish the query for
+    every role first and then collect the returns of all jobs as they
+    arrive, so that the slowest role determines the duration.
     """
     # When search matches no minions, salt prints to stdout.  Suppress stdout.
     _stdout = sys.stdout
@@ -160,14 +162,43 @@ def _status(search, roles, quiet):
 
     status = {}
     local = salt.client.LocalClient()
+    assigned = __utils__['snapshot.pillar'](search, 'roles', default=[])
 
+    returns = {}
     for role in roles:
+        status[role] = {}
+        if not [minion for minion in assigned if role in assigned[minion]]:
+            # Skip the round trip for roles without any minions
+            continue
         role_search = search + " and I@roles:{}".format(role)
-        status[role] = local.cmd(role_search,
-                                 'cephprocesses.check',
-                                 kwarg={'roles': [role]},
-                                 quiet=quiet,
-                                 tgt_type="compound")
+        job = local.run_job(role_search,
+                            'cephprocesses.check',
+                            kwarg={'roles': [role]},
+                            quiet=quiet,
+                            tgt_type="compound",
+                            listen=True)
+        if job:
+            returns[role] = local.get_iter_returns(job['jid'],
+                                                   job['minions'],
+                                                   timeout=__opts__['timeout'],
+                                                   tgt=role_search,
+                                                   tgt_type="compound",
+                                                   block=False)
+
+    while returns:
+        idle = True
+        for role in list(returns):
+            try:
+                ret = next(returns[role])
+            except StopIteration:
+                del returns[role]
+                continue
+            if ret:
+                idle = False
+                for minion in ret:
+                    status[role][minion] = ret[minion].get('ret', {})
+        if idle:
+            time.sleep(0.05)
 
     sys.stdout = _stdout
     log.debug(pprint.pformat(status))
@@ -181,17 +212,11 @@ def _cached_roles(search):
     from any dynamic query.  Also, do not worry about downed minions that
     are outside of the search criteria.
     """
-    pillar_util = salt.utils.master.MasterPillarUtil(search, "compound",
-                                                     use_cached_grains=True,
-                                                     grains_fallback=False,
-                                                     opts=__opts__)
-
-    cached = pillar_util.get_minion_pillar()
+    cached = __utils__['snapshot.pillar'](search, 'roles', default=[])
     roles = {}
     for minion in cached:
-        if 'roles' in cached[minion]:
-            for role in cached[minion]['roles']:
-                roles.setdefault(role, []).append(minion)
+        for role in cached[minion]:
+            roles.setdefault(role, []).append(minion)
 
     log.debug(pprint.pformat(roles))
     return list(roles.keys())
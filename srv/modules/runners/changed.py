@@ -10,13 +10,18 @@ from __future__ import absolute_import
 from __future__ import print_function
 import os.path
 import hashlib
+import json
 import logging
+import tempfile
 # pylint: disable=import-error,3rd-party-module-not-gated
 import salt.client
 
 __opts__ = salt.config.client_config('/etc/salt/master')
 log = logging.getLogger(__name__)
 
+BLOCK_SIZE = 65536
+CHECKSUM_DIR = '/srv/salt/ceph/configuration/files/ceph.conf.checksum/'
+
 
 class UnknownRole(Exception):
     """
@@ -38,7 +43,7 @@ class Role(object):
         self.conf_extension = kwargs.get('conf_extension', '.conf')
         self._conf_files = [self.conf_dir + self.conf_filename + self.conf_extension]
         self._depends = [self]
-        self.rgw_configurations()
+        self.rgw_configurations(kwargs.get('rgw_configurations'))
 
     @property
     def name(self):
@@ -93,27 +98,110 @@ class Role(object):
         """
         return [dep.name for dep in self.dependencies]
 
-    def rgw_configurations(self):
+    def rgw_configurations(self, roles=None):
         """
         RadosGW allows custom configurations.  Include these roles with a
         dependency on the global.conf.  Default to 'rgw' if not set.
         """
-        # pylint: disable=redefined-outer-name
-        local = salt.client.LocalClient()
-        roles = []
-        try:
-            roles = list(local.cmd("I@roles:master", 'pillar.get',
-                                   ['rgw_configurations'],
-                                   tgt_type="compound").values())[0]
-            log.debug("Querying pillar for rgw_configurations")
-        # pylint: disable=bare-except
-        except:
-            pass
-        if not roles:
-            roles = ['rgw']
+        if roles is None:
+            roles = _rgw_configurations()
         for role in roles:
             if role == self.name:
-                self.add_dependencies(Role(role_name='global'))
+                self.add_dependencies(Role(role_name='global', conf_dir=self.conf_dir,
+                                          rgw_configurations=[]))
+
+
+def _rgw_configurations():
+    """
+    Return the RadosGW configurations from the master pillar
+    """
+    roles = []
+    try:
+        log.debug("Querying pillar for rgw_configurations")
+        roles = list(__utils__['snapshot.pillar']("I@roles:master",
+                                                  'rgw_configurations').values())[0]
+    # pylint: disable=bare-except
+    except:
+        pass
+    if not roles:
+        roles = ['rgw']
+    return roles
+
+
+class Checksums(object):
+    """
+    Checksums of the configuration files.  Files are hashed in blocks and
+    only when their size, mtime or inode differ from the manifest of the
+    previous run.
+    """
+
+    def __init__(self, manifest=None):
+        """
+        Load the manifest
+        """
+        self.manifest = manifest or CHECKSUM_DIR + 'manifest.json'
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.manifest, 'r') as _fd:
+                self.entries = json.load(_fd)
+        except (IOError, OSError, ValueError):
+            log.debug("No manifest {}".format(self.manifest))
+
+    def file(self, path):
+        """
+        Return the md5 of a file or None if missing
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            stat = os.stat(path)
+            key = [stat.st_size, stat.st_mtime, stat.st_ino]
+        except OSError:
+            key = None
+        entry = self.entries.get(path)
+        if key and entry and entry['stat'] == key:
+            return entry['md5']
+        log.debug("Generating checksum for {}".format(path))
+        md5 = hashlib.md5()
+        with open(path, 'rb') as _fd:
+            for block in iter(lambda: _fd.read(BLOCK_SIZE), b''):
+                md5.update(block)
+        if key:
+            self.entries[path] = {'stat': key, 'md5': md5.hexdigest()}
+            self.dirty = True
+        return md5.hexdigest()
+
+    def role(self, role):
+        """
+        Creating a checksums of checksums to detect a change
+        even if there are multiple files used to configure a role.
+        """
+        checksums = ''
+        for _file in role.conf_files:
+            md5 = self.file(_file)
+            if md5:
+                log.debug("Checksum of {}: {}".format(_file, md5))
+                checksums += md5
+        if checksums:
+            return hashlib.md5(checksums.encode('ascii')).hexdigest()
+        return None
+
+    def save(self):
+        """
+        Write the manifest if any file was hashed
+        """
+        if not self.dirty:
+            return
+        directory = os.path.dirname(self.manifest)
+        try:
+            _fd, tmp = tempfile.mkstemp(dir=directory)
+            with os.fdopen(_fd, 'w') as manifest:
+                json.dump(self.entries, manifest)
+            os.rename(tmp, self.manifest)
+            self.dirty = False
+        except (IOError, OSError) as error:
+            log.warning("Cannot write {}: {}".format(self.manifest, error))
 
 
 class Config(object):
@@ -126,8 +214,9 @@ class Config(object):
         Initialize locations for configuration files
         """
         self.role = kwargs.get('role')
+        self.checksums = kwargs.get('checksums')
         self.base_dir = '/srv/salt/ceph/configuration/files/'
-        self.checksum_dir = self.base_dir + 'ceph.conf.checksum/'
+        self.checksum_dir = CHECKSUM_DIR
         self.checksum_file = self.checksum_dir + self.role.conf_filename + self.role.conf_extension
         log.debug("dependencies of role {}: {}".format(self.role.name,
                                                        self.role.dependencies_unwrapped()))
@@ -138,15 +227,11 @@ class Config(object):
         even if there are multiple files used to configure a role.
         Cleanup old checksumfiles if the config was removed.
         """
-        checksums = ''
-        for _file in self.role.conf_files:
-            if os.path.exists(_file):
-                log.debug("Generating checksum for {}".format(_file))
-                md5 = hashlib.md5(open(_file, 'rb').read()).hexdigest()
-                log.debug("Checksum: {}".format(md5))
-                checksums += md5
-        if checksums:
-            return hashlib.md5(checksums.encode('ascii')).hexdigest()
+        if self.checksums is None:
+            self.checksums = Checksums()
+        md5 = self.checksums.role(self.role)
+        if md5:
+            return md5
         log.debug(("No file found to generate a checksum from. Looked for "
                    "{}".format(self.role.conf_files)))
         if os.path.exists(self.checksum_file):
@@ -202,6 +287,9 @@ def help_():
              'salt-run changed.config name=role:\n\n'
              '    Checks whether the user configured files for the named role has changed\n'
              '\n\n'
+             'salt-run changed.all:\n\n'
+             '    Checks all roles at once\n'
+             '\n\n'
              'salt-run changed.rgw:\n'
              'salt-run changed.mds:\n'
              'salt-run changed.osd:\n'
@@ -228,14 +316,65 @@ def requires_conf_change(**kwargs):
     local = salt.client.LocalClient()
     if role not in cfg.role.dependencies:
         return "Role {} not defined".format(role.name)
-    for deps in cfg.role.dependencies:
-        if Config(role=deps).has_change():
-            search = 'I@cluster:{} and I@roles:{}'.format(cluster, role.name)
-            local.cmd(search, 'grains.setval',
-                      ["restart_{}".format(role.name), True],
-                      tgt_type="compound")
-            return True
-    return False
+    checksums = Checksums()
+    try:
+        for deps in cfg.role.dependencies:
+            if Config(role=deps, checksums=checksums).has_change():
+                search = 'I@cluster:{} and I@roles:{}'.format(cluster, role.name)
+                local.cmd(search, 'grains.setval',
+                          ["restart_{}".format(role.name), True],
+                          tgt_type="compound")
+                return True
+        return False
+    finally:
+        checksums.save()
+
+
+def _roles(rgw_configurations):
+    """
+    Return every role with a configuration file
+    """
+    roles = [Role(role_name='mon', rgw_configurations=rgw_configurations),
+             Role(role_name='storage', conf_filename='osd',
+                  rgw_configurations=rgw_configurations),
+             Role(role_name='mgr', rgw_configurations=rgw_configurations)]
+    for name in rgw_configurations:
+        roles.append(Role(role_name=name, rgw_configurations=rgw_configurations))
+    for name in ['client', 'global', 'mds']:
+        roles.append(Role(role_name=name, rgw_configurations=rgw_configurations))
+    roles.append(Role(role_name='igw', conf_dir='/srv/salt/ceph/igw/cache/',
+                      conf_filename='lrbd', rgw_configurations=rgw_configurations))
+    return roles
+
+
+def all_(cluster='ceph'):
+    """
+    Check every role in one pass.  The rgw configurations are queried once,
+    each checksum file is compared once and shared by all dependent roles,
+    and unchanged files are not read at all.  Sets the restart grain of each
+    changed role.  Returns each role and whether it changed.
+    """
+    # pylint: disable=invalid-name
+    local = salt.client.LocalClient()
+    checksums = Checksums()
+    results = {}
+    changes = {}
+    try:
+        for role in _roles(_rgw_configurations()):
+            for deps in role.dependencies:
+                cfg = Config(role=deps, checksums=checksums)
+                if cfg.checksum_file not in results:
+                    results[cfg.checksum_file] = cfg.has_change()
+                if results[cfg.checksum_file]:
+                    changes[role.name] = True
+            if changes.setdefault(role.name, False):
+                search = 'I@cluster:{} and I@roles:{}'.format(cluster, role.name)
+                local.cmd(search, 'grains.setval',
+                          ["restart_{}".format(role.name), True],
+                          tgt_type="compound")
+    finally:
+        checksums.save()
+    return changes
 
 
 def rgw():
@@ -305,6 +444,7 @@ def config(**kwargs):
 
 
 __func_alias__ = {
+                  'all_': 'all',
                   'global_': 'global',
                   'help_': 'help'
                  }
@@ -18,6 +18,8 @@ import time
 import logging
 import os
 import glob
+import uuid
+from collections import OrderedDict
 
 import salt.loader
 import salt.utils.event
@@ -66,16 +68,36 @@ class FileQueue(object):
         dirs = [os.path.basename(d) for d in dirs]
         return dirs
 
-    def touch(self, item):
+    def _present(self, item):
         """
-        Create or update filename.  Return based on duplicate_fail.
+        Return whether the file exists
+        """
+        return os.path.isfile("{}/{}".format(self.queue_dir, item))
+
+    def _add(self, item):
+        """
+        Create or update the file
         """
         filename = "{}/{}".format(self.queue_dir, item)
-        ret = os.path.isfile(filename)
         with open(filename, "w") as entry:
             log.info("creating {}".format(filename))
             entry.write("")
 
+    def _discard(self, item):
+        """
+        Remove the file
+        """
+        filename = "{}/{}".format(self.queue_dir, item)
+        log.debug("removing {}".format(filename))
+        os.remove(filename)
+
+    def touch(self, item):
+        """
+        Create or update filename.  Return based on duplicate_fail.
+        """
+        ret = self._present(item)
+        self._add(item)
+
         if (ret and 'duplicate_fail' in self.settings and
             self.settings['duplicate_fail']):
             self._fire_event(False, [item, "present"])
@@ -96,10 +118,13 @@ class FileQueue(object):
         """
         List filenames in modification time order
         """
-        mtime = {}
+        # Files touched at the same time would collide as keys, so sort
+        # on modification time and name
+        mtime = []
         for filename in os.listdir(self.queue_dir):
-            mtime[os.stat("{}/{}".format(self.queue_dir, filename)).st_mtime] = filename
-        files = [mtime[k] for k in sorted(mtime.keys())]
+            mtime.append((os.stat("{}/{}".format(self.queue_dir, filename)).st_mtime,
+                          filename))
+        files = [filename for _, filename in sorted(mtime)]
         return files
 
     def empty(self):
@@ -120,10 +145,8 @@ class FileQueue(object):
         """
         Remove file
         """
-        filename = "{}/{}".format(self.queue_dir, item)
-        if os.path.isfile(filename):
-            log.debug("removing {}".format(filename))
-            os.remove(filename)
+        if self._present(item):
+            self._discard(item)
             self._fire_event(True, [item, "remove"])
             return True
         self._fire_event(False, [item, "absent"])
@@ -140,9 +163,8 @@ class FileQueue(object):
         log.debug("queue {} contains {}".format(self.queue_dir, files))
         filename = "{}/{}".format(self.queue_dir, item)
 
-        if os.path.isfile(filename):
-            log.debug("deleting {}".format(filename))
-            os.remove(filename)
+        if self._present(item):
+            self._discard(item)
 
         if len(files) == 1:
             if files[0] == item:
@@ -162,7 +184,7 @@ class FileQueue(object):
         Return whether the file exists
         """
         filename = "{}/{}".format(self.queue_dir, item)
-        ret = os.path.isfile(filename)
+        ret = self._present(item)
         if ret:
             log.info("file {} exists".format(filename))
             self._fire_event(True, [item, "exists"])
@@ -192,6 +214,188 @@ class FileQueue(object):
             event.fire_event(settings, "/".join(tags))
 
 
+class JournalIndex(object):
+    """
+    In memory view of a journal.  The journal starts with a header line that
+    is unique to each rewrite of the file, followed by one record per line.
+    "+ item" adds or refreshes an item and "- item" removes it.  Replaying
+    the records in order yields the items oldest first.
+    """
+
+    def __init__(self):
+        """
+        Start with an empty index
+        """
+        self.reset()
+
+    def reset(self, header=b""):
+        """
+        Forget everything read so far
+        """
+        self.entries = OrderedDict()
+        self.header = header
+        self.offset = len(header)
+        self.records = 0
+
+    def apply(self, record):
+        """
+        Replay a single record
+        """
+        operation, item = record[0], record[2:]
+        self.entries.pop(item, None)
+        if operation == '+':
+            self.entries[item] = True
+        self.records += 1
+
+    def sync(self, journal):
+        """
+        Read records appended since the last sync.  Start over if another
+        process rewrote the journal.
+        """
+        if not os.path.exists(journal):
+            self.reset()
+            return
+        with open(journal, "rb+") as records:
+            header = records.readline()
+            if header != self.header or os.path.getsize(journal) < self.offset:
+                self.reset(header)
+            records.seek(self.offset)
+            for line in records:
+                if not line.endswith(b"\n"):
+                    # Partial record from an interrupted write
+                    log.warning("truncating partial record in {}".format(journal))
+                    records.seek(self.offset)
+                    records.truncate()
+                    break
+                self.apply(line[:-1].decode('utf-8'))
+                self.offset += len(line)
+
+
+def _journal_header():
+    """
+    Identify a new or rewritten journal
+    """
+    return "= {}\n".format(uuid.uuid4().hex).encode('utf-8')
+
+
+# Reactors call the runner from a long lived process.  Keep indexes between
+# calls and only read what other processes appended since.
+try:
+    _INDEXES  # pylint: disable=used-before-assignment
+except NameError:
+    _INDEXES = {}
+
+
+class JournalQueue(FileQueue):
+    """
+    Keep track of a queue in an append only journal.  Order follows the
+    journal rather than modification times and lookups use an in memory
+    index.  Operations must run under Lock.
+    """
+
+    def __init__(self, compact_minimum=64, **kwargs):
+        """
+        Locate the journal next to the lock file
+        """
+        super(JournalQueue, self).__init__(**kwargs)
+        self.journal = "{}/.{}.journal".format(self.root_dir, self.settings['queue'])
+        self.compact_minimum = int(compact_minimum)
+        self.index = None
+
+    def _index(self):
+        """
+        Catch up with the journal on first use, which happens under Lock
+        """
+        if self.index is None:
+            self.index = _INDEXES.setdefault(self.journal, JournalIndex())
+            self.index.sync(self.journal)
+        return self.index
+
+    def _append(self, operation, item):
+        """
+        Write a record and apply it to the index
+        """
+        if "\n" in item:
+            raise ValueError("queue items cannot contain newlines")
+        index = self._index()
+        record = "{} {}".format(operation, item)
+        line = "{}\n".format(record).encode('utf-8')
+        with open(self.journal, "ab") as records:
+            if not index.header:
+                index.reset(_journal_header())
+                records.write(index.header)
+            records.write(line)
+        index.offset += len(line)
+        index.apply(record)
+        self._compact()
+
+    def _compact(self):
+        """
+        Rewrite the journal with only the current items once removed and
+        refreshed records outnumber them
+        """
+        index = self._index()
+        if index.records < max(self.compact_minimum, 2 * len(index.entries)):
+            return
+        log.debug("compacting {}".format(self.journal))
+        entries = index.entries
+        index.reset(_journal_header())
+        compacted = "{}.tmp".format(self.journal)
+        with open(compacted, "wb") as records:
+            records.write(index.header)
+            for item in entries:
+                line = "+ {}\n".format(item).encode('utf-8')
+                records.write(line)
+                index.offset += len(line)
+        os.rename(compacted, self.journal)
+        index.entries = entries
+        index.records = len(entries)
+
+    def _present(self, item):
+        """
+        Return whether the item is queued
+        """
+        return "{}".format(item) in self._index().entries
+
+    def _add(self, item):
+        """
+        Add or refresh the item
+        """
+        log.info("adding {} to {}".format(item, self.journal))
+        self._append('+', "{}".format(item))
+
+    def _discard(self, item):
+        """
+        Remove the item
+        """
+        log.debug("removing {} from {}".format(item, self.journal))
+        self._append('-', "{}".format(item))
+
+    # pylint: disable=invalid-name
+    def ls(self):
+        """
+        List items in alpha-numeric order
+        """
+        return sorted(self._index().entries)
+
+    def items(self):
+        """
+        List items in the order they were added
+        """
+        return list(self._index().entries)
+
+
+def _filequeue(**kwargs):
+    """
+    Return the queue for the requested backend.  The backend options are not
+    settings, keep them out of the events.
+    """
+    if kwargs.pop('backend', 'files') == 'journal':
+        return JournalQueue(**kwargs)
+    kwargs.pop('compact_minimum', None)
+    return FileQueue(**kwargs)
+
+
 class Lock(object):
     """
     Serialize operations on queue
@@ -301,7 +505,14 @@ def help_():
              '    CLI Example:\n\n'
              '        salt-run filequeue.vacant abc\n'
              '        salt-run filequeue.vacant abc queue=prep\n'
-             '        salt-run filequeue.vacant item=abc queue=prep\n')
+             '        salt-run filequeue.vacant item=abc queue=prep\n'
+             '\n\n'
+             'All commands accept backend=journal to keep the queue in an\n'
+             'append only journal instead of one file per item.  Order is\n'
+             'stable and lookups do not scan the queue directory.\n\n'
+             '    CLI Example:\n\n'
+             '        salt-run filequeue.enqueue abc backend=journal\n'
+             '        salt-run filequeue.dequeue backend=journal\n')
     print(usage)
     return ""
 
@@ -311,7 +522,7 @@ def queues(**kwargs):
     List queues
     """
     log.debug("queues: kwargs = {}".format(_skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         return "\n".join(filequeue.dirs())
 
@@ -321,7 +532,7 @@ def enqueue(queue=None, **kwargs):
     Add item
     """
     log.debug("enqueue: queue = {}, kwargs = {}".format(queue, _skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         if queue:
             ret = filequeue.touch(queue)
@@ -353,7 +564,7 @@ def dequeue(**kwargs):
     Remove oldest item
     """
     log.debug("dequeue: kwargs = {}".format(_skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         oldest = list(filequeue.items())[0]
         filequeue.remove(oldest)
@@ -365,7 +576,7 @@ def pop(**kwargs):
     Remove newest item
     """
     log.debug("pop: kwargs = {}".format(_skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         newest = list(filequeue.items())[-1]
         filequeue.remove(newest)
@@ -378,7 +589,7 @@ def ls(**kwargs):
     List items
     """
     log.debug("ls: kwargs = {}".format(_skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         return "\n".join(filequeue.ls())
 
@@ -388,7 +599,7 @@ def items(**kwargs):
     List items in time order
     """
     log.debug("items: kwargs = {}".format(_skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         return "\n".join(list(filequeue.items()))
 
@@ -398,7 +609,7 @@ def empty(**kwargs):
     Check if queue is empty
     """
     log.debug("empty: kwargs = {}".format(_skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         return filequeue.empty()
 
@@ -408,7 +619,7 @@ def check(queue=None, **kwargs):
     Check if item exists
     """
     log.debug("check: queue = {}, kwargs = {}".format(queue, _skip_dunder(kwargs)))
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         if queue:
             return filequeue.check(queue)
@@ -425,7 +636,7 @@ def remove(queue=None, **kwargs):
     """
     log.debug("remove: queue = {}, kwargs = {}".format(queue, _skip_dunder(kwargs)))
 
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         if queue:
             return filequeue.remove(queue)
@@ -442,7 +653,7 @@ def vacate(queue=None, **kwargs):
     """
     log.debug("vacate: queue = {}, kwargs = {}".format(queue, _skip_dunder(kwargs)))
 
-    filequeue = FileQueue(**kwargs)
+    filequeue = _filequeue(**kwargs)
     with Lock(filequeue.settings):
         if queue:
             return filequeue.vacate(queue)
@@ -85,6 +85,8 @@ def ready(**kwargs):
 
         if actual == expected:
             log.warning("All minions are ready")
+            # Newly accepted minions are missing from earlier snapshots
+            __utils__['snapshot.invalidate']()
             break
         log.warning("Waiting on {}".format(",".join(list(expected - actual))))
         if end_time:
@@ -8,15 +8,15 @@ Network utilities
 
 from __future__ import absolute_import
 from __future__ import print_function
-import time
+import csv
 import logging
 import operator
 import re
-# pylint: disable=import-error,3rd-party-module-not-gated
-from netaddr import IPNetwork, IPAddress
+from collections import OrderedDict
 # pylint: disable=relative-import
 # pylint: disable=import-error,3rd-party-module-not-gated,blacklisted-external-import,blacklisted-module
 from six.moves import range
+from six import StringIO
 # pylint: disable=incompatible-py3-code
 
 log = logging.getLogger(__name__)
@@ -45,13 +45,18 @@ def help_():
              'salt-run net.ping exclude=target:\n\n'
              '    Summarizes network connectivity between minion interfaces\n'
              '\n\n'
+             'salt-run net.ping matrix=True [output=csv]:\n\n'
+             '    Returns rtt, loss and mtu of every minion to address pair\n'
+             '    with percentiles per source, destination and network\n'
+             '\n\n'
              'salt-run net.jumbo_ping:\n\n'
              '    Summarizes network connectivity between minion interfaces for jumbo packets\n'
              '\n\n'
              'salt-run net.iperf:\n'
              'salt-run net.iperf ceph:\n'
              'salt-run net.iperf cluster=ceph:\n'
-             'salt-run net.iperf exclude=target:\n\n'
+             'salt-run net.iperf exclude=target:\n'
+             'salt-run net.iperf output=matrix:\n\n'
              '    Summarizes bandwidth throughput between minion interfaces\n'
              '\n\n')
     print(usage)
@@ -71,9 +76,13 @@ def get_cpu_count(server):
 
 def iperf(cluster=None, exclude=None, output=None, **kwargs):
     """
-    iperf server created from the each minions and then clients are created
-    base on the server's cpu count and request that number of other minions
-    as client to hit the server and report the total bendwidth.
+    Measure the bandwidth between every pair of addresses.  The pairs are
+    scheduled as a round robin tournament so that each address takes part
+    in one pairing per round, with both directions tested at once.  Each
+    round is published once and the results arrive as event returns.
+
+    The speed of a host is the average of the bandwidth received from each
+    of the other addresses.
 
     CLI Example: (Before DeepSea with a cluster configuration)
     .. code-block:: bash
@@ -90,12 +99,14 @@ def iperf(cluster=None, exclude=None, output=None, **kwargs):
     To get all host iperf result
         sudo salt-run net.iperf cluster=ceph output=full
 
+    To get the bandwidth of every pair, by server and client
+        sudo salt-run net.iperf cluster=ceph output=matrix
+
     """
     exclude_string = exclude_iplist = None
     if exclude:
         exclude_string, exclude_iplist = _exclude_filter(exclude)
 
-    addresses = []
     local = salt.client.LocalClient()
     # Salt targets can use list or string
     if cluster:
@@ -115,7 +126,9 @@ def iperf(cluster=None, exclude=None, output=None, **kwargs):
         log.debug("iperf: total grains.get {} ".format(total))
         public_addresses = []
         cluster_addresses = []
+        owners = {}
         for host in sorted(six.iterkeys(total)):
+            owners.update((address, host) for address in total[host])
             if 'public_network' in public_networks[host]:
                 public_addresses.extend(
                     _address(total[host],
@@ -126,16 +139,16 @@ def iperf(cluster=None, exclude=None, output=None, **kwargs):
                              cluster_networks[host]['cluster_network']))
             log.debug("iperf: public_network {} ".format(public_addresses))
             log.debug("iperf: cluster_network {} ".format(cluster_addresses))
-        result = {}
-        _create_server(public_addresses)
-        p_result = _create_client(public_addresses)
-        _create_server(cluster_addresses)
-        c_result = _create_client(cluster_addresses)
+        p_result, p_matrix = _bandwidth(local, public_addresses, owners)
+        c_result, c_matrix = _bandwidth(local, cluster_addresses, owners)
+        if output == 'matrix':
+            return {'Public Network': p_matrix, 'Cluster Network': c_matrix}
         p_sort = _add_unit(sorted(list(p_result.items()),
                                   key=operator.itemgetter(1), reverse=True))
         c_sort = _add_unit(sorted(list(c_result.items()),
                                   key=operator.itemgetter(1), reverse=True))
 
+        result = {}
         if output:
             result.update({'Public Network': p_sort})
             result.update({'Cluster Network': c_sort})
@@ -154,9 +167,12 @@ def iperf(cluster=None, exclude=None, output=None, **kwargs):
         if exclude_string:
             search += " and not ( " + exclude_string + " )"
             log.debug("ping: search {} ".format(search))
-        addresses = local.cmd(search, 'grains.get',
-                              ['ipv4'], tgt_type="compound")
-        addresses = _flatten(list(addresses.values()))
+        total = local.cmd(search, 'grains.get',
+                          ['ipv4'], tgt_type="compound")
+        owners = {}
+        for host in sorted(six.iterkeys(total)):
+            owners.update((address, host) for address in total[host])
+        addresses = _flatten(list(total.values()))
         # Lazy loopback removal - use ipaddress when adding IPv6
         try:
             if addresses:
@@ -167,8 +183,9 @@ def iperf(cluster=None, exclude=None, output=None, **kwargs):
                     addresses.remove(ex_ip)
         except ValueError:
             log.debug("ping: remove {} ip doesn't exist".format(ex_ip))
-        _create_server(addresses)
-        result = _create_client(addresses)
+        result, matrix = _bandwidth(local, sorted(addresses), owners)
+        if output == 'matrix':
+            return matrix
         sort_result = _add_unit(sorted(list(result.items()),
                                        key=operator.itemgetter(1),
                                        reverse=True))
@@ -190,74 +207,94 @@ def _add_unit(records):
     return stuff
 
 
-def _create_server(addresses):
+def _tournament(addresses, owners):
     """
-    Start iperf server
+    Pair the addresses with the circle method.  Every address meets every
+    other address once and takes part in at most one pairing per round.
+    Pairings of two addresses on the same minion are skipped.
     """
-    start_service = []
-    local = salt.client.LocalClient()
-    log.debug("net.iperf._create_server: address list {} ".format(addresses))
-    for server in addresses:
-        cpu_core = get_cpu_count(server)
-        log.debug("net.iperf._create_server: server {} cpu count {} "
-                  .format(server, cpu_core))
-        for count in range(cpu_core):
-            log.debug("net.iperf._create_server: server {} count {} port {} "
-                      .format(server, count, 5200+count))
-            start_service.append(local.cmd("S@{}".format(server),
-                                           'multi.iperf_server_cmd',
-                                           [count, 5200+count], tgt_type="compound"))
+    entrants = list(addresses)
+    if len(entrants) % 2:
+        entrants.append(None)
+    rounds = []
+    for _ in range(len(entrants) - 1):
+        pairs = []
+        for index in range(len(entrants) // 2):
+            first, second = entrants[index], entrants[-1 - index]
+            if first is None or second is None:
+                continue
+            if owners.get(first) == owners.get(second):
+                continue
+            pairs.append((first, second))
+        if pairs:
+            rounds.append(pairs)
+        # Keep the first entrant fixed and rotate the others
+        entrants = [entrants[0], entrants[-1]] + entrants[1:-1]
+    return rounds
+
+
+def _ports(addresses, owners):
+    """
+    Give each address of a minion its own iperf server port and cpu so that
+    the addresses of a minion can serve in the same round
+    """
+    seen = {}
+    ports = {}
+    for address in addresses:
+        index = seen.get(owners[address], 0)
+        seen[owners[address]] = index + 1
+        ports[address] = index
+    return ports
 
 
-def _create_client(addresses):
+def _bandwidth(local, addresses, owners):
     """
-    Start iperf client
+    Start the iperf servers with one call, then run the tournament.  Both
+    directions of a pairing run at the same time since links are full
+    duplex.  Returns the average received Mbits/sec of each address and the
+    matrix of Mbits/sec by server and client.
     """
-    results = []
-    jid = []
-    local = salt.client.LocalClient()
-    for server in addresses:
-        cpu_core = get_cpu_count(server)
-        log.debug("net.iperf._create_client: server {} cpu count {} "
-                  .format(server, cpu_core))
-        clients = list(addresses)
-        clients.remove(server)
-        clients_size = len(clients)
-        # pylint: disable=invalid-name
-        for x in range(0, cpu_core, clients_size):
-            # pylint: disable=invalid-name
-            for y, client in enumerate(clients):
-                log.debug("net.iperf._create_client:")
-                log.debug("server port:{}, x:{} client:{} to server:{}"
-                          .format(5200+x+y, x/clients_size, client, server))
-                if x+y < cpu_core:
-                    jid.append(
-                        local.cmd_async(
-                            "S@"+client,
-                            'multi.iperf',
-                            [server, x/clients_size, 5200+x+y],
-                            tgt_type="compound"))
-                    log.debug("net.iperf._create_client:")
-                    log.debug("calling from client:{} ".format(client))
-                    log.debug("to server:{} ".format(server))
-                    log.debug("cpu:{} port:{}".format(x/clients_size, 5200+x+y))
-        log.debug("net.iperf._create_client:")
-        log.debug("Server {} iperf client count {}".format(server, len(jid)))
-        time.sleep(8)
-
-    log.debug("iperf: All Async iperf client count {}".format(len(jid)))
-    not_done = True
-    while not_done:
-        not_done = False
-        for job in jid:
-            if not __salt__['jobs.lookup_jid'](job):
-                log.debug("iperf: job not done {} ".format(job))
-                time.sleep(1)
-                not_done = True
-    results = []
-    for job in jid:
-        results.append(__salt__['jobs.lookup_jid'](job))
-    return _summarize_iperf(results)
+    if not addresses:
+        return {}, {}
+    ports = _ports(addresses, owners)
+    minions = sorted(set(owners[address] for address in addresses))
+    count = max(ports.values()) + 1
+    log.debug("net.iperf._bandwidth: starting {} servers on {}".format(count, minions))
+    local.cmd(minions, 'multi.prepare_iperf_server', [count], tgt_type="list")
+
+    matrix = dict((address, {}) for address in addresses)
+    for pairs in _tournament(addresses, owners):
+        tests = {}
+        for first, second in pairs:
+            for client, server in [(first, second), (second, first)]:
+                tests.setdefault(owners[client], []).append(
+                    [client, server, ports[server], 5200 + ports[server]])
+        log.debug("net.iperf._bandwidth: round {}".format(tests))
+        for ret in local.cmd_iter(list(tests), 'multi.iperf_round', [tests],
+                                  tgt_type="list"):
+            for minion in ret:
+                for summary in ret[minion].get('ret') or []:
+                    if isinstance(summary, dict):
+                        matrix[summary['server']][summary['client']] = _mbits(summary)
+
+    local.cmd(minions, 'multi.kill_iperf_cmd', tgt_type="list")
+    result = {}
+    for server in matrix:
+        speeds = list(matrix[server].values())
+        result[server] = int(sum(speeds) / len(speeds)) if speeds else 0
+    return result, matrix
+
+
+def _mbits(summary):
+    """
+    Return the Mbits/sec of a multi.iperf summary, 0 when the test failed
+    """
+    if not summary.get('succeeded'):
+        return 0
+    try:
+        return float(summary['filter'].split()[0])
+    except (KeyError, IndexError, ValueError):
+        return 0
 
 
 def jumbo_ping(cluster=None, exclude=None, **kwargs):
@@ -267,11 +304,15 @@ def jumbo_ping(cluster=None, exclude=None, **kwargs):
     ping(cluster, exclude, ping_type="jumbo")
 
 
-def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
+def ping(cluster=None, exclude=None, ping_type=None, matrix=False, output=None, **kwargs):
     """
     Ping all addresses from all addresses on all minions.  If cluster is passed,
     restrict addresses to public and cluster networks.
 
+    With matrix=True, return the rtt, loss and mtu of every minion to address
+    pair as columns along with percentiles per source, destination and
+    network.  Add output=csv for one row per pair instead.
+
     Note: Some optimizations could be done here in the multi module (such as
     skipping the source and destination when they are the same).  However, the
     unoptimized version is taking ~2.5 seconds on 18 minions with 72 addresses
@@ -300,7 +341,7 @@ def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
     if _skip_dunder(kwargs):
         print("Unsupported parameters:{}".format(" ,".join(list(extra_kwargs.keys()))))
         text = re.sub(re.compile("^ {12}", re.MULTILINE), "", '''
-            salt-run net.ping [cluster] [exclude]
+            salt-run net.ping [cluster] [exclude] [matrix=True] [output=csv]
 
             Ping all addresses from all addresses on all minions.
             If cluster is specified, restrict addresses to cluster networks.
@@ -318,6 +359,7 @@ def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
                 salt-run net.ping exclude=S@192.168.21.254
                 salt-run net.ping exclude=S@192.168.21.0/29
                 salt-run net.ping exclude="E@host*,host-osd-name*,192.168.1.1"
+                salt-run net.ping ceph matrix=True output=csv
         ''')
         print(text)
         return ""
@@ -333,13 +375,13 @@ def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
                              tgt_type="compound")
         total = local.cmd(search, 'grains.get', ['ipv4'], tgt_type="compound")
         addresses = []
+        labels = {}
         for host in sorted(six.iterkeys(total)):
-            if 'cluster_network' in networks[host]:
-                addresses.extend(_address(total[host],
-                                          networks[host]['cluster_network']))
-            if 'public_network' in networks[host]:
-                addresses.extend(_address(total[host],
-                                          networks[host]['public_network']))
+            for name in ['cluster_network', 'public_network']:
+                if name in networks[host]:
+                    matched = _address(total[host], networks[host][name])
+                    addresses.extend(matched)
+                    labels.update((address, networks[host][name]) for address in matched)
     else:
         # pylint: disable=redefined-variable-type
         search = __utils__['deepsea_minions.show']()
@@ -351,6 +393,7 @@ def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
                               ['ipv4'], tgt_type="compound")
 
         addresses = _flatten(list(addresses.values()))
+        labels = {}
         # Lazy loopback removal - use ipaddress when adding IPv6
         try:
             if addresses:
@@ -361,6 +404,18 @@ def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
                     addresses.remove(ex_ip)
         except ValueError:
             log.debug("ping: remove {} ip doesn't exist".format(ex_ip))
+        if matrix:
+            labels = _subnet_labels(local, search, addresses)
+    if matrix:
+        results = local.cmd(search, 'multi.ping_stats',
+                            addresses + ['mtu=True'], tgt_type="compound")
+        columns = _matrix(results, labels)
+        if output == 'csv':
+            return _csv(columns)
+        return {'columns': columns,
+                'percentiles': {'source': _percentiles(columns, 'source'),
+                                'destination': _percentiles(columns, 'destination'),
+                                'network': _percentiles(columns, 'network')}}
     if ping_type == "jumbo":
         results = local.cmd(search, 'multi.jumbo_ping',
                             addresses, tgt_type="compound")
@@ -371,17 +426,110 @@ def ping(cluster=None, exclude=None, ping_type=None, **kwargs):
     return ""
 
 
+def _subnet_labels(local, search, addresses):
+    """
+    Label each address with the subnet of the minion interface holding it
+    """
+    interfaces = local.cmd(search, 'network.interfaces', [], tgt_type="compound")
+    subnets = set()
+    for minion in interfaces:
+        if not isinstance(interfaces[minion], dict):
+            log.error("ping: {} returned {}".format(minion, interfaces[minion]))
+            continue
+        for nic in interfaces[minion].values():
+            for addr in nic.get('inet', []):
+                subnets.add(str(__utils__['networks.interface_network'](
+                    addr['address'], addr['netmask'])))
+    labels = __utils__['networks.classify'](addresses, sorted(subnets))
+    return dict((address, network) for address, network in labels.items() if network)
+
+
+MATRIX_COLUMNS = ['source', 'destination', 'network', 'rc', 'loss',
+                  'min', 'avg', 'max', 'mdev', 'mtu']
+
+
+def _matrix(results, labels):
+    """
+    Flatten the multi.ping_stats of each minion into columns with one row
+    per source and destination.  Loss is a percentage, times are ms.
+    """
+    columns = OrderedDict((name, []) for name in MATRIX_COLUMNS)
+    for source in sorted(results):
+        if not isinstance(results[source], dict):
+            log.error("ping: {} returned {}".format(source, results[source]))
+            continue
+        for destination in sorted(results[source]):
+            stat = results[source][destination]
+            loss = 100.0
+            if stat['sent']:
+                loss = 100.0 * (stat['sent'] - stat['received']) / stat['sent']
+            columns['source'].append(source)
+            columns['destination'].append(destination)
+            columns['network'].append(labels.get(destination, ''))
+            columns['loss'].append(loss)
+            for name in ['rc', 'min', 'avg', 'max', 'mdev', 'mtu']:
+                columns[name].append(stat.get(name))
+    return columns
+
+
+def _percentile(ordered, pct):
+    """
+    Linear interpolation between the closest ranks of a sorted list
+    """
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * pct / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def _percentiles(columns, key):
+    """
+    Group the average rtt of each pair by a column and return the count,
+    failures and the 50th, 90th and 99th percentile and maximum of each group
+    """
+    groups = OrderedDict()
+    for index, group in enumerate(columns[key]):
+        if not group:
+            continue
+        entry = groups.setdefault(group, {'rtt': [], 'failed': 0, 'count': 0})
+        entry['count'] += 1
+        if columns['rc'][index] == 0:
+            entry['rtt'].append(columns['avg'][index])
+        else:
+            entry['failed'] += 1
+
+    summary = OrderedDict()
+    for group, entry in groups.items():
+        ordered = sorted(entry['rtt'])
+        summary[group] = {'count': entry['count'],
+                          'failed': entry['failed'],
+                          'p50': _percentile(ordered, 50),
+                          'p90': _percentile(ordered, 90),
+                          'p99': _percentile(ordered, 99),
+                          'max': ordered[-1] if ordered else None}
+    return summary
+
+
+def _csv(columns):
+    """
+    Render the columns as CSV with a header row
+    """
+    text = StringIO()
+    writer = csv.writer(text, lineterminator='\n')
+    writer.writerow(list(columns))
+    for row in zip(*columns.values()):
+        writer.writerow(['' if value is None else value for value in row])
+    return text.getvalue()
+
+
 def _address(addresses, network):
     """
     Return all addresses in the given network
-
-    Note: list comprehension vs. netaddr vs. simple
     """
-    matched = []
-    for address in addresses:
-        log.debug("_address: ip {} in network {} ".format(address, network))
-        if IPAddress(address) in IPNetwork(network):
-            matched.append(address)
+    matched = __utils__['networks.matching'](addresses, network)
+    log.debug("_address: {} in network {} ".format(matched, network))
     return matched
 
 
@@ -492,53 +640,6 @@ def _summarize(total, results):
         print("Errored: \n    {}".format("\n    ".join(errored)))
 
 
-def _iperf_result_get_server(result):
-    """
-    Return server results
-    """
-    return result['server']
-
-
-def _summarize_iperf(results):
-    """
-    iperf summarize the successes, failures and errors across all minions
-    """
-    server_results = {}
-    log.debug("Results {} ".format(results))
-    for result in results:
-        for host in result:
-            log.debug("Server {}".format(result[host]['server']))
-            if not result[host]['server'] in server_results:
-                server_results.update({result[host]['server']: ""})
-            if result[host]['succeeded']:
-                log.debug("filter:\n{}".format(result[host]['filter']))
-                server_results[result[host]['server']] +=\
-                        " " + result[host]['filter']
-                log.debug("Speed {}".
-                          format(server_results[result[host]['server']]))
-            elif result[host]['failed']:
-                log.debug("failed:\n{}".format(result[host]['failed']))
-                server_results[result[host]['server']] +=\
-                        " Failed to connect from {}".format(host)
-            elif result[host]['errored']:
-                log.debug("errored :\n{}".format(result[host]['errored']))
-                server_results[result[host]['server']] +=\
-                        " {} iperf error check installation.".format(host)
-
-    for key, result in six.iteritems(server_results):
-        total = 0
-        speed = result.split('Mbits/sec')
-        speed = [_f for _f in speed if _f]
-        try:
-            for value in speed:
-                total += float(value.strip())
-            # server_results[key] = str(total) + " Mbits/sec"
-            server_results[key] = int(total)
-        except ValueError:
-            continue
-    return server_results
-
-
 def _skip_dunder(settings):
     """
     Skip double underscore keys
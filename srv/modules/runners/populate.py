@@ -42,16 +42,13 @@ import time
 from base64 import b64encode
 import errno
 import uuid
-import ipaddress
 import logging
-# pylint: disable=relative-import
-import operator
 import pprint
 
 import sys
 import six
 from six.moves import range
-from functools import reduce, cmp_to_key
+from functools import cmp_to_key
 
 try:
     import configparser
@@ -632,7 +629,7 @@ class CephRoles(object):
         """
         Return CIDR network
         """
-        return ipaddress.ip_interface(u'{}/{}'.format(address, netmask)).network
+        return __utils__['networks.interface_network'](address, netmask)
 
     def public_cluster(self, networks):
         """
@@ -663,10 +660,9 @@ class CephRoles(object):
         cmd_result = local.cmd(self.search, 'cmd.run', ['hostname -i'], tgt_type="compound")
         for _, addrs in cmd_result.items():
             addr_list = addrs.split(' ')
-            public_addrs.extend([ipaddress.ip_address(u'{}'.format(addr))
-                                 for addr in addr_list if not addr.startswith('127.')])
+            public_addrs.extend([addr for addr in addr_list if not addr.startswith('127.')])
         for _, network in priorities:
-            if reduce(operator.__or__, [addr in network for addr in public_addrs], False):
+            if __utils__['networks.matching'](public_addrs, [network]):
                 public_networks.append(network)
         for network in public_networks:
             networks.pop(network)
@@ -675,12 +671,11 @@ class CephRoles(object):
         master_addrs = []
         __opts__ = salt.config.minion_config('/etc/salt/minion')
         __grains__ = salt.loader.grains(__opts__)
-        master_addrs.extend([ipaddress.ip_address(u'{}'.format(addr))
-                            for addr in __grains__['ipv4'] if not addr.startswith('127.')])
+        master_addrs.extend([addr for addr in __grains__['ipv4'] if not addr.startswith('127.')])
         for _, network in priorities:
             if network not in networks:
                 continue
-            if reduce(operator.__and__, [addr not in network for addr in master_addrs], True) and \
+            if not __utils__['networks.matching'](master_addrs, [network]) and \
                len(networks[network]) > 1:
                 cluster_networks.append(network)
         for network in cluster_networks:
@@ -707,10 +702,7 @@ class CephRoles(object):
         for network in public_networks:
             to_remove = []
             for key, addr_list in cmd_result.items():
-                if reduce(operator.__or__,
-                          [ipaddress.ip_address(u'{}'.format(addr)) in network
-                           for addr in addr_list],
-                          False):
+                if __utils__['networks.matching'](addr_list, [network]):
                     to_remove.append(key)
             for key in to_remove:
                 cmd_result.pop(key)
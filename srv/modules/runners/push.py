@@ -91,6 +91,8 @@ def proposal(filename="/srv/pillar/ceph/proposals/policy.cfg", dryrun=False):
     pillar_data = PillarData(dryrun)
     common = pillar_data.organize(filename)
     pillar_data.output(common)
+    if not dryrun:
+        __utils__['snapshot.invalidate']()
     return True
 
 
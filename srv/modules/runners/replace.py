@@ -9,6 +9,7 @@ from __future__ import print_function
 import time
 import logging
 import os
+from collections import OrderedDict
 import yaml
 
 # pylint: disable=import-error,3rd-party-module-not-gated,redefined-builtin
@@ -17,14 +18,23 @@ import salt.runner
 
 log = logging.getLogger(__name__)
 
+# Seconds to wait for draining OSDs without any progress
+DRAIN_TIMEOUT = 600
+
 
 def help_():
     """
     Usage
     """
     usage = (
-        "salt-run replace.osd id [id ...][force=True][timeout=value][delay=value]:\n\n"
+        "salt-run replace.osd id [id ...][force=True][timeout=value][delay=value]\n"
+        "                     [batch=value][failure_domain=value]:\n\n"
         "    Removes an OSD from a minion\n"
+        "\n"
+        "    Up to batch OSDs (default 1) drain at the same time, spread across\n"
+        "    failure domains (default host).  Each OSD is removed as soon as\n"
+        "    Ceph reports it safe to destroy.  Draining stops when timeout\n"
+        "    seconds (default 600) pass without progress.\n"
         "\n\n"
     )
     print(usage)
@@ -59,18 +69,35 @@ def osd(*args, **kwargs):
     host_osds = local.cmd("I@roles:storage", "osd.list", tgt_type="compound")
     assert isinstance(host_osds, dict)
 
+    hosts = OrderedDict()
     for osd_id in osds:
         host = _find_host(osd_id, host_osds)
         if host:
-            grains = local.cmd(host, "grains.get", ["ceph"], tgt_type="compound")
-            msg = _remove_osd(local, master_minion, osd_id, passed, host)
-            if msg:
-                print("{}\nFailed to remove osd {}".format(msg, osd_id))
-                osds.remove(osd_id)
-                continue
-
-            # Rename minion profile
-            minion_profile(host, osds, grains, context)
+            hosts[osd_id] = host
+
+    if kwargs.get('force'):
+        ready = list(hosts)
+    else:
+        ready = _drain(local, master_minion, hosts, kwargs)
+
+    attempted = []
+    for osd_id in ready:
+        attempted.append(osd_id)
+        host = hosts[osd_id]
+        grains = local.cmd(host, "grains.get", ["ceph"], tgt_type="compound")
+        msg = _remove_osd(local, master_minion, osd_id, passed, host)
+        if msg:
+            print("{}\nFailed to remove osd {}".format(msg, osd_id))
+            osds.remove(osd_id)
+            continue
+
+        # Rename minion profile
+        minion_profile(host, osds, grains, context)
+
+    for osd_id in hosts:
+        if osd_id not in attempted:
+            print("osd {} did not drain - not removed".format(osd_id))
+            osds.remove(osd_id)
 
     if "called" in kwargs and kwargs["called"]:
         # Return for remove.osd
@@ -107,6 +134,111 @@ def _checks_failed(osds, kwargs):
     return False
 
 
+def _drain(local, master_minion, hosts, kwargs):
+    """
+    Set up to batch OSDs out with zero weight, spread across failure
+    domains.  Yield each OSD once it is safe to destroy and start draining
+    the next.  One osd.drain_status call covers all draining OSDs.
+
+    Give up when timeout seconds pass without an OSD becoming safe or the
+    remaining PGs going down.  The OSDs that did not drain stay out.
+    """
+    batch = int(kwargs.get('batch', 1))
+    delay = int(kwargs.get('delay', 6))
+    timeout = int(kwargs.get('timeout', DRAIN_TIMEOUT))
+    if batch > 1:
+        tree = local.cmd(master_minion, "osd.tree_from_master",
+                         tgt_type="compound").get(master_minion)
+        if not isinstance(tree, dict):
+            log.warning("No osd tree from {}: {}".format(master_minion, tree))
+            tree = {}
+        domains = _failure_domains(tree, hosts, kwargs.get('failure_domain', 'host'))
+    else:
+        domains = hosts
+
+    pending = OrderedDict()
+    for osd_id in hosts:
+        pending.setdefault(domains[osd_id], []).append(osd_id)
+    draining = []
+    remaining = None
+    deadline = time.time() + timeout
+
+    while pending or draining:
+        while pending and len(draining) < batch:
+            osd_id = _next_osd(pending, draining, domains)
+            print("Draining osd {} on minion {}".format(osd_id, hosts[osd_id]))
+            local.cmd(master_minion, "cmd.run",
+                      ["ceph osd out {}".format(osd_id)], tgt_type="compound")
+            local.cmd(hosts[osd_id], "osd.zero_weight", [osd_id, "wait=False"])
+            draining.append(osd_id)
+
+        status = local.cmd(master_minion, "osd.drain_status", draining,
+                           tgt_type="compound").get(master_minion)
+        if not isinstance(status, dict) or 'safe' not in status or 'pgs' not in status:
+            log.warning("osd.drain_status failed on {}: {}".format(master_minion, status))
+            status = {'safe': [], 'pgs': {}}
+
+        safe = [osd_id for osd_id in draining if int(osd_id) in status['safe']]
+        for osd_id in safe:
+            draining.remove(osd_id)
+            deadline = time.time() + timeout
+            yield osd_id
+        if draining and not safe:
+            counts = [status['pgs'].get(str(osd_id)) for osd_id in draining]
+            if None not in counts and (remaining is None or sum(counts) < remaining):
+                remaining = sum(counts)
+                deadline = time.time() + timeout
+            if time.time() >= deadline:
+                stuck = draining + [osd_id for domain in pending
+                                    for osd_id in pending[domain]]
+                msg = ("Timeout expired - osds {} did not drain within {} "
+                       "seconds".format(", ".join(stuck), timeout))
+                log.error(msg)
+                print(msg)
+                return
+            print("  PGs remaining: {}".format(
+                ", ".join("osd.{} {}".format(osd_id, count)
+                          for osd_id, count in zip(draining, counts))))
+            time.sleep(delay)
+
+
+def _next_osd(pending, draining, domains):
+    """
+    Take the next OSD from the failure domain with the fewest draining
+    """
+    load = {}
+    for osd_id in draining:
+        load[domains[osd_id]] = load.get(domains[osd_id], 0) + 1
+    domain = min(pending, key=lambda domain: load.get(domain, 0))
+    osd_id = pending[domain].pop(0)
+    if not pending[domain]:
+        del pending[domain]
+    return osd_id
+
+
+def _failure_domains(tree, hosts, bucket_type):
+    """
+    Map each OSD to its enclosing crush bucket of bucket_type.  OSDs
+    missing from the tree use their minion.
+    """
+    nodes = {node['id']: node for node in tree.get('nodes', [])}
+    parents = {}
+    for node in nodes.values():
+        for child in node.get('children', []):
+            parents[child] = node['id']
+
+    domains = {}
+    for osd_id in hosts:
+        domains[osd_id] = hosts[osd_id]
+        node_id = parents.get(int(osd_id))
+        while node_id is not None:
+            if nodes[node_id]['type'] == bucket_type:
+                domains[osd_id] = nodes[node_id]['name']
+                break
+            node_id = parents.get(node_id)
+    return domains
+
+
 def _remove_osd(local, master_minion, osd_id, passed, host):
     """
     Set OSD to out, remove OSD from minion
@@ -27,6 +27,10 @@ def help_():
              '    possibly formatted with format string\n'
              '    Note that the format string must contain exactly one {}\n'
              '\n\n'
+             'salt-run select.minions cached=True key=value [key=value...]:\n\n'
+             '    Return the minions from the master cache without querying them,\n'
+             '    including minions that are down\n'
+             '\n\n'
              'salt-run select.one_minion key=value [key=value...]:\n\n'
              '    Return a random single minion that meets the critieria\n'
              '\n\n'
@@ -47,16 +51,20 @@ def help_():
     return ""
 
 
-def _grain_host(client, minion):
+def _grain_hosts(search):
     """
-    Return the host grain for a given minion, for use a short hostname
+    Return the host grain for each minion matching the search, for use as a
+    short hostname
     """
-    return list(client.cmd(minion, 'grains.item', ['host']).values())[0]['host']
+    return __utils__['snapshot.grains'](search, 'host')
 
 
-def minions(host=False, format='{}', **kwargs):
+def minions(host=False, format='{}', cached=False, **kwargs):
     """
     Some targets needs to match all minions within a search criteria.
+
+    Only minions that respond are returned unless cached is set, which reads
+    the master cache instead and includes minions that are down.
     """
     if not isinstance(format, str):
         raise TypeError("format argument is not a string")
@@ -72,18 +80,22 @@ def minions(host=False, format='{}', **kwargs):
 
     search = " and ".join(criteria)
 
-    # When search matches no minions, salt prints to stdout.  Suppress stdout.
-    _stdout = sys.stdout
-    sys.stdout = open(os.devnull, 'w')
+    if cached:
+        _minions = __utils__['snapshot.minions'](search)
+    else:
+        # When search matches no minions, salt prints to stdout.  Suppress stdout.
+        _stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
 
-    local = salt.client.LocalClient()
-    _minions = local.cmd(search, 'pillar.get', ['id'], tgt_type="compound")
+        local = salt.client.LocalClient()
+        _minions = local.cmd(search, 'pillar.get', ['id'], tgt_type="compound")
 
-    sys.stdout = _stdout
+        sys.stdout = _stdout
 
     if host:
-        return [format.format(_grain_host(local, k)) for k in _minions.keys()]
-    return [format.format(m) for m in _minions.keys()]
+        hosts = _grain_hosts(search)
+        return [format.format(hosts.get(k, k)) for k in _minions]
+    return [format.format(m) for m in _minions]
 
 
 def one_minion(**kwargs):
@@ -131,7 +143,8 @@ def public_addresses(tuples=False, host=False, **kwargs):
 
     if tuples:
         if host:
-            addresses = [[_grain_host(local, k), v] for k, v in result.items()]
+            hosts = _grain_hosts(search)
+            addresses = [[hosts.get(k, k), v] for k, v in result.items()]
         else:
             addresses = [[k, v] for k, v in result.items()]
     else:
@@ -157,17 +170,11 @@ def attr(host=False, **kwargs):
 
     search = " and ".join(criteria)
 
-    # When search matches no minions, salt prints to stdout.  Suppress stdout.
-    _stdout = sys.stdout
-    sys.stdout = open(os.devnull, 'w')
-
-    local = salt.client.LocalClient()
-    _minions = local.cmd(search, 'pillar.get', [attribute], tgt_type="compound")
-
-    sys.stdout = _stdout
+    _minions = __utils__['snapshot.pillar'](search, attribute)
 
     if host:
-        pairs = [[_grain_host(local, k), v] for k, v in _minions.items()]
+        hosts = _grain_hosts(search)
+        pairs = [[hosts.get(k, k), v] for k, v in _minions.items()]
     else:
         pairs = [[k, v] for k, v in _minions.items()]
     return pairs
@@ -187,34 +194,37 @@ def from_(pillar, role, *args, **kwargs):
     if 'attr' in kwargs:
         args = re.split(r',\s*', kwargs['attr'])
 
-    # When search matches no minions, salt prints to stdout.  Suppress stdout.
-    _stdout = sys.stdout
-    sys.stdout = open(os.devnull, 'w')
-
-    local = salt.client.LocalClient()
     search = "I@roles:master"
     try:
-        roles = list(local.cmd(search, 'pillar.get', [pillar], tgt_type="compound").values())[0]
+        roles = list(__utils__['snapshot.pillar'](search, pillar).values())[0]
     # pylint: disable=bare-except
     except:
         roles = []
 
-    sys.stdout = _stdout
-
     if not roles:
         # With no pillar variable, check for minions with assigned role
         result = minions(roles=role)
         if result:
             roles = [role]
 
+    if not roles:
+        return [[None] * (1 + len(args))]
+
+    # Resolve every role and the grains of every matched minion with one
+    # query each rather than one per role and one per minion
+    search = " or ".join(["I@roles:{}".format(_role) for _role in roles])
+    assigned = __utils__['snapshot.pillar'](search, 'roles', default=[])
+    role_grains = __utils__['snapshot.grains'](search)
+
     results = []
     for _role in roles:
-        minion_list = minions(roles=_role)
-        for minion in minion_list:
-            grains_result = list(local.cmd(minion, 'grains.item', list(args)).values())[0]
+        for minion in assigned:
+            if _role not in assigned[minion]:
+                continue
+            grains_result = role_grains.get(minion, {})
             small = [_role]
             for arg in list(args):
-                small.append(grains_result[arg])
+                small.append(grains_result.get(arg, ''))
             results.append(small)
 
     if results:
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=modernize-parse-error
+"""
+Runners query pillar and grains through a short lived snapshot of the master
+cache.  Drop it after changing the pillar or the accepted keys so that the
+following steps of an orchestration see the change.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def help_():
+    """
+    Usage
+    """
+    usage = ('salt-run snapshot.invalidate:\n\n'
+             '    Forget the memoized pillar and grains data\n'
+             '\n\n')
+    print(usage)
+    return ""
+
+
+def invalidate():
+    """
+    Drop the memoized pillar and grains data of this process
+    """
+    log.debug("Invalidating pillar and grains snapshot")
+    return __utils__['snapshot.invalidate']()
+
+__func_alias__ = {
+                 'help_': 'help',
+                 }
@@ -21,8 +21,9 @@ def _get_data(cluster_name='ceph'):
     # grains might be inaccurate or not up to date because they are designed
     # to hold static data about the minion. In case of an update though, the
     # data will change.  grains are refreshed on reboot(restart of the service).
-    os_codename = local.cmd(search, 'grains.get', ['oscodename'], tgt_type="compound")
-    salt_version = local.cmd(search, 'grains.get', ['saltversion'], tgt_type="compound")
+    # The master caches the same grains, so read them from the snapshot.
+    os_codename = __utils__['snapshot.grains'](search, 'oscodename')
+    salt_version = __utils__['snapshot.grains'](search, 'saltversion')
     ceph_version = local.cmd(search, 'cmd.shell', ['ceph --version'], tgt_type="compound")
 
     return os_codename, salt_version, ceph_version
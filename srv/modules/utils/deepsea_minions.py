@@ -16,6 +16,7 @@ import os
 import logging
 # pylint: disable=import-error,3rd-party-module-not-gated,redefined-builtin
 import salt.client
+import salt.utils.master
 
 log = logging.getLogger(__name__)
 
@@ -33,6 +34,22 @@ class DeepseaMinions(object):
         self.deepsea_minions = self._query()
         self.matches = self._matches()
 
+    # pylint: disable=no-self-use
+    def _cached(self, tgt, tgt_type):
+        """
+        Returns the pillar cached on the master for the target or None if
+        any matched minion has no cached pillar
+        """
+        pillar_util = salt.utils.master.MasterPillarUtil(tgt, tgt_type,
+                                                         use_cached_grains=True,
+                                                         grains_fallback=False,
+                                                         pillar_fallback=False,
+                                                         opts=__opts__)
+        cached = pillar_util.get_minion_pillar()
+        if not cached or not all(cached.values()):
+            return None
+        return cached
+
     def _query(self):
         """
         Returns the value of deepsea_minions
@@ -44,9 +61,20 @@ class DeepseaMinions(object):
 
         # Relying on side effect - pylint: disable=unused-variable
         ret = self.local.cmd('*', 'saltutil.pillar_refresh')
-        minions = self.local.cmd('*', 'pillar.get', ['deepsea_minions'],
-                                 tgt_type="compound")
         sys.stdout = _stdout
+
+        # The refresh updates the pillar cached on the master.  Only ask the
+        # minions when nothing is cached.
+        minions = self._cached('*', 'glob')
+        if not minions:
+            _stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')
+            minions = self.local.cmd('*', 'pillar.get', ['deepsea_minions'],
+                                     tgt_type="compound")
+            sys.stdout = _stdout
+        else:
+            minions = {minion: minions[minion].get('deepsea_minions')
+                       for minion in minions}
         for minion in minions:
             if minions[minion]:
                 return minions[minion]
@@ -59,6 +87,9 @@ class DeepseaMinions(object):
         Returns the list of matched minions
         """
         if self.deepsea_minions:
+            cached = self._cached(self.deepsea_minions, 'compound')
+            if cached:
+                return list(cached.keys())
             # When search matches no minions, salt prints to stdout.
             # Suppress stdout.
             _stdout = sys.stdout
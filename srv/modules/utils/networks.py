@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=modernize-parse-error
+"""
+Classify addresses into networks.
+
+Each CIDR is parsed once into an integer network and mask.  An address is
+then matched by masking its integer value with each distinct prefix length,
+longest first, and looking the result up in a dictionary.  Classifying many
+addresses costs one parse per address instead of building address and
+network objects for every pair.  IPv4 and IPv6 are both supported.
+"""
+
+from __future__ import absolute_import
+import logging
+import socket
+import struct
+import ipaddress
+
+log = logging.getLogger(__name__)
+
+_CLASSIFIERS = {}
+
+
+def _text(value):
+    """
+    ipaddress wants unicode text, minions may return bytes
+    """
+    if isinstance(value, bytes):
+        value = value.decode()
+    return u'{}'.format(value).strip()
+
+
+def _split(networks):
+    """
+    Accept a single network, a comma separated string or a list
+    """
+    if isinstance(networks, (list, tuple, set)):
+        return list(networks)
+    if isinstance(networks, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+        return [networks]
+    return [network.strip() for network in _text(networks).split(',') if network.strip()]
+
+
+class Classifier(object):
+    """
+    Longest prefix match of addresses against a fixed set of networks
+    """
+
+    def __init__(self, networks):
+        """
+        Build one table per IP version and prefix length
+        """
+        tables = {}
+        for original in _split(networks):
+            if isinstance(original, (ipaddress.IPv4Network, ipaddress.IPv6Network)):
+                parsed = original
+            else:
+                parsed = ipaddress.ip_network(_text(original), strict=False)
+            table = tables.setdefault((parsed.version, parsed.prefixlen), {})
+            table.setdefault(int(parsed.network_address), original)
+
+        self.masks = {}
+        for version, prefixlen in sorted(tables, key=lambda key: -key[1]):
+            bits = 32 if version == 4 else 128
+            mask = ((1 << prefixlen) - 1) << (bits - prefixlen)
+            self.masks.setdefault(version, []).append((mask, tables[(version, prefixlen)]))
+
+    def network(self, address):
+        """
+        Return the most specific network containing address or None
+        """
+        parsed = _parse(address)
+        if parsed is None:
+            log.debug("Not an address: {}".format(address))
+            return None
+        version, value = parsed
+        for mask, table in self.masks.get(version, []):
+            if value & mask in table:
+                return table[value & mask]
+        return None
+
+
+def _parse(address):
+    """
+    Return the IP version and integer value of an address.  inet_pton is
+    strict and much faster than building an ipaddress object.
+    """
+    # Drop an IPv6 scope such as %eth0
+    text = _text(address).split('%')[0]
+    try:
+        return 4, struct.unpack('!I', socket.inet_pton(socket.AF_INET, text))[0]
+    except (socket.error, ValueError):
+        pass
+    try:
+        high, low = struct.unpack('!QQ', socket.inet_pton(socket.AF_INET6, text))
+        return 6, high << 64 | low
+    except (socket.error, ValueError):
+        return None
+
+
+def _classifier(networks):
+    """
+    Reuse the classifier for the same networks within this process
+    """
+    key = tuple(str(network) for network in _split(networks))
+    if key not in _CLASSIFIERS:
+        if len(_CLASSIFIERS) > 64:
+            _CLASSIFIERS.clear()
+        _CLASSIFIERS[key] = Classifier(networks)
+    return _CLASSIFIERS[key]
+
+
+def classify(addresses, networks):
+    """
+    Return a dictionary of each address and its network, None when no
+    network contains the address
+    """
+    classifier = _classifier(networks)
+    return dict((address, classifier.network(address)) for address in addresses)
+
+
+def matching(addresses, networks):
+    """
+    Return the addresses in any of the networks, keeping their order
+    """
+    classifier = _classifier(networks)
+    return [address for address in addresses if classifier.network(address) is not None]
+
+
+def interface_network(address, netmask):
+    """
+    Return the network of an interface address and netmask
+    """
+    return ipaddress.ip_interface(u'{}/{}'.format(_text(address), _text(netmask))).network
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=modernize-parse-error
+"""
+Orchestrations query the same pillar and grains values many times during a
+single stage.  Each LocalClient query publishes to every minion and waits for
+all returns.  The master already keeps a copy of each minion's pillar and
+grains when minion_data_cache is enabled (the default), so read those instead
+and remember the result for a short time.
+
+The snapshot falls back to a live query when the master cache has no data for
+any of the targeted minions.  Call invalidate after changing pillar data.
+"""
+
+from __future__ import absolute_import
+import os
+import sys
+import time
+import logging
+# pylint: disable=import-error,3rd-party-module-not-gated,redefined-builtin
+import salt.client
+import salt.utils.master
+
+log = logging.getLogger(__name__)
+
+DEFAULT_TTL = 30
+
+
+class Snapshot(object):
+    """
+    TTL bounded view of the pillar and grains data cached on the master
+    """
+
+    def __init__(self, opts, ttl=DEFAULT_TTL):
+        """
+        Keep the master opts for MasterPillarUtil and an empty memo
+        """
+        self.opts = opts
+        self.ttl = ttl
+        self.entries = {}
+
+    def _lookup(self, key, loader):
+        """
+        Return the memoized value for key or call loader when missing or
+        expired
+        """
+        now = time.time()
+        if key in self.entries:
+            stamp, data = self.entries[key]
+            if now - stamp < self.ttl:
+                return data
+        data = loader()
+        self.entries[key] = (now, data)
+        return data
+
+    def _cached(self, kind, tgt, tgt_type):
+        """
+        Read the cached pillar or grains for the target.  Returns None if any
+        matched minion has no cached data.
+        """
+        util = salt.utils.master.MasterPillarUtil(tgt, tgt_type,
+                                                  use_cached_grains=True,
+                                                  use_cached_pillar=True,
+                                                  grains_fallback=False,
+                                                  pillar_fallback=False,
+                                                  opts=self.opts)
+        if kind == 'pillar':
+            data = util.get_minion_pillar()
+        else:
+            data = util.get_minion_grains()
+        if not data or not all(data.values()):
+            log.debug("No cached {} for {}".format(kind, tgt))
+            return None
+        return data
+
+    # pylint: disable=no-self-use
+    def _live(self, kind, tgt, tgt_type):
+        """
+        Query the minions directly
+        """
+        # When search matches no minions, salt prints to stdout.
+        # Suppress stdout.
+        _stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+
+        local = salt.client.LocalClient()
+        data = local.cmd(tgt, '{}.items'.format(kind), tgt_type=tgt_type)
+
+        sys.stdout = _stdout
+        return data
+
+    def data(self, kind, tgt, tgt_type="compound"):
+        """
+        Return the pillar or grains of each minion matching the target
+        """
+        def _loader():
+            """
+            Prefer the master cache over the minions
+            """
+            data = self._cached(kind, tgt, tgt_type)
+            if data is None:
+                data = self._live(kind, tgt, tgt_type)
+            return data
+        return self._lookup((kind, tgt, tgt_type), _loader)
+
+    def invalidate(self):
+        """
+        Forget all memoized data
+        """
+        self.entries = {}
+
+
+def _traverse(data, key, default, delimiter=':'):
+    """
+    Resolve a colon separated key the same way pillar.get does
+    """
+    for part in key.split(delimiter):
+        if isinstance(data, dict) and part in data:
+            data = data[part]
+        else:
+            return default
+    return data
+
+
+_SNAPSHOT = {}
+
+
+def _snapshot():
+    """
+    Share one Snapshot within this process
+    """
+    if 'instance' not in _SNAPSHOT:
+        ttl = __opts__.get('deepsea_snapshot_ttl', DEFAULT_TTL)
+        _SNAPSHOT['instance'] = Snapshot(__opts__, ttl)
+    return _SNAPSHOT['instance']
+
+
+def pillar(tgt, key=None, tgt_type="compound", default=''):
+    """
+    Returns the pillar of each matching minion or the value of key, similar
+    to LocalClient.cmd(tgt, 'pillar.get', [key])
+    """
+    data = _snapshot().data('pillar', tgt, tgt_type)
+    if key is None:
+        return data
+    return {minion: _traverse(data[minion], key, default) for minion in data}
+
+
+def grains(tgt, key=None, tgt_type="compound", default=''):
+    """
+    Returns the grains of each matching minion or the value of key, similar
+    to LocalClient.cmd(tgt, 'grains.get', [key])
+    """
+    data = _snapshot().data('grains', tgt, tgt_type)
+    if key is None:
+        return data
+    return {minion: _traverse(data[minion], key, default) for minion in data}
+
+
+def minions(tgt, tgt_type="compound"):
+    """
+    Returns the list of minions matching the target
+    """
+    return list(_snapshot().data('pillar', tgt, tgt_type).keys())
+
+
+def invalidate():
+    """
+    Drop the memoized data
+    """
+    _snapshot().invalidate()
+    return True
@@ -7,8 +7,15 @@ Operations for finding blank drives or Ceph disks
 
 from __future__ import absolute_import
 from __future__ import print_function
+import io
 import os
 import re
+import json
+import time
+import struct
+import hashlib
+import tempfile
+import uuid
 import xml.etree.ElementTree as et
 from glob import glob
 from subprocess import Popen, PIPE
@@ -26,6 +33,32 @@ except ImportError:
 
 VERSION = 0.2
 
+PARTITION_TYPES = {'data': "45B0969E-9B03-4F30-B4C6-B4B80CEFF106",
+                   'journal': "4FBD7E29-9D25-41B8-AFD0-062C0CEFF05D",
+                   'db': "30CD0809-C2B2-499C-8879-2D6B78529876",
+                   'wal': "5CE17FCE-4087-4169-B7FF-056CC58473F9",
+                   'osd_lockbox': "FB3AABF9-D25F-47CC-BF5E-721D1816496B",
+                   'luks_journal': "45B0969E-9B03-4F30-B4C6-35865CEFF106",
+                   'luks_wal': "86A32090-3647-40B9-BBBD-38D8C573AA86",
+                   'luks_db': "166418DA-C469-4022-ADF4-B30AFD37F176",
+                   'plain_wal': "306E8683-4FE2-4330-B7C0-00A917C16966",
+                   'plain_db': "93B0052D-02D9-4D8A-A43B-33A3EE4DFBC3"}
+
+# Options of HardwareDetections that change the inventory
+DETECTION_OPTIONS = ['detection_method', 'hw_raid', 'raid_controller_name', 'sw_raid']
+
+UDEV_DATA = "/run/udev/data"
+
+# udev rewrites its database on every event, a long TTL suffices.  Without
+# udev, changes the fingerprint cannot see expire with the shorter TTL.
+CACHE_TTL = 3600
+CACHE_TTL_UNWATCHED = 60
+
+# The PCI vendor names that hwinfo reports for NVMe disks
+PCI_IDS = ('/usr/share/hwdata/pci.ids', '/usr/share/misc/pci.ids')
+
+PCI_ADDRESS = re.compile(r'^[0-9a-f]{4}:[0-9a-f]{2}:[0-9a-f]{2}\.[0-7]$')
+
 
 # pylint: disable=too-few-public-methods
 class HardwareDetections(object):
@@ -42,10 +75,20 @@ class HardwareDetections(object):
             hw_raid_name(str): Manually set the hw_raid_ctrls name
             software_raid(bool): Manually set if you have sw raid and the class
                                             fails to detect it.
+            detection_method(str): sysfs (default), hwinfo or lshw
         REQUIREMENTS FOR THE PROGRAMM TO WORK:
-        gptfdisk, pciutils, smartmontools
-        """
-        self.detection_method = self._find_detection_tool(kwargs.get('detection_method', None))
+        pciutils, smartmontools
+        gptfdisk, hwinfo or lshw are only used as a fallback
+        """
+        method = kwargs.get('detection_method', None)
+        # sysfs is read directly, hwinfo and lshw remain as a fallback
+        self.native = method in (None, 'sysfs')
+        if self.native:
+            self.detection_method = None
+        else:
+            self.detection_method = self._find_detection_tool(method)
+        self.fallback = None
+        self.lshw = None
         self.hw_raid = kwargs.get('hw_raid', None)
         self.hw_raid_name = kwargs.get('raid_controller_name', None)
         self.software_raid = kwargs.get('sw_raid', None)
@@ -349,16 +392,6 @@ class HardwareDetections(object):
         Search for Ceph Data and Journal partitions
         """
         log.debug("Checking partitions {} on device {}".format(ids, device))
-        guuid_table = {'data': "45B0969E-9B03-4F30-B4C6-B4B80CEFF106",
-                       'journal': "4FBD7E29-9D25-41B8-AFD0-062C0CEFF05D",
-                       'db': "30CD0809-C2B2-499C-8879-2D6B78529876",
-                       'wal': "5CE17FCE-4087-4169-B7FF-056CC58473F9",
-                       'osd_lockbox': "FB3AABF9-D25F-47CC-BF5E-721D1816496B",
-                       'luks_journal': "45B0969E-9B03-4F30-B4C6-35865CEFF106",
-                       'luks_wal': "86A32090-3647-40B9-BBBD-38D8C573AA86",
-                       'luks_db': "166418DA-C469-4022-ADF4-B30AFD37F176",
-                       'plain_wal': "306E8683-4FE2-4330-B7C0-00A917C16966",
-                       'plain_db': "93B0052D-02D9-4D8A-A43B-33A3EE4DFBC3"}
         sgdisk_path = self._which('sgdisk')
         for partition_id in ids:
             cmd = "{} -i {} {}".format(sgdisk_path, partition_id, device)
@@ -366,7 +399,7 @@ class HardwareDetections(object):
             for line in proc.stdout:
                 line = __salt__['helper.convert_out'](line)
                 if line.startswith("Partition GUID code:"):
-                    for guuid_code in guuid_table.values():
+                    for guuid_code in PARTITION_TYPES.values():
                         if guuid_code in line:
                             log.debug('Found signs that {} belongs to ceph'.format(device))
                             return True
@@ -375,6 +408,92 @@ class HardwareDetections(object):
         log.debug("No signs of ceph found on {}. Skipping..".format(device))
         return False
 
+    def _ceph_partitions(self, device, ids, block_size=512):
+        """
+        Search the GPT for Ceph partition types.  Use sgdisk only when the
+        device cannot be read.
+        """
+        partitions = _gpt_partitions("/dev/" + device, block_size)
+        if partitions is None:
+            return self._osd("/dev/" + device, ids)
+        for partition in partitions:
+            if partition['type'] in PARTITION_TYPES.values():
+                log.debug('Found signs that {} belongs to ceph'.format(device))
+                return True
+        log.debug("No signs of ceph found on {}. Skipping..".format(device))
+        return False
+
+    # pylint: disable=no-self-use
+    def _sysfs(self, device, base, links=None):
+        """
+        Read the disk's details from sysfs and /dev/disk without calling
+        any external tool.  The keys match those of _hwinfo.
+
+        args:
+            device (str): short name of device(sda, sdb..)
+            base (str): base sys path of device
+            links (dict): symlinks of each device, see _device_links
+        return:
+            dict: hardware information
+        """
+        results = {}
+        sectors = _read_sysfs(base + "/size")
+        if sectors and sectors.isdigit():
+            # The size is always in 512 byte sectors
+            size = int(sectors) * 512
+            results['Bytes'] = str(size)
+            results['Capacity'] = "{} GB".format(size // 2**30)
+
+        model = _read_sysfs(base + "/device/model")
+        vendor = _read_sysfs(base + "/device/vendor")
+        # libata reports ATA for every disk, virtio a PCI vendor id
+        if vendor and vendor != 'ATA' and not vendor.startswith('0x'):
+            results['Vendor'] = vendor
+            model = "{} {}".format(vendor, model) if model else vendor
+        else:
+            vendor = _hwinfo_vendor(device, base, vendor, model)
+            if vendor:
+                results['Vendor'] = vendor
+        if model:
+            results['Model'] = model
+
+        serial = (_read_sysfs(base + "/device/serial") or
+                  _vpd_serial(base + "/device/vpd_pg80") or
+                  _read_sysfs(base + "/device/wwid"))
+        if serial:
+            results['Serial ID'] = serial
+
+        driver = _drivers(base + "/device")
+        if driver:
+            results['Driver'] = driver
+
+        if links is None:
+            links = _device_links()
+        results['Device File'] = "/dev/" + device
+        results['Device Files'] = ", ".join([results['Device File']] +
+                                            links.get(results['Device File'], []))
+        return results
+
+    def _fallback(self, device):
+        """
+        Ask hwinfo or lshw about a disk that sysfs cannot fully describe.
+        The tool is found once and lshw only runs once.
+        """
+        if self.fallback is None:
+            try:
+                self.fallback = self._find_detection_tool()
+            # pylint: disable=broad-except
+            except Exception:
+                log.warning("No fallback for hardware detection available")
+                self.fallback = False
+        if not self.fallback:
+            return {}
+        if self.fallback == self._lshw:
+            if self.lshw is None:
+                self.lshw = self._lshw()
+            return self.lshw.get('/dev/' + device, {})
+        return self.fallback(device)
+
     def _lshw(self):
         """
         Parse lshw output into dictionary
@@ -459,7 +578,11 @@ class HardwareDetections(object):
 
         drives = []
         raid_ctrl = self._detect_raidctrl()
-        _hw = self.detection_method()
+        if self.native:
+            _hw = None
+            links = _device_links()
+        else:
+            _hw = self.detection_method()
         for path in glob('/sys/block/*/device'):
             log.debug("Checking path: {}".format(path))
             base = os.path.dirname(path)
@@ -476,7 +599,8 @@ class HardwareDetections(object):
                     else:
                         ids = [re.sub(r'\D+', '', partition)
                                for partition in partitions]
-                if not self._osd("/dev/" + device, ids):
+                block_size = _read_sysfs(base + "/queue/logical_block_size", "512")
+                if not self._ceph_partitions(device, ids, int(block_size)):
                     continue
             else:
                 log.debug('No partitions detected on {}'.format(device))
@@ -484,7 +608,14 @@ class HardwareDetections(object):
             if self._is_removable(base):
                 continue
 
-            if _hw:
+            if self.native:
+                hardware = self._sysfs(device, base, links)
+                missing = [key for key in ['Driver', 'Model', 'Capacity']
+                           if key not in hardware]
+                if missing:
+                    log.info("sysfs lacks {} for {}".format(", ".join(missing), device))
+                    hardware.update(self._fallback(device))
+            elif _hw:
                 hardware = _hw['/dev/'+device]
             else:
                 hardware = self.detection_method(device)
@@ -505,6 +636,162 @@ class HardwareDetections(object):
         return drives
 
 
+def _read_sysfs(path, default=None):
+    """
+    Return the stripped contents of a sysfs attribute or default
+    """
+    try:
+        with open(path, 'r') as _fd:
+            return _fd.read().strip() or default
+    except (IOError, OSError):
+        return default
+
+
+def _pci_vendor(vendor_id):
+    """
+    Return the name of a PCI vendor id such as 0x144d from pci.ids
+    """
+    if not vendor_id or not vendor_id.startswith('0x'):
+        return None
+    prefix = vendor_id[2:].lower() + '  '
+    for path in PCI_IDS:
+        try:
+            with io.open(path, 'r', encoding='utf-8', errors='ignore') as _fd:
+                for line in _fd:
+                    if line.startswith(prefix):
+                        return line[len(prefix):].strip()
+        except (IOError, OSError):
+            continue
+    return None
+
+
+def _hwinfo_vendor(device, base, vendor, model):
+    """
+    Name the vendor of ATA and NVMe disks the way hwinfo does, since the
+    hardware profile names are derived from it.  hwinfo uses the PCI vendor
+    of an NVMe controller and the first word of an ATA model.
+    """
+    nvme = device.startswith('nvme')
+    if nvme:
+        pci_id = _read_sysfs(base + "/device/device/vendor")
+        name = _pci_vendor(pci_id)
+        if name:
+            return "pci {} {}".format(pci_id, name)
+    if (nvme or vendor == 'ATA') and model and ' ' in model:
+        return model.split()[0]
+    return None
+
+
+def _vpd_serial(path):
+    """
+    Return the serial number from the SCSI unit serial number VPD page
+    """
+    try:
+        with open(path, 'rb') as _fd:
+            page = bytearray(_fd.read())
+    except (IOError, OSError):
+        return None
+    if len(page) < 4:
+        return None
+    return page[4:4 + page[3]].decode('ascii', 'ignore').strip() or None
+
+
+def _drivers(path):
+    """
+    Collect the drivers from the device up to its PCI function, such as
+    "megaraid_sas, sd" or "nvme"
+    """
+    drivers = []
+    path = os.path.realpath(path)
+    while os.path.basename(path):
+        driver = os.path.join(path, 'driver')
+        if os.path.islink(driver):
+            name = os.path.basename(os.readlink(driver))
+            if name not in drivers:
+                drivers.insert(0, name)
+            if PCI_ADDRESS.match(os.path.basename(path)):
+                break
+        path = os.path.dirname(path)
+    return ", ".join(drivers)
+
+
+def _device_links(directories=('/dev/disk/by-id', '/dev/disk/by-path')):
+    """
+    Map each device to its persistent symlinks
+    """
+    links = {}
+    for directory in directories:
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in names:
+            path = os.path.join(directory, name)
+            links.setdefault(os.path.realpath(path), []).append(path)
+    return links
+
+
+def _gpt_partitions(device, block_size=512):
+    """
+    Read the partition entries from the primary GPT of a device.  The usual
+    layout of the header at LBA 1 followed by 128 entries needs one read.
+    Returns None if the device cannot be read and an empty list without
+    a GPT.
+    """
+    try:
+        with open(device, 'rb') as _fd:
+            data = _fd.read(2 * block_size + 128 * 128)
+            header = data[block_size:block_size + 92]
+            if len(header) < 92 or header[:8] != b'EFI PART':
+                return []
+            lba, count, size = struct.unpack('<QII', header[72:88])
+            if size < 128 or count > 1024:
+                log.warning("Invalid GPT header on {}".format(device))
+                return []
+            start = lba * block_size
+            table = data[start:start + count * size]
+            if len(table) < count * size:
+                _fd.seek(start)
+                table = _fd.read(count * size)
+    except (IOError, OSError) as error:
+        log.debug("Cannot read {}: {}".format(device, error))
+        return None
+
+    partitions = []
+    for number in range(count):
+        entry = table[number * size:number * size + 128]
+        if len(entry) < 128:
+            break
+        if entry[:16] == b'\0' * 16:
+            continue
+        first, last = struct.unpack('<QQ', entry[32:48])
+        partitions.append({'number': number + 1,
+                           'type': str(uuid.UUID(bytes_le=entry[:16])).upper(),
+                           'uuid': str(uuid.UUID(bytes_le=entry[16:32])).upper(),
+                           'first': first,
+                           'last': last,
+                           'name': entry[56:128].decode('utf-16-le').rstrip('\0')})
+    return partitions
+
+
+def partitions(device):
+    """
+    Return the number, type GUID, unique GUID, name and first and last
+    sector of each partition in the GPT of device.  Returns None if the
+    device cannot be read.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt 'node' cephdisks.partitions /dev/sdb
+    """
+    device = os.path.realpath(device)
+    block_size = _read_sysfs("/sys/class/block/{}/queue/logical_block_size".format(
+        os.path.basename(device)), "512")
+    return _gpt_partitions(device, int(block_size))
+
+
 def device_(devicename, pathname=None, match=None):
     """
     Find all matching symlinks for devicename.
@@ -580,24 +867,133 @@ def _prefer_underscores(devicenames):
     return index
 
 
+def _fingerprint(sysfs='/sys/block'):
+    """
+    Summarize the block devices cheaply: names, sizes, partitions and when
+    the device node and udev database entry last changed.  Adding, removing
+    or repartitioning a disk changes the fingerprint.
+    """
+    entries = []
+    for base in sorted(glob(sysfs + "/*")):
+        device = os.path.basename(base)
+        entry = [device, _read_sysfs(base + "/size"), _read_sysfs(base + "/removable")]
+        entry.extend(sorted(os.path.basename(partition)
+                            for partition in glob(base + "/" + device + "*")))
+        for path in ["/dev/" + device,
+                     "{}/b{}".format(UDEV_DATA, _read_sysfs(base + "/dev"))]:
+            try:
+                entry.append(os.stat(path).st_mtime)
+            except OSError:
+                entry.append(None)
+        entries.append(entry)
+    return hashlib.sha1(json.dumps(entries).encode('utf-8')).hexdigest()
+
+
+def _cache_path():
+    """
+    Location of the inventory cache
+    """
+    return os.path.join(__opts__.get('cachedir', '/var/cache/salt/minion'),
+                        'cephdisks.json')
+
+
+def _cache_ttl():
+    """
+    Predence is pillar, then whether udev can be relied upon
+    """
+    ttl = _seek('ceph:modules:cephdisks:cache:ttl'.split(':'), __pillar__)
+    if ttl is not None:
+        return int(ttl)
+    if os.path.isdir(UDEV_DATA):
+        return CACHE_TTL
+    return CACHE_TTL_UNWATCHED
+
+
+def _load_cache(fingerprint, options):
+    """
+    Return the cached drives if still valid, otherwise None
+    """
+    try:
+        with open(_cache_path(), 'r') as _fd:
+            cached = json.load(_fd)
+    except (IOError, OSError, ValueError):
+        return None
+    if cached.get('fingerprint') != fingerprint or cached.get('options') != options:
+        log.debug("Block devices changed since the inventory was cached")
+        return None
+    if time.time() - cached.get('time', 0) > _cache_ttl():
+        log.debug("Cached inventory expired")
+        return None
+    return cached['drives']
+
+
+def _save_cache(fingerprint, options, drives):
+    """
+    Write the cache atomically, failing quietly
+    """
+    path = _cache_path()
+    try:
+        _fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(_fd, 'w') as cache:
+            json.dump({'fingerprint': fingerprint,
+                       'options': options,
+                       'time': time.time(),
+                       'drives': drives}, cache)
+        os.rename(tmp, path)
+    except (IOError, OSError) as error:
+        log.warning("Cannot cache the inventory in {}: {}".format(path, error))
+
+
+def _inventory(**kwargs):
+    """
+    Return the cached inventory while the block devices are unchanged,
+    detect the hardware otherwise.  cache=False forces the detection.
+    """
+    options = dict((key, kwargs[key]) for key in DETECTION_OPTIONS if key in kwargs)
+    fingerprint = _fingerprint()
+    if kwargs.get('cache', True):
+        drives = _load_cache(fingerprint, options)
+        if drives is not None:
+            return drives
+    hwd = HardwareDetections(**kwargs)
+    drives = hwd.assemble_device_list()
+    _save_cache(fingerprint, options, drives)
+    return drives
+
+
 def list_(**kwargs):
     """
     List the disks
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt 'node' cephdisks.list
+        salt 'node' cephdisks.list cache=False
     """
-    hwd = HardwareDetections(**kwargs)
-    return hwd.assemble_device_list()
+    return _inventory(**kwargs)
 
 
 def filter_(key="Device File", **kwargs):
     """
     Return list of specified key
     """
-    hwd = HardwareDetections(**kwargs)
-    result = hwd.assemble_device_list()
-    results = [device[key] for device in result]
+    results = [device[key] for device in _inventory(**kwargs)]
     return sorted(results)
 
 
+def invalidate():
+    """
+    Remove the cached inventory
+    """
+    try:
+        os.remove(_cache_path())
+    except OSError:
+        pass
+    return True
+
+
 def version():
     """
     Displays version
@@ -11,7 +11,6 @@ import json
 import logging
 # pylint: disable=import-error,3rd-party-module-not-gated
 import salt.ext.six as six
-import rados
 # pylint: disable=incompatible-py3-code
 log = logging.getLogger(__name__)
 
@@ -42,8 +41,7 @@ class Monitors(object):
         """
         Connect to Ceph cluster
         """
-        self.cluster = rados.Rados(conffile=self.settings['conf'])
-        self.cluster.connect()
+        self.cluster = __utils__['rados_pool.connect'](self.settings['conf'])
 
     def list(self):
         """
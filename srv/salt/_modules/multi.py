@@ -5,11 +5,17 @@ for network related tasks such as ping and iperf.
 """
 
 from __future__ import absolute_import
+import errno
 import logging
+import math
 import multiprocessing.dummy
 import multiprocessing
+import random
 import re
+import select
 import socket
+import struct
+import time
 from subprocess import Popen
 # pylint: disable=import-error
 
@@ -30,6 +36,14 @@ IPERF_PATH = which('iperf3')
 
 LOCALHOST_NAME = socket.gethostname()
 
+# Echo request and reply types, and the options to set the DF bit
+ICMP_ECHO = {socket.AF_INET: (8, 0), socket.AF_INET6: (128, 129)}
+ICMP_PROTO = {socket.AF_INET: socket.IPPROTO_ICMP,
+              socket.AF_INET6: getattr(socket, 'IPPROTO_ICMPV6', 58)}
+PMTUDISC_DO = {socket.AF_INET: (socket.IPPROTO_IP, getattr(socket, 'IP_MTU_DISCOVER', 10), 2),
+               socket.AF_INET6: (getattr(socket, 'IPPROTO_IPV6', 41),
+                                 getattr(socket, 'IPV6_MTU_DISCOVER', 23), 2)}
+
 '''
 multi is the module to call subprocess in minion host
 
@@ -95,7 +109,6 @@ def _summarize_ping(results):
     success = []
     failed = []
     errored = []
-    slow = []
     avg = []
     for result in results:
         # pylint: disable=invalid-name,unused-variable
@@ -111,7 +124,34 @@ def _summarize_ping(results):
             failed.append(host)
         if rc == 2:
             errored.append(host)
+    return _summary(success, failed, errored, avg)
+
 
+def _summarize_probe(hosts, stats):
+    '''
+    Summarize the Prober statistics the same way as _summarize_ping
+    '''
+    success = []
+    failed = []
+    errored = []
+    avg = []
+    for host in hosts:
+        stat = stats[host]
+        if stat['rc'] == 0:
+            success.append(host)
+            avg.append({'avg': stat['avg'], 'host': host})
+        if stat['rc'] == 1:
+            failed.append(host)
+        if stat['rc'] == 2:
+            errored.append(host)
+    return _summary(success, failed, errored, avg)
+
+
+def _summary(success, failed, errored, avg):
+    '''
+    Count the successes, list failures and flag slow hosts
+    '''
+    slow = []
     log.debug('multi._summarize_ping average={}'.format(avg))
 
     if avg:
@@ -137,19 +177,252 @@ def _summarize_ping(results):
     return msg
 
 
-def iperf(server, cpu, port):
+def _checksum(data):
+    '''
+    Internet checksum (RFC 1071)
+    '''
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!{}H'.format(len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def _resolve(host):
+    '''
+    Return the family and address of a host, preferring IPv4 like ping
+    '''
+    infos = socket.getaddrinfo(host, None)
+    for info in infos:
+        if info[0] == socket.AF_INET:
+            return info[0], info[4][0]
+    return infos[0][0], infos[0][4][0]
+
+
+def _rtt_stats(rtts):
+    '''
+    Return min/avg/max/mdev in milliseconds as ping reports them
+    '''
+    if not rtts:
+        return {'min': None, 'avg': None, 'max': None, 'mdev': None}
+    mean = sum(rtts) / len(rtts)
+    variance = sum(rtt * rtt for rtt in rtts) / len(rtts) - mean * mean
+    return {'min': min(rtts), 'avg': mean, 'max': max(rtts),
+            'mdev': math.sqrt(max(variance, 0))}
+
+
+class Prober(object):
+    '''
+    Send ICMP echo requests to all hosts at once from this process and match
+    the replies, instead of running ping once per host.
+
+    Raw sockets are used when permitted, otherwise unprivileged datagram
+    ICMP sockets.  When neither is available, socket.error is raised before
+    anything is sent so that the caller can fall back to ping.
+    '''
+
+    def __init__(self, count=1, timeout=1, size=56, dont_fragment=False):
+        '''
+        Size is the IPv4 payload; IPv6 payloads are 20 bytes smaller so that
+        packets fill the same MTU.
+        '''
+        self.count = count
+        self.timeout = timeout
+        self.size = size
+        self.dont_fragment = dont_fragment
+        self.ident = random.randint(0, 0xffff)
+        self.sockets = {}
+
+    def _open(self, family):
+        '''
+        Open a raw or datagram ICMP socket for the family
+        '''
+        if family in self.sockets:
+            return
+        try:
+            sock = socket.socket(family, socket.SOCK_RAW, ICMP_PROTO[family])
+            raw = True
+        except socket.error:
+            sock = socket.socket(family, socket.SOCK_DGRAM, ICMP_PROTO[family])
+            raw = False
+        try:
+            if self.dont_fragment:
+                sock.setsockopt(*PMTUDISC_DO[family])
+            sock.setblocking(False)
+        except socket.error:
+            sock.close()
+            raise
+        log.debug('Prober: {} socket for family {}'.format(
+            'raw' if raw else 'datagram', family))
+        self.sockets[family] = (sock, raw)
+
+    def close(self):
+        '''
+        Close all sockets
+        '''
+        for sock, _ in self.sockets.values():
+            sock.close()
+        self.sockets = {}
+
+    def _packet(self, family, seq):
+        '''
+        Build an echo request
+        '''
+        size = self.size if family == socket.AF_INET else self.size - 20
+        payload = b'\x00' * max(size, 0)
+        header = struct.pack('!BBHHH', ICMP_ECHO[family][0], 0, 0, self.ident, seq)
+        if family == socket.AF_INET:
+            # The kernel computes the ICMPv6 checksum
+            header = struct.pack('!BBHHH', ICMP_ECHO[family][0], 0,
+                                 _checksum(header + payload), self.ident, seq)
+        return header + payload
+
+    def _read(self, sock, raw, pending, rtts):
+        '''
+        Drain the replies waiting on a socket
+        '''
+        family = sock.family
+        while True:
+            try:
+                data, peer = sock.recvfrom(65535)
+            except socket.error:
+                return
+            received = time.time()
+            if family == socket.AF_INET and raw:
+                # Raw IPv4 sockets include the IP header
+                data = data[(struct.unpack('!B', data[:1])[0] & 0x0f) * 4:]
+            if len(data) < 8:
+                continue
+            _type, _, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+            if _type != ICMP_ECHO[family][1]:
+                continue
+            # Datagram sockets rewrite the identifier, but the kernel only
+            # delivers replies for this socket
+            if raw and ident != self.ident:
+                continue
+            key = (family, peer[0], seq)
+            if key in pending:
+                host, sent = pending.pop(key)
+                rtts[host].append((received - sent) * 1000)
+
+    def _receive(self, pending, rtts):
+        '''
+        Collect replies until all arrived or the timeout passes
+        '''
+        socks = dict((sock, raw) for sock, raw in self.sockets.values())
+        deadline = time.time() + self.timeout
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(list(socks), [], [], remaining)
+            for sock in readable:
+                self._read(sock, socks[sock], pending, rtts)
+        pending.clear()
+
+    def run(self, hosts):
+        '''
+        Ping every host count times.  Returns per host statistics with rc
+        set the way ping would: 0 replied, 1 no reply, 2 error.
+        '''
+        targets = []
+        errors = {}
+        for host in hosts:
+            try:
+                family, address = _resolve(host)
+                targets.append((host, family, address))
+            except socket.error as error:
+                errors[host] = (2, str(error))
+        sent = dict((host, 0) for host in hosts)
+        rtts = dict((host, []) for host in hosts)
+        seq = 0
+        try:
+            for family in set(target[1] for target in targets):
+                self._open(family)
+            for _ in range(self.count):
+                pending = {}
+                for host, family, address in targets:
+                    seq = (seq + 1) & 0xffff
+                    try:
+                        self.sockets[family][0].sendto(self._packet(family, seq),
+                                                       (address, 0))
+                    except socket.error as error:
+                        # A DF packet larger than the interface MTU fails here
+                        code = 1 if error.errno == errno.EMSGSIZE else 2
+                        errors[host] = (code, str(error))
+                        continue
+                    sent[host] += 1
+                    pending[(family, address, seq)] = (host, time.time())
+                self._receive(pending, rtts)
+        finally:
+            self.close()
+
+        stats = {}
+        for host in hosts:
+            stat = _rtt_stats(rtts[host])
+            stat['sent'] = sent[host]
+            stat['received'] = len(rtts[host])
+            stat['error'] = ''
+            if rtts[host]:
+                stat['rc'] = 0
+            elif host in errors:
+                stat['rc'], stat['error'] = errors[host]
+            else:
+                stat['rc'] = 1
+            stats[host] = stat
+        return stats
+
+
+def _probe(hosts, **kwargs):
+    '''
+    Return Prober statistics or None when ICMP sockets are not permitted
+    '''
+    try:
+        return Prober(**kwargs).run(hosts)
+    except socket.error as error:
+        log.debug('ICMP sockets unavailable, using ping: {}'.format(error))
+        return None
+
+
+def iperf(server, cpu, port, bind=None):
     '''
     iperf test to a specific server
 
     CLI Example:
     .. code-block:: bash
-        sudo salt 'node' multi.iperf <hostname>|<ip> <cpu_core> <port>
+        sudo salt 'node' multi.iperf <hostname>|<ip> <cpu_core> <port> [bind=<ip>]
     '''
     log.debug('iperf server ={}'.format(server))
-    return _summarize_iperf(iperf_client_cmd(server, cpu, port))
+    return _summarize_iperf(iperf_client_cmd(server, cpu, port, bind))
+
+
+def iperf_round(tests):
+    '''
+    Run the tests of this minion from one round of net.iperf at the same
+    time.  Tests map minion ids to lists of [client address, server, cpu,
+    port].
+
+    CLI Example:
+    .. code-block:: bash
+        sudo salt 'node' multi.iperf_round '{node: [[<ip>, <ip>, 0, 5200]]}'
+    '''
+    mine = tests.get(__grains__['id'], [])
+
+    def _run(test):
+        '''
+        Run one test from the client address
+        '''
+        client, server, cpu, port = test
+        summary = iperf(server, cpu % multiprocessing.cpu_count(), port, bind=client)
+        summary['server'] = server
+        summary['client'] = client
+        return summary
+
+    return _all(_run, mine) if mine else []
 
 
-def iperf_client_cmd(server, cpu=0, port=5200):
+def iperf_client_cmd(server, cpu=0, port=5200, bind=None):
     '''
     Use iperf to test minion to server
 
@@ -157,6 +430,7 @@ def iperf_client_cmd(server, cpu=0, port=5200):
     .. code-block:: bash
     salt 'node' multi.iperf_client_cmd <server_name/ip>
             cpu=<which_cpu_core default 0> port=<default 5200>
+            bind=<local address default any>
     '''
     if IPERF_PATH is None:
         ret = [LOCALHOST_NAME, 2, "0",
@@ -166,6 +440,8 @@ def iperf_client_cmd(server, cpu=0, port=5200):
     else:
         iperf_cmd = ["/usr/bin/iperf3", "-fm", "-A"+str(cpu),
                      "-t10", "-c"+server, "-p"+str(port)]
+        if bind:
+            iperf_cmd.append("-B"+bind)
         log.debug('iperf_client_cmd: cmd {}'.format(iperf_cmd))
         retcode, stdout, stderr = __salt__['helper.run'](iperf_cmd)
         ret = (server, retcode, stdout, stderr)
@@ -210,10 +486,63 @@ def ping(*hosts):
     '''
     # I should be filter all the localhost here?
     log.debug('ping hostlist={}'.format(list(hosts)))
+    stats = _probe(hosts)
+    if stats is not None:
+        return _summarize_probe(hosts, stats)
     results = _all(ping_cmd, list(hosts))
     return _summarize_ping(results)
 
 
+def ping_stats(*hosts, **kwargs):
+    '''
+    Ping a list of hosts and return the statistics of each.  With mtu=True,
+    also send a jumbo packet that must not be fragmented to the hosts that
+    replied and report the usable MTU of each path (9000 or 1500).  The
+    addresses of this minion are skipped.
+
+    CLI Example:
+    .. code-block:: bash
+        sudo salt 'node' multi.ping_stats <hostname>|<ip> <hostname>|<ip>.... mtu=True
+    '''
+    local = set(__grains__.get('ipv4', []) + __grains__.get('ipv6', []))
+    hosts = [host for host in hosts if host not in local]
+    stats = _probe(hosts)
+    if stats is None:
+        stats = _stats_from_ping(_all(ping_cmd, hosts))
+    if kwargs.get('mtu'):
+        replied = [host for host in hosts if stats[host]['rc'] == 0]
+        jumbo = _probe(replied, size=8972, dont_fragment=True)
+        if jumbo is None:
+            jumbo = _stats_from_ping(_all(jumbo_ping_cmd, replied))
+        for host in hosts:
+            stats[host]['mtu'] = None
+            if host in jumbo:
+                stats[host]['mtu'] = 9000 if jumbo[host]['rc'] == 0 else 1500
+    return stats
+
+
+def _stats_from_ping(results):
+    '''
+    Convert ping output to the statistics returned by Prober
+    '''
+    stats = {}
+    # pylint: disable=invalid-name
+    for host, rc, out, err in results:
+        stat = _rtt_stats([])
+        rtt = re.match(
+            r'.*rtt min/avg/max/mdev = ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+)',
+            out, re.DOTALL)
+        if rtt:
+            stat.update(zip(['min', 'avg', 'max', 'mdev'],
+                            [float(value) for value in rtt.groups()]))
+        stat['sent'] = 1
+        stat['received'] = 1 if rc == 0 else 0
+        stat['rc'] = rc
+        stat['error'] = err if rc == 2 else ''
+        stats[host] = stat
+    return stats
+
+
 def ping_cmd(host):
     '''
     Ping a host with 1 packet and return the result
@@ -237,6 +566,9 @@ def jumbo_ping(*hosts):
     '''
     # I should be filter all the localhost here?
     log.debug('jumbo_ping hostlist={}'.format(list(hosts)))
+    stats = _probe(hosts, size=8972, dont_fragment=True)
+    if stats is not None:
+        return _summarize_probe(hosts, stats)
     results = _all(jumbo_ping_cmd, list(hosts))
     return _summarize_ping(results)
 
@@ -255,17 +587,51 @@ def jumbo_ping_cmd(host):
     return host, retcode, stdout, stderr
 
 
-def prepare_iperf_server():
+def prepare_iperf_server(count=None):
     '''
-    Create N server base on the total core number of your cpu count
+    Create N server base on the total core number of your cpu count, or
+    count servers spread over the cpus
 
     CLI Example:
     .. code-block:: bash
-    salt 'node' multi.prepare_iperf_server
+    salt 'node' multi.prepare_iperf_server [count]
 
     '''
     cpus = multiprocessing.cpu_count()
     iperf_log = ""
-    for cpu in range(cpus):
-        iperf_log += iperf_server_cmd(cpu, 5200+cpu)
+    for index in range(count or cpus):
+        iperf_log += iperf_server_cmd(index % cpus, 5200+index)
+    _wait_listening([5200+index for index in range(count or cpus)])
     return iperf_log
+
+
+def _listening_ports():
+    '''
+    Return the local TCP ports in the LISTEN state
+    '''
+    ports = set()
+    for filename in ['/proc/net/tcp', '/proc/net/tcp6']:
+        try:
+            with open(filename) as tcp:
+                next(tcp)
+                for line in tcp:
+                    fields = line.split()
+                    if fields[3] == '0A':
+                        ports.add(int(fields[1].split(':')[-1], 16))
+        except (IOError, OSError, StopIteration):
+            continue
+    return ports
+
+
+def _wait_listening(ports, timeout=5):
+    '''
+    Wait for the daemonized iperf3 servers to listen so that the first
+    clients do not race them
+    '''
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if set(ports) <= _listening_ports():
+            return True
+        time.sleep(0.1)
+    log.warning('iperf3 servers not listening on {}'.format(sorted(ports)))
+    return False
@@ -15,6 +15,9 @@ import logging
 import time
 import re
 import pprint
+import threading
+import contextlib
+import multiprocessing.dummy
 import yaml
 # pylint: disable=import-error,3rd-party-module-not-gated,redefined-builtin
 
@@ -31,10 +34,50 @@ try:
 except ImportError:
     log.error("Could not import salt.ext.six")
 
+
+class OSDDf(object):
+    """
+    The output of osd df indexed by OSD id.  One refresh serves every
+    OSDWeight and OSDDrain in the process for ttl seconds instead of each
+    instance dumping the whole cluster to find a single entry.
+    """
+
+    def __init__(self, ttl=1):
+        """
+        Start empty, one index per connection
+        """
+        self.ttl = ttl
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def get(self, cluster):
+        """
+        Return {osd_id: entry}, refreshing when older than ttl
+        """
+        with self.lock:
+            now = time.time()
+            if cluster.key in self.indexes:
+                stamp, index = self.indexes[cluster.key]
+                if now - stamp < self.ttl:
+                    return index
+            cmd = json.dumps({"prefix": "osd df", "format": "json"})
+            _, output, _ = cluster.mon_command(cmd, b'', timeout=6)
+            index = {entry['id']: entry for entry in json.loads(output)['nodes']}
+            self.indexes[cluster.key] = (now, index)
+            return index
+
+    def invalidate(self):
+        """
+        Forget all indexes, such as after changing a weight
+        """
+        with self.lock:
+            self.indexes = {}
+
+
 try:
-    import rados
-except ImportError:
-    pass
+    _DF  # pylint: disable=used-before-assignment
+except NameError:
+    _DF = OSDDf()
 
 # The first functions are different queries for osds.  These can be combined.
 # The two classes should be combined as well.  I thought I would wait for now.
@@ -199,8 +242,10 @@ def _tree(**kwargs):
     """
     Return osd tree
     """
-    cluster = rados.Rados(**kwargs)
-    cluster.connect()
+    cluster = __utils__['rados_pool.connect'](
+        kwargs['conffile'],
+        keyring=kwargs.get('conf', {}).get('keyring'),
+        client=kwargs.get('name'))
     cmd = json.dumps({"prefix": "osd tree", "format": "json"})
     _, output, _ = cluster.mon_command(cmd, b'', timeout=6)
     osd_tree = json.loads(output)
@@ -253,12 +298,11 @@ class OSDWeight(object):
         }
         self.settings.update(kwargs)
         log.debug("settings: {}".format(pprint.pformat(self.settings)))
-        # self.cluster = rados.Rados(conffile=self.settings['conf'])
-        self.cluster = rados.Rados(conffile=self.settings['conf'],
-                                   conf=dict(keyring=self.settings['keyring']),
-                                   name=self.settings['client'])
         try:
-            self.cluster.connect()
+            self.cluster = __utils__['rados_pool.connect'](
+                self.settings['conf'],
+                keyring=self.settings['keyring'],
+                client=self.settings['client'])
         except Exception as error:
             raise RuntimeError("connection error: {}".format(error))
 
@@ -304,6 +348,7 @@ class OSDWeight(object):
         cmd = ("ceph --keyring={} --name={} osd crush reweight osd.{} "
                "{}".format(self.settings['keyring'], self.settings['client'],
                            self.osd_id, weight))
+        _DF.invalidate()
         return __salt__['helper.run'](cmd)
 
     def update_reweight(self, reweight):
@@ -313,21 +358,19 @@ class OSDWeight(object):
         cmd = ("ceph --keyring={} --name={} osd reweight osd.{} "
                "{}".format(self.settings['keyring'], self.settings['client'],
                            self.osd_id, reweight))
+        _DF.invalidate()
         return __salt__['helper.run'](cmd)
 
     def osd_df(self):
         """
         Retrieve df entry for an osd
         """
-        cmd = json.dumps({"prefix": "osd df", "format": "json"})
-        _, output, _ = self.cluster.mon_command(cmd, b'', timeout=6)
-        # log.debug(json.dumps((json.loads(output)['nodes']), indent=4))
-        for entry in json.loads(output)['nodes']:
-            if entry['id'] == int(self.osd_id):
-                log.debug(pprint.pformat(entry))
-                return entry
-        log.warning("ID {} not found".format(self.osd_id))
-        return {}
+        entry = _DF.get(self.cluster).get(int(self.osd_id))
+        if entry is None:
+            log.warning("ID {} not found".format(self.osd_id))
+            return {}
+        log.debug(pprint.pformat(entry))
+        return entry
 
     # pylint: disable=invalid-name
     def osd_safe_to_destroy(self):
@@ -350,9 +393,11 @@ class OSDWeight(object):
         """
         Wait until PGs reach 0 or timeout expires
         """
-        i = 0
+        backoff = __utils__['backoff.backoff'](self.settings['timeout'],
+                                               self.settings['delay'],
+                                               self.settings.get('interval', 1))
         last_pgs = 0
-        while i < self.settings['timeout']/self.settings['delay']:
+        while not backoff.expired():
             rc, msg = self.osd_safe_to_destroy()
             if rc == 0:
                 log.info("osd.{} is safe to destroy".format(self.osd_id))
@@ -366,13 +411,12 @@ class OSDWeight(object):
                     log.warning("osd.{} has {} PGs remaining".format(self.osd_id, entry['pgs']))
                     if last_pgs != entry['pgs']:
                         # Making progress, reset countdown
-                        i = 0
+                        backoff.reset()
                         last_pgs = entry['pgs']
             else:
                 msg = "osd.{} does not exist {}".format(self.osd_id, msg)
                 log.warning(msg)
-            i += 1
-            time.sleep(self.settings['delay'])
+            backoff.sleep()
 
         msg = "Timeout expired - OSD {} has {} PGs remaining".format(self.osd_id, last_pgs)
         log.error(msg)
@@ -397,11 +441,11 @@ class CephPGs(object):
         }
         self.settings.update(kwargs)
         log.debug("settings: {}".format(pprint.pformat(self.settings)))
-        self.cluster = rados.Rados(conffile=self.settings['conf'],
-                                   conf=dict(keyring=self.settings['keyring']),
-                                   name=self.settings['client'])
         try:
-            self.cluster.connect()
+            self.cluster = __utils__['rados_pool.connect'](
+                self.settings['conf'],
+                keyring=self.settings['keyring'],
+                client=self.settings['client'])
         except Exception as error:
             raise RuntimeError("connection error: {}".format(error))
 
@@ -410,11 +454,11 @@ class CephPGs(object):
         Wait until PGs are active+clean or timeout is reached.  Default is a
         2 minute sliding window.  Return if no PGs are present.
         """
-        i = 0
+        backoff = __utils__['backoff.backoff'](self.settings['timeout'],
+                                               self.settings['delay'],
+                                               self.settings.get('interval', 1))
         last = []
-        if self.settings['delay'] == 0:
-            raise ValueError("The delay cannot be 0")
-        while i < self.settings['timeout']/self.settings['delay']:
+        while not backoff.expired():
             current = self.pg_states()
             if not current:
                 log.warning("PGs are not present")
@@ -426,13 +470,12 @@ class CephPGs(object):
             if self._pg_value(last) != self._pg_value(current):
                 # Making progress - reset counter
                 log.debug("Resetting active+clean counter")
-                i = 0
+                backoff.reset()
                 last = current
 
-            i += 1
-            log.debug("iteration: {} last: {} current: {}".
-                      format(i, self._pg_value(last), self._pg_value(current)))
-            time.sleep(self.settings['delay'])
+            log.debug("waited: {} last: {} current: {}".
+                      format(backoff.waited, self._pg_value(last), self._pg_value(current)))
+            backoff.sleep()
 
         log.error("Timeout expired waiting on active+clean")
         raise RuntimeError("Timeout expired waiting on active+clean")
@@ -457,6 +500,109 @@ class CephPGs(object):
         return json.loads(output)['pg_summary']['num_pg_by_state']
 
 
+class OSDDrain(object):
+    """
+    Track the evacuation of several OSDs together.  Each poll costs one
+    osd df and one safe-to-destroy query regardless of the number of OSDs.
+    """
+
+    def __init__(self, osd_ids, **kwargs):
+        """
+        Initialize settings, connect to Ceph cluster
+        """
+        self.osd_ids = [int(_id) for _id in osd_ids]
+        self.pending = list(self.osd_ids)
+        self.settings = {
+            'conf': "/etc/ceph/ceph.conf",
+            'timeout': 60,
+            'keyring': '/etc/ceph/ceph.client.admin.keyring',
+            'client': 'client.admin',
+            'delay': 6
+        }
+        self.settings.update(kwargs)
+        log.debug("settings: {}".format(pprint.pformat(self.settings)))
+        try:
+            self.cluster = __utils__['rados_pool.connect'](
+                self.settings['conf'],
+                keyring=self.settings['keyring'],
+                client=self.settings['client'])
+        except Exception as error:
+            raise RuntimeError("connection error: {}".format(error))
+
+    def pgs(self):
+        """
+        Return the PG count of each OSD from the shared osd df
+        """
+        return {_id: entry['pgs'] for _id, entry in _DF.get(self.cluster).items()
+                if 'pgs' in entry}
+
+    def _safe_to_destroy(self, osd_ids):
+        """
+        Ask about several OSDs at once
+        """
+        cmd = json.dumps({"prefix": "osd safe-to-destroy",
+                          "ids": ["{}".format(_id) for _id in osd_ids],
+                          "format": "json"})
+        rc, output, _ = self.cluster.mon_command(cmd, b'', timeout=6)
+        return rc, output
+
+    def safe(self, osd_ids, pgs=None):
+        """
+        Return the OSDs that can be destroyed.  Older releases only report
+        whether all of the OSDs are safe; then confirm the empty ones
+        individually.
+        """
+        if not osd_ids:
+            return []
+        rc, output = self._safe_to_destroy(osd_ids)
+        if rc == 0:
+            return list(osd_ids)
+        try:
+            return [int(_id) for _id in json.loads(output)['safe_to_destroy']]
+        except (ValueError, TypeError, KeyError):
+            pass
+        if pgs is None:
+            pgs = self.pgs()
+        return [_id for _id in osd_ids
+                if pgs.get(_id) == 0 and self._safe_to_destroy([_id])[0] == 0]
+
+    def status(self):
+        """
+        Return the pending OSDs that are safe and the PGs left on each
+        """
+        pgs = self.pgs()
+        return {'safe': self.safe(self.pending, pgs),
+                'pgs': {str(_id): pgs.get(_id) for _id in self.pending}}
+
+    def drained(self):
+        """
+        Yield each OSD as soon as it is safe to destroy.  Stops when none of
+        the remaining OSDs made progress within the timeout; those stay in
+        pending.
+        """
+        backoff = __utils__['backoff.backoff'](self.settings['timeout'],
+                                               self.settings['delay'],
+                                               self.settings.get('interval', 1))
+        last = None
+        while self.pending and not backoff.expired():
+            pgs = self.pgs()
+            for _id in self.safe(self.pending, pgs):
+                log.info("osd.{} is safe to destroy".format(_id))
+                self.pending.remove(_id)
+                backoff.reset()
+                yield _id
+            if not self.pending:
+                return
+            remaining = sum(pgs.get(_id) or 0 for _id in self.pending)
+            log.warning("osds {} have {} PGs remaining".format(self.pending, remaining))
+            if remaining != last:
+                backoff.reset()
+                last = remaining
+            backoff.sleep()
+        if self.pending:
+            log.error("Timeout expired - OSDs {} are not empty".format(self.pending))
+
+
 def _settings(**kwargs):
     """
     Initialize settings to use the client.storage name and keyring
@@ -513,6 +659,16 @@ def restore_weight(osd_id, **kwargs):
     return True
 
 
+def drain_status(*osd_ids, **kwargs):
+    """
+    Report which OSDs are safe to destroy and the PGs left on each
+    """
+    settings = _settings(**kwargs)
+
+    drain = OSDDrain(osd_ids, **settings)
+    return drain.status()
+
+
 def _find_paths(device):
     """
     Return matching pathnames, special case devices ending with digits
@@ -524,6 +680,16 @@ def _find_paths(device):
     return pathnames
 
 
+def _gpt_partitions(device):
+    """
+    Return the partitions in the GPT of device as read by cephdisks or None
+    if the GPT cannot be read
+    """
+    if 'cephdisks.partitions' not in __salt__:
+        return None
+    return __salt__['cephdisks.partitions'](device)
+
+
 def readlink(device, follow=True):
     """
     Return the short name for a symlink device.  On some systems, readlink
@@ -1018,19 +1184,25 @@ class OSDPartitions(object):
         wait_time = 1
         retries = 5
         cmd = "/usr/sbin/partprobe {}".format(device)
-        for _ in range(1, retries + 1):
-            _rc, _stdout, _stderr = __salt__['helper.run'](cmd)
-            if _rc == 0:
-                return
-            time.sleep(wait_time)
+        # Parallel deploys would otherwise rescan disks under each other
+        with _PROBE_LOCK:
+            for _ in range(1, retries + 1):
+                _rc, _stdout, _stderr = __salt__['helper.run'](cmd)
+                if _rc == 0:
+                    return
+                time.sleep(wait_time)
         raise RuntimeError("{} failed".format(cmd))
 
     # pylint: disable=no-self-use
     def _last_partition(self, device):
         """
         Return the last partition. Only the number is needed for the sgdisk
-        command.
+        command.  Disks without a readable GPT, such as MBR disks, fall back
+        to the partition device files.
         """
+        _partitions = _gpt_partitions(device)
+        if _partitions:
+            return max([_partition['number'] for _partition in _partitions])
         pathnames = _find_paths(device)
         if pathnames:
             _partitions = sorted([re.sub(r"{}p?".format(device), '', p)
@@ -1104,6 +1276,19 @@ class OSDCommands(object):
         """
         if device:
             log.debug("{} device: {}".format(partition_type, device))
+            _partitions = _gpt_partitions(device)
+            if _partitions is not None:
+                numbers = [_partition['number'] for _partition in _partitions
+                           if _partition['type'] == self.osd.types[partition_type]]
+                if numbers:
+                    _partition = str(max(numbers))
+                    log.debug("found partition {} on device {}".format(_partition, device))
+                    if re.match(r'.*\d$', device) and nvme_partition:
+                        _partition = "p{}".format(_partition)
+                    return _partition
+                self.error = "Partition type {} not found on {}".format(partition_type, device)
+                log.error(self.error)
+                return 0
             pathnames = _find_paths(device)
             # the to int -> key=int conversion fails here
             _partitions = sorted([re.sub(r"{}p?".format(device), '', p)
@@ -1647,8 +1832,9 @@ class OSDRemove(object):
 
     def _delete_partitions(self):
         """
-        Delete the partitions
+        Delete the partitions, one sgdisk call per disk
         """
+        disks = {}
         for attr in self.partitions:
             log.debug("Checking attr {}".format(attr))
             if '/dev/dm' in self.partitions[attr]:
@@ -1671,12 +1857,26 @@ class OSDRemove(object):
                     disk, _partition = split_partition(self.partitions[attr])
                     if disk:
                         log.debug("disk: {} partition: {}".format(disk, _partition))
-                        cmd = "sgdisk -d {} {}".format(_partition, disk)
-                        _rc, _stdout, _stderr = __salt__['helper.run'](cmd)
-                        if _rc != 0:
-                            return "Failed to delete partition {} on {}".format(_partition, disk)
+                        if _partition not in disks.setdefault(disk, []):
+                            disks[disk].append(_partition)
             else:
                 log.error("Partition {} does not exist".format(short_name))
+
+        for disk in sorted(disks):
+            numbers = disks[disk]
+            _partitions = _gpt_partitions(disk)
+            if _partitions is not None:
+                # Skip partitions another entry already deleted
+                present = [str(_partition['number']) for _partition in _partitions]
+                numbers = [number for number in numbers if str(number) in present]
+            if not numbers:
+                continue
+            cmd = "sgdisk {} {}".format(" ".join("-d {}".format(number)
+                                                 for number in numbers), disk)
+            _rc, _stdout, _stderr = __salt__['helper.run'](cmd)
+            if _rc != 0:
+                return "Failed to delete partition {} on {}".format(
+                    ", ".join(str(number) for number in numbers), disk)
         return ""
 
     def _wipe_gpt_backups(self):
@@ -2113,33 +2313,221 @@ def is_partitioned(device):
     return osdc.is_partitioned(device)
 
 
-def deploy_lvm():
+DEPLOY_WORKERS = 8
+
+
+class DeviceLocks(object):
+    """
+    One lock per device.  OSDs sharing a journal, WAL or DB device must not
+    write its partition table at the same time.
+    """
+
+    def __init__(self):
+        """
+        Locks are created on first use
+        """
+        self.guard = threading.Lock()
+        self.locks = {}
+
+    def _lock(self, device):
+        """
+        Return the lock of a device
+        """
+        with self.guard:
+            return self.locks.setdefault(device, threading.Lock())
+
+    @contextlib.contextmanager
+    def hold(self, devices):
+        """
+        Acquire the locks of all devices in sorted order to avoid deadlocks
+        """
+        locks = [self._lock(device) for device in sorted(set(devices))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+
+_DEVICE_LOCKS = DeviceLocks()
+_PROBE_LOCK = threading.Lock()
+# find_destroyed and remove_destroyed rewrite a single file
+_DESTROYED_LOCK = threading.Lock()
+
+
+def _shared_devices(config):
+    """
+    Return the other devices holding the journal, WAL or DB of an OSD
+    """
+    devices = set()
+    for device in [config.journal, config.wal, config.db]:
+        if device and readlink(device) != config.device:
+            devices.add(readlink(device))
+    return sorted(devices)
+
+
+def _presized(config):
+    """
+    Return whether DeepSea created the partitions on the shared devices.
+    Otherwise, ceph-disk creates them during prepare.
+    """
+    if config.encryption:
+        return False
+    if config.disk_format == 'filestore':
+        return bool(config.journal_size)
+    return bool(config.wal_size or config.db_size)
+
+
+def _map(func, devices, parallel, workers):
+    """
+    Call func for each device, concurrently with up to workers threads.  One
+    at a time, an exception stops at its device as it always did.
+    Concurrently, it is recorded in the report of its device instead.
+    """
+    if not parallel:
+        return [func(device) for device in devices]
+
+    def _guarded(device):
+        """
+        Keep the other devices going when one raises
+        """
+        try:
+            return func(device)
+        # pylint: disable=broad-except
+        except Exception as error:
+            log.exception("Deploying {} failed".format(device))
+            return {'result': 'failed', 'error': str(error)}
+
+    if len(devices) < 2:
+        return [_guarded(device) for device in devices]
+    pool = multiprocessing.dummy.Pool(min(int(workers), len(devices)))
+    try:
+        return pool.map(_guarded, devices)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _failure(report):
+    """
+    Describe why a device failed
+    """
+    if 'error' in report:
+        return report['error']
+    steps = ["{} returned {}".format(step, report[step])
+             for step in ['prepare', 'activate'] if report.get(step)]
+    return ", ".join(steps) or "unknown error"
+
+
+def _report(devices, results, parallel, errors=None):
+    """
+    Return the report of each device.  In parallel, raise after every device
+    had its turn if any failed.
+    """
+    errors = list(errors or [])
+    for device, report in zip(devices, results):
+        log.info("Deploying {}: {}".format(device, report))
+        if report['result'] == 'failed':
+            log.error("Deploying {} failed: {}".format(device, report))
+            errors.append("{}: {}".format(device, _failure(report)))
+    if parallel and errors:
+        raise RuntimeError("Deploying OSDs failed - {}".format("; ".join(errors)))
+    return dict(zip(devices, results))
+
+
+def _deploy_lvm_device(device):
+    """
+    Prepare a ceph-volume OSD on a single device
+    """
+    start = time.time()
+    report = {'result': 'failed'}
+    cmd = (r"find -L /dev/ -maxdepth 1 -samefile {}".format(device))
+    _rc, stdout, _stderr = __salt__['helper.run'](cmd)
+    if stdout:
+        log.info("using {} to deploy OSD".format(stdout))
+        _rc, _out, _err = __salt__['helper.run'](
+            ['ceph-volume',
+             'lvm',
+             'prepare',
+             '--bluestore',
+             '--data',
+             '{}1'.format(stdout)]
+        )
+        report['prepare'] = _rc
+        if _rc == 0:
+            report['result'] = 'prepared'
+    else:
+        log.error("could not find short device for {}".format(device))
+        report['result'] = 'missing'
+    report['seconds'] = round(time.time() - start, 1)
+    return report
+
+
+def deploy_lvm(parallel=False, workers=DEPLOY_WORKERS):
     """
     Dummy implementation to deplioy a ceph-volume OSD on an existing lv
+
+    With parallel=True, up to workers devices are prepared at the same time
+    and the prepared OSDs are activated before any failure is raised.
+    Returns the result, return code and duration of each device.
     """
-    for device in configured():
-        cmd = (r"find -L /dev/ -maxdepth 1 -samefile {}".format(device))
-        _rc, stdout, _stderr = __salt__['helper.run'](cmd)
-        if stdout:
-            log.info("using {} to deploy OSD".format(stdout))
-            _rc, _out, _err = __salt__['helper.run'](
-                ['ceph-volume',
-                 'lvm',
-                 'prepare',
-                 '--bluestore',
-                 '--data',
-                 '{}1'.format(stdout)]
-            )
-        else:
-            log.error("could not find short device for {}".format(device))
+    devices = configured()
+    results = _map(_deploy_lvm_device, devices, parallel, workers)
 
     _rc, _out, _err = __salt__['helper.run'](['ceph-volume',
                                               'lvm',
                                               'activate',
                                               '--all'])
+    errors = []
+    if _rc != 0:
+        log.error("ceph-volume lvm activate returned {}: {}".format(_rc, _err))
+        errors.append("activate returned {}".format(_rc))
+    return _report(devices, results, parallel, errors)
 
 
-def deploy():
+def _deploy_device(device):
+    """
+    Partition, prepare and activate a single device.  Only the partitioning
+    of shared devices is serialized, and the prepare too when ceph-disk
+    partitions them.
+    """
+    start = time.time()
+    report = {'result': 'failed'}
+    if is_prepared(device):
+        report['result'] = 'skipped'
+        return report
+    config = OSDConfig(device)
+    osdc = OSDCommands(config)
+    with _DESTROYED_LOCK:
+        previous_id = find_destroyed(device)
+    if previous_id:
+        report['osd_id'] = previous_id
+
+    with _DEVICE_LOCKS.hold(_shared_devices(config)):
+        osdp = OSDPartitions(config)
+        osdp.clean()
+        osdp.partition()
+        # prepare finds the partitions just created on shared devices
+        cmd = osdc.prepare(previous_id)
+        if not _presized(config):
+            report['prepare'], _out, _err = __salt__['helper.run'](cmd)
+    if 'prepare' not in report:
+        report['prepare'], _out, _err = __salt__['helper.run'](cmd)
+    report['activate'], _out, _err = __salt__['helper.run'](osdc.activate())
+
+    with _DESTROYED_LOCK:
+        remove_destroyed(device)
+    if previous_id:
+        restore_weight(previous_id)
+    if report['prepare'] == 0 and report['activate'] == 0:
+        report['result'] = 'deployed'
+    report['seconds'] = round(time.time() - start, 1)
+    return report
+
+
+def deploy(parallel=False, workers=DEPLOY_WORKERS):
     """
     Partition, prepare and activate an OSD.
 
@@ -2163,20 +2551,20 @@ def deploy():
 
     The last idea is converting all of this into a state module that returns
     all the commands in the comment.
+
+    With parallel=True, up to workers devices are deployed at the same time
+    and a failure is raised after every device had its turn.  Returns the
+    result, return codes and duration of each device.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt 'node' osd.deploy parallel=True workers=12
     """
-    for device in configured():
-        if not is_prepared(device):
-            config = OSDConfig(device)
-            osdp = OSDPartitions(config)
-            osdp.clean()
-            osdp.partition()
-            osdc = OSDCommands(config)
-            previous_id = find_destroyed(device)
-            __salt__['helper.run'](osdc.prepare(previous_id))
-            __salt__['helper.run'](osdc.activate())
-            remove_destroyed(device)
-            if previous_id:
-                restore_weight(previous_id)
+    devices = configured()
+    results = _map(_deploy_device, devices, parallel, workers)
+    return _report(devices, results, parallel)
 
 
 def redeploy(simultaneous=False, **kwargs):
@@ -2184,35 +2572,48 @@ def redeploy(simultaneous=False, **kwargs):
     Empty all PGs in parallel initially if necessary.  Then remove and
     recreate each OSD that does not match its configuration.
     """
-    if simultaneous:
-        for _id in __grains__['ceph']:
-            _part = _partition(_id)
-            log.info("Partition: {}".format(_part))
-            disk, _ = split_partition(_part)
-            log.info("ID: {}".format(_id))
-            log.info("Disk: {}".format(disk))
-            if is_incorrect(disk):
-                zero_weight(_id, wait=False)
-
     settings = _settings(**kwargs)
+    disks = {}
     for _id in __grains__['ceph']:
         _part = _partition(_id)
         log.info("Partition: {}".format(_part))
         disk, _ = split_partition(_part)
         log.info("ID: {}".format(_id))
         log.info("Disk: {}".format(disk))
+        disks[_id] = (_part, disk)
+
+    if simultaneous:
+        incorrect = [_id for _id in disks if is_incorrect(disks[_id][1])]
+        for _id in incorrect:
+            zero_weight(_id, wait=False)
+        # Recreate each OSD once it is safe to destroy rather than waiting for
+        # the whole cluster; anything left over falls through to the loop below.
+        drain = OSDDrain(incorrect, **settings)
+        for _id in drain.drained():
+            _redeploy(str(_id), disks[str(_id)][1], **settings)
+            del disks[str(_id)]
+
+    for _id in disks:
+        _part, disk = disks[_id]
         if not os.path.exists(_part) or is_incorrect(disk):
             pgs = CephPGs(**settings)
             pgs.quiescent()
-            remove(_id, **settings)
-            config = OSDConfig(disk)
-            osdp = OSDPartitions(config)
-            osdp.partition()
-            osdc = OSDCommands(config)
-            __salt__['helper.run'](osdc.prepare(_id))
-            restore_weight(_id)
-            __salt__['helper.run'](osdc.activate())
-            remove_destroyed(disk)
+            _redeploy(_id, disk, **settings)
+
+
+def _redeploy(osd_id, disk, **settings):
+    """
+    Remove and recreate an OSD with the same id
+    """
+    remove(osd_id, **settings)
+    config = OSDConfig(disk)
+    osdp = OSDPartitions(config)
+    osdp.partition()
+    osdc = OSDCommands(config)
+    __salt__['helper.run'](osdc.prepare(osd_id))
+    restore_weight(osd_id)
+    __salt__['helper.run'](osdc.activate())
+    remove_destroyed(disk)
 
 
 def _partition(osd_id):
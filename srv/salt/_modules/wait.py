@@ -10,10 +10,6 @@ import time
 import logging
 # pylint: disable=import-error,3rd-party-module-not-gated
 import salt.ext.six as six
-try:
-    import rados
-except ImportError:
-    logging.info("Could not import rados")
 
 # pylint: disable=incompatible-py3-code
 log = logging.getLogger(__name__)
@@ -49,18 +45,23 @@ class HealthCheck(object):
         """
         Connect to Ceph cluster
         """
-        self.cluster = rados.Rados(conffile=self.settings['conf'])
-        self.cluster.connect()
+        self.cluster = __utils__['rados_pool.connect'](self.settings['conf'])
 
     def _wait(self, cmd, success):
         """
         Poll until the status "matches" the specificed number of checks.
+
+        Polling starts at interval seconds and backs off to delay while the
+        status is unchanged.  Confirming checks are still delay seconds apart
+        so that a passing state has to hold.
         """
-        i = 0
+        backoff = __utils__['backoff.backoff'](self.settings['timeout'],
+                                               self.settings['delay'],
+                                               self.settings.get('interval', 1))
         check = 0
 
         log.debug('wait on condition of command {}'.format(cmd))
-        while i < (self.settings['timeout']/self.settings['delay']):
+        while not backoff.expired():
             _ret, output, _err = self.cluster.mon_command(cmd, b'', timeout=6)
             json_output = json.loads(output)
 
@@ -69,11 +70,14 @@ class HealthCheck(object):
                 if check == self.settings['check']:
                     log.debug("{} checks succeeded".format(self.settings['check']))
                     return True
+                backoff.sleep(self.settings['delay'])
             else:
+                if check:
+                    # A flapping status is not progress; keep the timeout
+                    backoff.reset(window=False)
                 # Reset check counter
                 check = 0
-            i += 1
-            time.sleep(self.settings['delay'])
+                backoff.sleep()
 
         # Bail out
         log.debug("Timeout expired")
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=modernize-parse-error
+"""
+Polling schedule for the execution modules that wait on the cluster, such
+as osd.quiescent and wait.out.  Execution modules cannot import each other,
+so they share it through __utils__['backoff.backoff'].
+"""
+
+from __future__ import absolute_import
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class Backoff(object):
+    """
+    Polls start short and double while nothing changes, up to delay.
+    Progress resets both the interval and the timeout, which is a sliding
+    window of time spent waiting.
+    """
+
+    def __init__(self, timeout, delay, initial=1):
+        """
+        Validate the schedule
+        """
+        if delay == 0:
+            raise ValueError("The delay cannot be 0")
+        self.timeout = timeout
+        self.maximum = delay
+        self.initial = min(initial, delay)
+        self.interval = self.initial
+        self.waited = 0
+
+    def reset(self, window=True):
+        """
+        Something changed; poll again soon.  Restart the timeout window
+        unless window is False, for changes that are not progress.
+        """
+        self.interval = self.initial
+        if window:
+            self.waited = 0
+
+    def expired(self):
+        """
+        True when the window passed without progress
+        """
+        return self.waited >= self.timeout
+
+    def sleep(self, interval=None):
+        """
+        Sleep for the current interval and lengthen the next one.  An
+        explicit interval leaves the schedule alone.
+        """
+        if interval is None:
+            interval = self.interval
+            self.interval = min(self.interval * 2, self.maximum)
+        interval = min(interval, self.timeout - self.waited)
+        log.debug("sleeping {} seconds".format(interval))
+        time.sleep(interval)
+        self.waited += interval
+
+
+def backoff(timeout, delay, initial=1):
+    """
+    Return a Backoff for the timeout and maximum delay
+    """
+    return Backoff(timeout, delay, initial)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# pylint: disable=modernize-parse-error
+"""
+Pooled connections to the Ceph cluster for the execution modules.
+
+Connecting costs a monitor round trip and a cephx handshake, which polling
+loops such as osd.quiescent and wait.out would otherwise pay on every call.
+Execution modules cannot import each other, so they share the pool through
+__utils__['rados_pool.connect'].
+"""
+
+from __future__ import absolute_import
+import errno
+import threading
+import logging
+# pylint: disable=import-error,3rd-party-module-not-gated
+try:
+    import rados
+except ImportError:
+    logging.info("Could not import rados")
+
+log = logging.getLogger(__name__)
+
+# Return codes of mon_command that a fresh connection may not see again
+RETRY_CODES = (-errno.EAGAIN, -errno.ETIMEDOUT)
+
+
+class RadosPool(object):
+    """
+    Keep one connected rados.Rados per conf, keyring and client for the life
+    of the minion process
+    """
+
+    def __init__(self):
+        """
+        Start empty, connections are made on demand
+        """
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    # pylint: disable=no-self-use
+    def _healthy(self, cluster):
+        """
+        A connection is reusable while librados reports it connected
+        """
+        try:
+            return cluster.state == 'connected' and bool(cluster.get_fsid())
+        # pylint: disable=broad-except
+        except Exception:
+            return False
+
+    # pylint: disable=no-self-use
+    def _shutdown(self, cluster):
+        """
+        Release a connection, ignoring errors from a dead one
+        """
+        try:
+            cluster.shutdown()
+        # pylint: disable=broad-except
+        except Exception as error:
+            log.debug("shutdown failed: {}".format(error))
+
+    def get(self, conffile, keyring=None, client=None):
+        """
+        Return a healthy connection, reconnecting when the pooled one is gone
+        """
+        key = (conffile, keyring, client)
+        with self.lock:
+            cluster = self.connections.get(key)
+            if cluster is not None:
+                if self._healthy(cluster):
+                    return cluster
+                log.debug("Reconnecting to Ceph as {}".format(key))
+                self._shutdown(cluster)
+                del self.connections[key]
+            kwargs = {'conffile': conffile}
+            if keyring:
+                kwargs['conf'] = dict(keyring=keyring)
+            if client:
+                kwargs['name'] = client
+            cluster = rados.Rados(**kwargs)
+            cluster.connect()
+            self.connections[key] = cluster
+            return cluster
+
+    def drop(self, conffile, keyring=None, client=None):
+        """
+        Forget a connection that failed
+        """
+        key = (conffile, keyring, client)
+        with self.lock:
+            cluster = self.connections.pop(key, None)
+            if cluster is not None:
+                self._shutdown(cluster)
+
+
+class Connection(object):
+    """
+    Pooled cluster handle.  A mon_command that raises or returns EAGAIN or
+    ETIMEDOUT drops the connection and retries once on a fresh one.
+    """
+
+    def __init__(self, conffile, keyring=None, client=None):
+        """
+        Check out a connection from the pool
+        """
+        self.key = (conffile, keyring, client)
+        self.cluster = _POOL.get(*self.key)
+
+    def _reconnect(self):
+        """
+        Replace the pooled connection with a fresh one
+        """
+        _POOL.drop(*self.key)
+        self.cluster = _POOL.get(*self.key)
+
+    def mon_command(self, cmd, inbuf, timeout=6):
+        """
+        Send a monitor command, reconnecting once on failure
+        """
+        try:
+            ret = self.cluster.mon_command(cmd, inbuf, timeout=timeout)
+        # pylint: disable=broad-except
+        except Exception as error:
+            log.warning("mon_command failed, reconnecting: {}".format(error))
+        else:
+            if ret[0] not in RETRY_CODES:
+                return ret
+            log.warning("mon_command returned {}, reconnecting".format(ret[0]))
+        self._reconnect()
+        return self.cluster.mon_command(cmd, inbuf, timeout=timeout)
+
+
+# Salt reloads this module between calls; keep the pool across reloads.
+try:
+    _POOL  # pylint: disable=used-before-assignment
+except NameError:
+    _POOL = RadosPool()
+
+
+def connect(conffile, keyring=None, client=None):
+    """
+    Return a pooled Connection for the conf, keyring and client
+    """
+    return Connection(conffile, keyring=keyring, client=client)
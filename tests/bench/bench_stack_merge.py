@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark of the pillar stack list merging.
+
+Compares the current _merge_list against the previous implementation, which
+rebuilt lists on every merge and scanned the removal list for every item.
+
+    python tests/bench/bench_stack_merge.py [--devices N]
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+import argparse
+import copy
+import sys
+import timeit
+sys.path.insert(0, 'srv/modules/pillar')
+# pylint: disable=import-error,wrong-import-position
+import stack
+
+
+def _legacy_merge_list(current, obj):
+    """
+    The list merge before it modified lists in place
+    """
+    strategy = 'merge-last'
+    if obj and isinstance(obj[0], dict) and '__' in obj[0]:
+        strategy = obj[0]['__']
+        del obj[0]
+    if strategy == 'overwrite':
+        return obj
+    elif strategy == 'remove':
+        return [item for item in current if item not in obj]
+    elif strategy == 'merge-first':
+        return obj + current
+    return current + obj
+
+
+def _append(merge, devices):
+    """
+    Merge one device at a time, as a stack of per minion files does
+    """
+    current = []
+    for device in devices:
+        current = merge(current, [device])
+    return current
+
+
+def _remove(merge, devices):
+    """
+    Remove half of the devices with a single remove strategy
+    """
+    return merge(list(devices), [{'__': 'remove'}] + devices[::2])
+
+
+def main():
+    """
+    Time both implementations and verify they agree
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--devices', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    devices = ['/dev/disk/by-id/wwn-0x{:016x}'.format(i) for i in range(args.devices)]
+
+    for name, scenario in [('append', _append), ('remove', _remove)]:
+        legacy = scenario(_legacy_merge_list, copy.deepcopy(devices))
+        current = scenario(stack._merge_list, copy.deepcopy(devices))
+        assert legacy == current, "{} results differ".format(name)
+
+        timings = {}
+        for label, merge in [('legacy', _legacy_merge_list),
+                             ('current', stack._merge_list)]:
+            timings[label] = min(timeit.repeat(
+                lambda: scenario(merge, list(devices)),
+                number=1, repeat=args.repeat))
+        print("{:8} {:>8} devices  legacy {:8.3f}s  current {:8.3f}s  {:6.1f}x".format(
+            name, args.devices, timings['legacy'], timings['current'],
+            timings['legacy'] / max(timings['current'], 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
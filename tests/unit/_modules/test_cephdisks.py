@@ -1,5 +1,7 @@
 import pytest
+import struct
 import sys
+import uuid
 sys.path.insert(0, 'srv/salt/_modules')
 from srv.salt._modules import cephdisks, helper
 from mock import MagicMock, patch, mock_open, mock, create_autospec
@@ -410,6 +412,299 @@ class TestHardwareDetections_2():
         hwd = cephdisks.HardwareDetections(detection_method='lshw')
         assert callable(hwd.detection_method) is True
 
+    def test_detection_tool_default_sysfs(self):
+        hwd = cephdisks.HardwareDetections()
+        assert hwd.native is True
+        assert hwd.detection_method is None
+
+
+class TestSysfs():
+    """
+    Reading disk details without external tools
+    """
+
+    def _gpt(self, path, types):
+        """
+        Write a minimal GPT with one partition per type
+        """
+        entries = b''
+        for number, guid in enumerate(types):
+            entries += (uuid.UUID(guid).bytes_le +
+                        uuid.UUID(int=number + 1).bytes_le +
+                        struct.pack('<QQQ', 2048 * (number + 1), 2048 * (number + 2) - 1, 0) +
+                        u'ceph data'.encode('utf-16-le').ljust(72, b'\0'))
+        header = b'EFI PART' + b'\0' * 64 + struct.pack('<QII', 2, 128, 128)
+        with open(path, 'wb') as _fd:
+            _fd.write(b'\0' * 512)
+            _fd.write(header.ljust(512, b'\0'))
+            _fd.write(entries.ljust(128 * 128, b'\0'))
+
+    def _disk(self, tmpdir, name='sda'):
+        """
+        Fake sysfs entry of a disk behind a raid controller
+        """
+        pci = tmpdir.mkdir('devices').mkdir('0000:02:00.0')
+        pci.mkdir('megaraid_sas')
+        pci.join('driver').mksymlinkto(pci.join('megaraid_sas'))
+        scsi = pci.mkdir('host0').mkdir('0:2:0:0')
+        scsi.mkdir('sd')
+        scsi.join('driver').mksymlinkto(scsi.join('sd'))
+        scsi.join('model').write('PERC H700       \n')
+        scsi.join('vendor').write('DELL    \n')
+        scsi.join('vpd_pg80').write_binary(b'\x00\x80\x00\x0400fc')
+        base = tmpdir.mkdir('block').mkdir(name)
+        base.join('device').mksymlinkto(scsi)
+        base.join('size').write('3905945600\n')
+        return str(base)
+
+    def test_gpt_partitions(self, tmpdir):
+        path = str(tmpdir.join('disk'))
+        self._gpt(path, [cephdisks.PARTITION_TYPES['data'],
+                         "0FC63DAF-8483-4772-8E79-3D69D8477DE4"])
+        ret = cephdisks._gpt_partitions(path)
+        assert [part['number'] for part in ret] == [1, 2]
+        assert ret[0]['type'] == cephdisks.PARTITION_TYPES['data']
+        assert ret[0]['uuid'] == str(uuid.UUID(int=1)).upper()
+        assert ret[0]['name'] == 'ceph data'
+        assert ret[1]['first'] == 4096
+
+    def test_gpt_partitions_entries_elsewhere(self, tmpdir):
+        path = str(tmpdir.join('disk'))
+        self._gpt(path, [cephdisks.PARTITION_TYPES['wal']])
+        with open(path, 'r+b') as _fd:
+            _fd.seek(512 + 72)
+            _fd.write(struct.pack('<Q', 40))
+            _fd.seek(40 * 512)
+            _fd.write(uuid.UUID(cephdisks.PARTITION_TYPES['db']).bytes_le + b'\1' * 112)
+            _fd.write(b'\0' * 128 * 127)
+        ret = cephdisks._gpt_partitions(path)
+        assert [part['type'] for part in ret] == [cephdisks.PARTITION_TYPES['db']]
+
+    @patch('srv.salt._modules.cephdisks._read_sysfs', return_value='4096')
+    @patch('srv.salt._modules.cephdisks._gpt_partitions')
+    def test_partitions(self, gpt, read):
+        cephdisks.partitions('/dev/sdb')
+        read.assert_called_with("/sys/class/block/sdb/queue/logical_block_size", "512")
+        gpt.assert_called_with('/dev/sdb', 4096)
+
+    def test_gpt_partitions_no_gpt(self, tmpdir):
+        path = tmpdir.join('disk')
+        path.write_binary(b'\0' * 4096)
+        assert cephdisks._gpt_partitions(str(path)) == []
+
+    def test_gpt_partitions_unreadable(self, tmpdir):
+        assert cephdisks._gpt_partitions(str(tmpdir.join('missing'))) is None
+
+    @patch('srv.salt._modules.cephdisks._gpt_partitions')
+    def test_ceph_partitions(self, gpt):
+        gpt.return_value = [{'type': cephdisks.PARTITION_TYPES['journal']}]
+        hwd = cephdisks.HardwareDetections()
+        assert hwd._ceph_partitions('sdb', ['1']) is True
+
+    @patch('srv.salt._modules.cephdisks._gpt_partitions')
+    def test_ceph_partitions_other(self, gpt):
+        gpt.return_value = [{'type': "0FC63DAF-8483-4772-8E79-3D69D8477DE4"}]
+        hwd = cephdisks.HardwareDetections()
+        assert hwd._ceph_partitions('sdb', ['1']) is False
+
+    @patch('srv.salt._modules.cephdisks.HardwareDetections._osd')
+    @patch('srv.salt._modules.cephdisks._gpt_partitions')
+    def test_ceph_partitions_fallback(self, gpt, osd):
+        gpt.return_value = None
+        osd.return_value = True
+        hwd = cephdisks.HardwareDetections()
+        assert hwd._ceph_partitions('sdb', ['1', '2']) is True
+        osd.assert_called_with('/dev/sdb', ['1', '2'])
+
+    def test_drivers(self, tmpdir):
+        base = self._disk(tmpdir)
+        assert cephdisks._drivers(base + '/device') == 'megaraid_sas, sd'
+
+    def test_device_links(self, tmpdir):
+        disk = tmpdir.join('sda')
+        disk.write('')
+        by_id = tmpdir.mkdir('by-id')
+        by_id.join('wwn-0x6b82').mksymlinkto(disk)
+        by_id.join('scsi-SDELL_PERC_H700').mksymlinkto(disk)
+        ret = cephdisks._device_links([str(by_id), str(tmpdir.join('by-path'))])
+        assert ret == {str(disk): [str(by_id.join('scsi-SDELL_PERC_H700')),
+                                   str(by_id.join('wwn-0x6b82'))]}
+
+    def test_sysfs(self, tmpdir):
+        base = self._disk(tmpdir)
+        links = {'/dev/sda': ['/dev/disk/by-id/scsi-SDELL_PERC_H700']}
+        ret = cephdisks.HardwareDetections()._sysfs('sda', base, links)
+        assert ret == {'Bytes': '1999844147200',
+                       'Capacity': '1862 GB',
+                       'Vendor': 'DELL',
+                       'Model': 'DELL PERC H700',
+                       'Serial ID': '00fc',
+                       'Driver': 'megaraid_sas, sd',
+                       'Device File': '/dev/sda',
+                       'Device Files': '/dev/sda, /dev/disk/by-id/scsi-SDELL_PERC_H700'}
+
+    def _nvme(self, tmpdir):
+        """
+        Fake sysfs entry of an NVMe namespace, its controller and PCI function
+        """
+        pci = tmpdir.mkdir('devices').mkdir('0000:03:00.0')
+        pci.join('vendor').write('0x144d\n')
+        controller = pci.mkdir('nvme').mkdir('nvme0')
+        controller.join('device').mksymlinkto(pci)
+        controller.join('model').write('Samsung SSD 970 EVO Plus 500GB          \n')
+        base = tmpdir.mkdir('block').mkdir('nvme0n1')
+        base.join('device').mksymlinkto(controller)
+        base.join('size').write('976773168\n')
+        return str(base)
+
+    def _profile_label(self, hardware):
+        """
+        The drive label of populate's hardware profile for one disk
+        """
+        from srv.modules.runners import populate
+        profile = populate.HardwareProfile()
+        drive = dict(hardware, rotational='0', Driver='')
+        profile.add('data1.ceph', [drive])
+        return list(profile.model)[0]
+
+    def test_sysfs_ata_vendor(self, tmpdir):
+        base = self._disk(tmpdir)
+        scsi = tmpdir.join('devices', '0000:02:00.0', 'host0', '0:2:0:0')
+        scsi.join('vendor').write('ATA\n')
+        scsi.join('model').write('Samsung SSD 850\n')
+        ret = cephdisks.HardwareDetections()._sysfs('sda', base, {})
+        assert ret['Vendor'] == 'Samsung'
+        assert ret['Model'] == 'Samsung SSD 850'
+        assert self._profile_label(ret) == 'Samsung1862GB'
+
+    def test_sysfs_ata_single_word_model(self, tmpdir):
+        base = self._disk(tmpdir)
+        scsi = tmpdir.join('devices', '0000:02:00.0', 'host0', '0:2:0:0')
+        scsi.join('vendor').write('ATA\n')
+        scsi.join('model').write('ST2000DM001-1CH164\n')
+        ret = cephdisks.HardwareDetections()._sysfs('sda', base, {})
+        assert 'Vendor' not in ret
+        assert self._profile_label(ret) == 'ST2000DM001-1CH1641862GB'
+
+    def test_sysfs_nvme_vendor(self, tmpdir):
+        base = self._nvme(tmpdir)
+        pci_ids = tmpdir.join('pci.ids')
+        pci_ids.write('# comment\n1425  Chelsio Communications Inc\n'
+                      '144d  Samsung Electronics Co Ltd\n'
+                      '\ta804  NVMe SSD Controller SM961/PM961\n')
+        with patch.object(cephdisks, 'PCI_IDS', (str(pci_ids),)):
+            ret = cephdisks.HardwareDetections()._sysfs('nvme0n1', base, {})
+        assert ret['Vendor'] == 'pci 0x144d Samsung Electronics Co Ltd'
+        assert self._profile_label(ret) == 'Ltd465GB'
+
+    def test_sysfs_nvme_vendor_without_pci_ids(self, tmpdir):
+        base = self._nvme(tmpdir)
+        with patch.object(cephdisks, 'PCI_IDS', (str(tmpdir.join('missing')),)):
+            ret = cephdisks.HardwareDetections()._sysfs('nvme0n1', base, {})
+        assert ret['Vendor'] == 'Samsung'
+        assert self._profile_label(ret) == 'Samsung465GB'
+
+    @patch('srv.salt._modules.cephdisks.HardwareDetections._find_detection_tool')
+    def test_fallback_lshw_once(self, tool):
+        hwd = cephdisks.HardwareDetections()
+        lshw = MagicMock(return_value={'/dev/sda': {'Model': 'Disk'}})
+        hwd._lshw = lshw
+        tool.return_value = lshw
+        assert hwd._fallback('sda') == {'Model': 'Disk'}
+        assert hwd._fallback('sdb') == {}
+        assert lshw.call_count == 1
+
+    @patch('srv.salt._modules.cephdisks.HardwareDetections._find_detection_tool')
+    def test_fallback_none(self, tool):
+        tool.side_effect = Exception("no tool")
+        hwd = cephdisks.HardwareDetections()
+        assert hwd._fallback('sda') == {}
+        assert hwd._fallback('sdb') == {}
+        assert tool.call_count == 1
+
+
+class TestInventoryCache():
+    """
+    Persisted inventory keyed by the block device fingerprint
+    """
+
+    @pytest.fixture
+    def cache(self, tmpdir):
+        cephdisks.__opts__ = {'cachedir': str(tmpdir)}
+        cephdisks.__pillar__ = {}
+        with patch('srv.salt._modules.cephdisks._fingerprint', return_value='abc'):
+            with patch('srv.salt._modules.cephdisks.HardwareDetections', autospec=True) as hwd:
+                hwd.return_value.assemble_device_list.return_value = [
+                    {'Device File': '/dev/sdb'}, {'Device File': '/dev/sda'}]
+                yield hwd
+
+    def test_fingerprint_partition(self, tmpdir):
+        base = tmpdir.mkdir('sda')
+        base.join('size').write('100\n')
+        before = cephdisks._fingerprint(str(tmpdir))
+        assert before == cephdisks._fingerprint(str(tmpdir))
+        base.mkdir('sda1')
+        assert before != cephdisks._fingerprint(str(tmpdir))
+
+    def test_fingerprint_new_disk(self, tmpdir):
+        tmpdir.mkdir('sda')
+        before = cephdisks._fingerprint(str(tmpdir))
+        tmpdir.mkdir('sdb')
+        assert before != cephdisks._fingerprint(str(tmpdir))
+
+    def test_cached(self, cache):
+        first = cephdisks.list_()
+        assert cephdisks.list_() == first
+        assert cache.return_value.assemble_device_list.call_count == 1
+
+    def test_filter_cached(self, cache):
+        cephdisks.list_()
+        assert cephdisks.filter_() == ['/dev/sda', '/dev/sdb']
+        assert cache.return_value.assemble_device_list.call_count == 1
+
+    def test_fingerprint_changed(self, cache):
+        cephdisks.list_()
+        with patch('srv.salt._modules.cephdisks._fingerprint', return_value='def'):
+            cephdisks.list_()
+        assert cache.return_value.assemble_device_list.call_count == 2
+
+    def test_options_changed(self, cache):
+        cephdisks.list_()
+        cephdisks.list_(detection_method='hwinfo')
+        assert cache.return_value.assemble_device_list.call_count == 2
+
+    def test_ignores_other_kwargs(self, cache):
+        cephdisks.list_()
+        cephdisks.list_(ratio=7, __pub_fun='cephdisks.list')
+        assert cache.return_value.assemble_device_list.call_count == 1
+
+    def test_no_cache(self, cache):
+        cephdisks.list_()
+        cephdisks.list_(cache=False)
+        assert cache.return_value.assemble_device_list.call_count == 2
+
+    def test_expired(self, cache):
+        cephdisks.__pillar__ = {'ceph': {'modules': {'cephdisks': {'cache': {'ttl': -1}}}}}
+        cephdisks.list_()
+        cephdisks.list_()
+        assert cache.return_value.assemble_device_list.call_count == 2
+
+    def test_invalidate(self, cache):
+        cephdisks.list_()
+        assert cephdisks.invalidate() is True
+        cephdisks.list_()
+        assert cache.return_value.assemble_device_list.call_count == 2
+
+    def test_unwritable(self, cache, tmpdir):
+        cephdisks.__opts__ = {'cachedir': str(tmpdir.join('missing'))}
+        assert cephdisks.list_() == [{'Device File': '/dev/sdb'}, {'Device File': '/dev/sda'}]
+
+    @patch('srv.salt._modules.cephdisks.os.path.isdir', return_value=False)
+    def test_ttl_without_udev(self, isdir):
+        cephdisks.__pillar__ = {}
+        assert cephdisks._cache_ttl() == cephdisks.CACHE_TTL_UNWATCHED
+
+
 class TestCephDiskDevice():
 
     @mock.patch('srv.salt._modules.cephdisks._pathname_setting')
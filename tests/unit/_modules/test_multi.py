@@ -0,0 +1,142 @@
+import socket
+import struct
+import pytest
+from mock import patch, MagicMock
+from srv.salt._modules import multi
+
+
+class TestProber():
+
+    def test_checksum(self):
+        header = struct.pack('!BBHHH', 8, 0, 0, 1, 1)
+        packet = struct.pack('!BBHHH', 8, 0, multi._checksum(header), 1, 1)
+        assert multi._checksum(packet) == 0
+
+    def test_checksum_odd_length(self):
+        data = b'\x08\x00\x00\x00\x00\x01\x00\x01\xff'
+        assert multi._checksum(data) == multi._checksum(data + b'\x00')
+
+    def test_rtt_stats(self):
+        ret = multi._rtt_stats([1.0, 3.0])
+        assert ret == {'min': 1.0, 'avg': 2.0, 'max': 3.0, 'mdev': 1.0}
+
+    def test_rtt_stats_empty(self):
+        assert multi._rtt_stats([])['avg'] is None
+
+    def test_ipv6_payload_fits_same_mtu(self):
+        prober = multi.Prober(size=8972)
+        v4 = prober._packet(socket.AF_INET, 1)
+        v6 = prober._packet(socket.AF_INET6, 1)
+        assert len(v4) + 20 == len(v6) + 40
+
+    @patch('srv.salt._modules.multi.socket.socket')
+    def test_unresolved_host_errors(self, sock):
+        with patch('srv.salt._modules.multi._resolve',
+                   side_effect=socket.gaierror("unknown host")):
+            stats = multi.Prober().run(['nohost'])
+        assert stats['nohost']['rc'] == 2
+        assert sock.call_count == 0
+
+    @patch('srv.salt._modules.multi.select.select')
+    @patch('srv.salt._modules.multi.socket.socket')
+    def test_matches_replies(self, sock, select):
+        prober = multi.Prober(timeout=1)
+        raw = sock.return_value
+        raw.family = socket.AF_INET
+        select.return_value = ([raw], [], [])
+
+        def _recvfrom(size):
+            reply = struct.pack('!BBHHH', 0, 0, 0, prober.ident, 1)
+            ip_header = b'\x45' + b'\x00' * 19
+            raw.recvfrom.side_effect = socket.error(11, "again")
+            return ip_header + reply, ('10.0.0.1', 0)
+        raw.recvfrom.side_effect = _recvfrom
+        stats = prober.run(['10.0.0.1'])
+        assert stats['10.0.0.1']['rc'] == 0
+        assert stats['10.0.0.1']['received'] == 1
+
+    @patch('srv.salt._modules.multi.socket.socket')
+    def test_no_reply_fails(self, sock):
+        sock.return_value.family = socket.AF_INET
+        with patch('srv.salt._modules.multi.select.select', return_value=([], [], [])), \
+                patch('srv.salt._modules.multi.time.time', side_effect=[0, 0, 0] + [2] * 10):
+            stats = multi.Prober(timeout=1).run(['10.0.0.1'])
+        assert stats['10.0.0.1']['rc'] == 1
+
+    def test_open_failure_closes_sockets(self):
+        v4 = MagicMock()
+
+        def _socket(family, kind, proto):
+            if family == socket.AF_INET6:
+                raise socket.error(97, "Address family not supported")
+            return v4
+
+        addresses = {'10.0.0.1': (socket.AF_INET, '10.0.0.1'),
+                     'fd00::1': (socket.AF_INET6, 'fd00::1')}
+        with patch('srv.salt._modules.multi._resolve', side_effect=addresses.get), \
+                patch('srv.salt._modules.multi.socket.socket', side_effect=_socket):
+            prober = multi.Prober()
+            with pytest.raises(socket.error):
+                prober.run(['10.0.0.1', 'fd00::1'])
+        v4.close.assert_called_once_with()
+        assert prober.sockets == {}
+
+
+class TestPing():
+
+    def test_summarize_probe(self):
+        stats = {'a': {'rc': 0, 'avg': 1.0}, 'b': {'rc': 1, 'avg': None},
+                 'c': {'rc': 2, 'avg': None}}
+        ret = multi._summarize_probe(['a', 'b', 'c'], stats)
+        assert ret == {'succeeded': 1, 'failed': 'b', 'errored': 'c', 'avg': 1.0}
+
+    @patch('srv.salt._modules.multi._all')
+    @patch('srv.salt._modules.multi.Prober')
+    def test_falls_back_to_ping(self, prober, _all):
+        prober.return_value.run.side_effect = socket.error(1, "Operation not permitted")
+        _all.return_value = [('a', 0, 'rtt min/avg/max/mdev = 0.1/0.2/0.3/0.0 ms', '')]
+        ret = multi.ping('a')
+        assert _all.call_args[0][0] == multi.ping_cmd
+        assert ret['succeeded'] == 1
+
+
+class TestPingStats():
+
+    def test_stats_from_ping(self):
+        out = ('1 packets transmitted, 1 received, 0% packet loss, time 0ms\n'
+               'rtt min/avg/max/mdev = 0.041/0.042/0.043/0.000 ms\n')
+        stats = multi._stats_from_ping([('a', 0, out, ''), ('b', 1, '', '')])
+        assert stats['a']['avg'] == 0.042
+        assert stats['a']['received'] == 1
+        assert stats['b']['rc'] == 1
+        assert stats['b']['avg'] is None
+
+    @patch('srv.salt._modules.multi._probe')
+    def test_mtu(self, probe):
+        probe.side_effect = [{'a': {'rc': 0}, 'b': {'rc': 0}, 'c': {'rc': 1}},
+                             {'a': {'rc': 0}, 'b': {'rc': 1}}]
+        multi.__grains__ = {'ipv4': ['d'], 'ipv6': []}
+        stats = multi.ping_stats('a', 'b', 'c', 'd', mtu=True)
+        assert probe.call_args_list[0][0][0] == ['a', 'b', 'c']
+        assert probe.call_args_list[1][0][0] == ['a', 'b']
+        assert [stats[host]['mtu'] for host in 'abc'] == [9000, 1500, None]
+
+
+class TestIperfRound():
+
+    @patch('srv.salt._modules.multi.iperf_client_cmd')
+    def test_runs_own_tests(self, client_cmd):
+        client_cmd.return_value = ('10.0.0.2', 0, '0.00-10.00 sec 1 GBytes 940 Mbits/sec', '')
+        multi.__grains__ = {'id': 'a'}
+        tests = {'a': [['10.0.0.1', '10.0.0.2', 0, 5200]],
+                 'b': [['10.0.0.2', '10.0.0.1', 0, 5200]]}
+        ret = multi.iperf_round(tests)
+        assert len(ret) == 1
+        assert ret[0]['client'] == '10.0.0.1'
+        assert ret[0]['server'] == '10.0.0.2'
+        assert ret[0]['filter'] == '940 Mbits/sec'
+        assert client_cmd.call_args[0][3] == '10.0.0.1'
+
+    def test_no_tests(self):
+        multi.__grains__ = {'id': 'c'}
+        assert multi.iperf_round({'a': []}) == []
@@ -1,11 +1,13 @@
 from pyfakefs import fake_filesystem as fake_fs
 from pyfakefs import fake_filesystem_glob as fake_glob
+import json
 import os
 import pytest
 import sys
 sys.path.insert(0, 'srv/salt/_modules')
 import tempfile
 from srv.salt._modules import osd
+from srv.salt._utils import backoff
 from tests.unit.helper.fixtures import helper_specs
 from mock import MagicMock, patch, mock, create_autospec
 
@@ -13,6 +15,16 @@ from mock import MagicMock, patch, mock, create_autospec
 DEFAULT_MODULE = osd
 
 
+@pytest.fixture(autouse=True)
+def utils():
+    """
+    Provide the minion utils that the waiting loops use
+    """
+    with patch.object(osd, '__utils__', {'backoff.backoff': backoff.backoff},
+                      create=True):
+        yield
+
+
 class TestOSDInstanceMethods():
     '''
     This class contains a set of functions that test srv.salt._modules.osd
@@ -1353,6 +1365,37 @@ class TestOSDPartitions():
         glob_mock.glob.assert_called_with('/dev/sdx[0-9]*')
         assert ret == 0
 
+    @mock.patch('srv.salt._modules.osd._gpt_partitions')
+    def test__last_partition_gpt(self, gpt_mock, helper_specs):
+        gpt_mock.return_value = [{'number': 1}, {'number': 3}]
+        osd_config = OSDConfig()
+        test_module = helper_specs(module=DEFAULT_MODULE)
+        obj = test_module.OSDPartitions(osd_config)
+        ret = obj._last_partition(osd_config.device)
+        gpt_mock.assert_called_with('/dev/sdx')
+        assert ret == 3
+
+    @mock.patch('srv.salt._modules.osd.glob')
+    @mock.patch('srv.salt._modules.osd._gpt_partitions')
+    def test__last_partition_gpt_empty(self, gpt_mock, glob_mock, helper_specs):
+        gpt_mock.return_value = []
+        glob_mock.glob.return_value = []
+        osd_config = OSDConfig()
+        test_module = helper_specs(module=DEFAULT_MODULE)
+        obj = test_module.OSDPartitions(osd_config)
+        assert obj._last_partition(osd_config.device) == 0
+
+    @mock.patch('srv.salt._modules.osd.glob')
+    @mock.patch('srv.salt._modules.osd._gpt_partitions')
+    def test__last_partition_mbr(self, gpt_mock, glob_mock, helper_specs):
+        gpt_mock.return_value = []
+        glob_mock.glob.return_value = ['/dev/sdx1', '/dev/sdx2']
+        osd_config = OSDConfig()
+        test_module = helper_specs(module=DEFAULT_MODULE)
+        obj = test_module.OSDPartitions(osd_config)
+        assert obj._last_partition(osd_config.device) == 2
+        glob_mock.glob.assert_called_with('/dev/sdx[0-9]*')
+
     @pytest.mark.skip(reason='postponed')
     def test__last_partition_no_pathnames(self):
         """
@@ -1446,6 +1489,32 @@ class TestOSDCommands():
         ret = obj.highest_partition(osd_config.device, 'osd')
         assert ret == 'p2'
 
+    @mock.patch('srv.salt._modules.osd._gpt_partitions')
+    def test_highest_partition_gpt(self, gpt_mock, osdc_o):
+        """
+        Given the GPT can be read
+        Expect the highest partition of that type without sgdisk
+        """
+        kwargs = {'device': '/dev/nvme1n1'}
+        gpt_mock.return_value = [
+            {'number': 1, 'type': '4FBD7E29-9D25-41B8-AFD0-062C0CEFF05D'},
+            {'number': 2, 'type': '5CE17FCE-4087-4169-B7FF-056CC58473F9'},
+            {'number': 3, 'type': '4FBD7E29-9D25-41B8-AFD0-062C0CEFF05D'},
+            {'number': 4, 'type': '30CD0809-C2B2-499C-8879-2D6B78529876'}]
+        osd_config = OSDConfig(**kwargs)
+        obj = osdc_o(osd_config)
+        assert obj.highest_partition(osd_config.device, 'osd') == 'p3'
+        assert obj.highest_partition(osd_config.device, 'osd', nvme_partition=False) == '3'
+
+    @mock.patch('srv.salt._modules.osd._gpt_partitions')
+    def test_highest_partition_gpt_missing(self, gpt_mock, osdc_o):
+        gpt_mock.return_value = [
+            {'number': 1, 'type': '5CE17FCE-4087-4169-B7FF-056CC58473F9'}]
+        osd_config = OSDConfig()
+        obj = osdc_o(osd_config)
+        assert obj.highest_partition(osd_config.device, 'osd') == 0
+        assert obj.error == "Partition type osd not found on /dev/sdx"
+
     @mock.patch('srv.salt._modules.osd.OSDCommands.is_partition')
     @mock.patch('srv.salt._modules.osd.glob')
     def test_highest_partition_encrypted(self, glob_mock, part_mock, osdc_o):
@@ -2764,6 +2833,39 @@ class TestOSDRemove():
         result = osdr.destroy()
         assert result == ""
 
+    def test_delete_partitions_batched(self):
+        partitions = {'osd': '/dev/sdb1',
+                      'journal': '/dev/sdc1',
+                      'wal': '/dev/sdc2',
+                      'db': '/dev/sdc5'}
+        mock_device = mock.Mock()
+        mock_device.partitions.return_value = partitions
+        osd.__salt__ = {'helper.run': mock.Mock(return_value=(0, "out", "err"))}
+
+        osdr = osd.OSDRemove(1, mock_device, None, None)
+        osdr.osd_disk = '/dev/sdb'
+        with patch.object(osd, 'readlink', side_effect=lambda path: path), \
+                patch.object(osd.os.path, 'exists', return_value=True), \
+                patch.object(osd, '_gpt_partitions') as gpt:
+            gpt.return_value = [{'number': 1}, {'number': 2}]
+            assert osdr._delete_partitions() == ""
+        gpt.assert_called_once_with('/dev/sdc')
+        osd.__salt__['helper.run'].assert_called_once_with('sgdisk -d 1 -d 2 /dev/sdc')
+
+    def test_delete_partitions_batched_fails(self):
+        partitions = {'journal': '/dev/sdc1', 'wal': '/dev/sdc2'}
+        mock_device = mock.Mock()
+        mock_device.partitions.return_value = partitions
+        osd.__salt__ = {'helper.run': mock.Mock(return_value=(1, "out", "err"))}
+
+        osdr = osd.OSDRemove(1, mock_device, None, None)
+        osdr.osd_disk = '/dev/sdb'
+        with patch.object(osd, 'readlink', side_effect=lambda path: path), \
+                patch.object(osd.os.path, 'exists', return_value=True), \
+                patch.object(osd, '_gpt_partitions', return_value=None):
+            ret = osdr._delete_partitions()
+        assert ret == "Failed to delete partition 1, 2 on /dev/sdc"
+
     def test_destroy_fails_partition_delete(self):
         partitions = {'osd': '/dev/sda1'}
         mock_device = mock.Mock()
@@ -3993,3 +4095,291 @@ class Test_report():
         unconfigured, changed = osd._report_original_pillar(["/dev/sda"])
         assert unconfigured == []
         assert changed == ["/dev/sda"]
+
+class TestOSDDrain():
+
+    def _drain(self, responses):
+        with patch.object(osd.OSDDrain, "__init__", lambda self, ids: None):
+            drain = osd.OSDDrain([])
+            drain.osd_ids = [1, 2]
+            drain.pending = [1, 2]
+            drain.settings = {'timeout': 60, 'delay': 6}
+            drain.cluster = MagicMock()
+            drain.cluster.mon_command.side_effect = responses
+        return drain
+
+    @staticmethod
+    def _df(pgs):
+        nodes = [{'id': _id, 'pgs': count} for _id, count in pgs.items()]
+        return (0, json.dumps({'nodes': nodes}), '')
+
+    def test_safe_all(self):
+        drain = self._drain([(0, '', 'OSD(s) 1,2 are safe to destroy')])
+        assert drain.safe([1, 2]) == [1, 2]
+        assert drain.cluster.mon_command.call_count == 1
+
+    def test_safe_json(self):
+        output = json.dumps({'safe_to_destroy': [2], 'active': [1]})
+        drain = self._drain([(-16, output, '')])
+        assert drain.safe([1, 2]) == [2]
+
+    def test_safe_confirms_empty(self):
+        drain = self._drain([(-16, '', 'busy'), (0, '', '')])
+        assert drain.safe([1, 2], pgs={1: 5, 2: 0}) == [2]
+        assert drain.cluster.mon_command.call_count == 2
+
+    @patch('time.sleep')
+    @patch('srv.salt._modules.osd._DF', new=osd.OSDDf(ttl=0))
+    def test_drained_yields_as_ready(self, sleep):
+        drain = self._drain([self._df({1: 5, 2: 0}),
+                             (-16, json.dumps({'safe_to_destroy': [2]}), ''),
+                             self._df({1: 0}),
+                             (0, '', '')])
+        assert list(drain.drained()) == [2, 1]
+        assert drain.pending == []
+        assert sleep.call_count == 1
+
+    @patch('srv.salt._modules.osd._redeploy')
+    @patch('srv.salt._modules.osd.CephPGs')
+    @patch('srv.salt._modules.osd.OSDDrain')
+    @patch('srv.salt._modules.osd.zero_weight')
+    @patch('srv.salt._modules.osd.is_incorrect', return_value=True)
+    @patch('srv.salt._modules.osd.split_partition', side_effect=lambda part: (part[:-1], '1'))
+    @patch('srv.salt._modules.osd._partition', side_effect=lambda _id: '/dev/sd{}1'.format(_id))
+    def test_redeploy_simultaneous(self, partition, split, incorrect,
+                                   zero_weight, drain, pgs, redeploy):
+        osd.__grains__ = {'ceph': {'1': {}, '2': {}}}
+        drain.return_value.drained.return_value = iter([2, 1])
+        osd.redeploy(simultaneous=True)
+        assert [c[0][0] for c in redeploy.call_args_list] == ['2', '1']
+        pgs.return_value.quiescent.assert_not_called()
+
+
+class TestOSDDf():
+
+    @staticmethod
+    def _cluster():
+        cluster = MagicMock()
+        cluster.key = ('/etc/ceph/ceph.conf', None, None)
+        nodes = [{'id': 0, 'pgs': 10}, {'id': 1, 'pgs': 0}]
+        cluster.mon_command.return_value = (0, json.dumps({'nodes': nodes}), '')
+        return cluster
+
+    def test_indexed_by_id(self):
+        index = osd.OSDDf().get(self._cluster())
+        assert index[1] == {'id': 1, 'pgs': 0}
+
+    def test_shared_within_ttl(self):
+        cluster = self._cluster()
+        df = osd.OSDDf(ttl=60)
+        df.get(cluster)
+        df.get(cluster)
+        assert cluster.mon_command.call_count == 1
+
+    def test_refreshed_after_ttl(self):
+        cluster = self._cluster()
+        df = osd.OSDDf(ttl=0)
+        df.get(cluster)
+        df.get(cluster)
+        assert cluster.mon_command.call_count == 2
+
+    def test_invalidate(self):
+        cluster = self._cluster()
+        df = osd.OSDDf(ttl=60)
+        df.get(cluster)
+        df.invalidate()
+        df.get(cluster)
+        assert cluster.mon_command.call_count == 2
+
+    def test_osd_weights_share_one_query(self):
+        cluster = self._cluster()
+        with patch.object(osd, "_DF", osd.OSDDf(ttl=60)):
+            with patch.object(osd.OSDWeight, "__init__", lambda self, _id: None):
+                for _id in [0, 1, 2]:
+                    osdw = osd.OSDWeight(_id)
+                    osdw.osd_id = _id
+                    osdw.cluster = cluster
+                    osdw.osd_df()
+                assert osdw.osd_df() == {}
+        assert cluster.mon_command.call_count == 1
+
+
+class TestDeploy():
+
+    def _config(self, device='/dev/sdb', journal=None, wal=None, db=None,
+                fmt='bluestore', wal_size=None, db_size=None, encryption=None):
+        config = mock.Mock(device=device, journal=journal, wal=wal, db=db,
+                           disk_format=fmt, journal_size=None, wal_size=wal_size,
+                           db_size=db_size, encryption=encryption)
+        return config
+
+    def test_device_locks_exclusive(self):
+        locks = osd.DeviceLocks()
+        with locks.hold(['/dev/nvme0n1', '/dev/sdc']):
+            assert locks._lock('/dev/sdc').locked()
+            assert not locks._lock('/dev/sdd').locked()
+        assert not locks._lock('/dev/sdc').locked()
+
+    def test_device_locks_released_on_error(self):
+        locks = osd.DeviceLocks()
+        with pytest.raises(RuntimeError):
+            with locks.hold(['/dev/sdc']):
+                raise RuntimeError("failed")
+        assert not locks._lock('/dev/sdc').locked()
+
+    @patch('srv.salt._modules.osd.readlink', side_effect=lambda path: path)
+    def test_shared_devices(self, readlink):
+        config = self._config(wal='/dev/nvme0n1', db='/dev/nvme0n1')
+        assert osd._shared_devices(config) == ['/dev/nvme0n1']
+
+    @patch('srv.salt._modules.osd.readlink', side_effect=lambda path: path)
+    def test_shared_devices_colocated(self, readlink):
+        config = self._config(wal='/dev/sdb', db='/dev/sdb')
+        assert osd._shared_devices(config) == []
+
+    def test_presized(self):
+        assert osd._presized(self._config(db='/dev/nvme0n1', db_size='10G'))
+        assert not osd._presized(self._config(db='/dev/nvme0n1'))
+        assert not osd._presized(self._config(db='/dev/nvme0n1', db_size='10G',
+                                              encryption='dmcrypt'))
+
+    def _deploy_device(self, config, run):
+        osd.__salt__ = {'helper.run': mock.Mock(side_effect=run)}
+        with patch.object(osd, 'is_prepared', return_value=False), \
+                patch.object(osd, 'OSDConfig', return_value=config), \
+                patch.object(osd, 'OSDCommands') as osdc, \
+                patch.object(osd, 'OSDPartitions'), \
+                patch.object(osd, 'find_destroyed', return_value=None), \
+                patch.object(osd, 'remove_destroyed'), \
+                patch.object(osd, 'readlink', side_effect=lambda path: path), \
+                patch.object(osd, '_DEVICE_LOCKS', osd.DeviceLocks()) as locks:
+            osdc.return_value.prepare.return_value = 'prepare'
+            osdc.return_value.activate.return_value = 'activate'
+            return osd._deploy_device(config.device), locks
+
+    def test_deploy_device_prepare_outside_lock(self):
+        locked = []
+
+        def _run(cmd):
+            locked.append((cmd, osd._DEVICE_LOCKS._lock('/dev/nvme0n1').locked()))
+            return 0, '', ''
+
+        config = self._config(db='/dev/nvme0n1', db_size='10G')
+        report, _ = self._deploy_device(config, _run)
+        assert report['result'] == 'deployed'
+        assert locked == [('prepare', False), ('activate', False)]
+
+    def test_deploy_device_prepare_inside_lock(self):
+        locked = []
+
+        def _run(cmd):
+            locked.append((cmd, osd._DEVICE_LOCKS._lock('/dev/nvme0n1').locked()))
+            return 0, '', ''
+
+        config = self._config(db='/dev/nvme0n1')
+        report, _ = self._deploy_device(config, _run)
+        assert locked == [('prepare', True), ('activate', False)]
+
+    def test_deploy_device_prepare_fails(self):
+        config = self._config()
+        report, _ = self._deploy_device(config, lambda cmd: (1, '', 'error'))
+        assert report['result'] == 'failed'
+        assert report['prepare'] == 1
+
+    @patch('srv.salt._modules.osd.is_prepared', return_value=True)
+    def test_deploy_device_skipped(self, prepared):
+        assert osd._deploy_device('/dev/sdb')['result'] == 'skipped'
+
+    @patch('srv.salt._modules.osd._deploy_device')
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_parallel(self, configured, deploy_device):
+        configured.return_value = ['/dev/sdb', '/dev/sdc', '/dev/sdd']
+        deploy_device.side_effect = lambda device: {'result': 'deployed'}
+        with patch.object(osd.multiprocessing.dummy, 'Pool', wraps=osd.multiprocessing.dummy.Pool) as pool:
+            ret = osd.deploy(parallel=True, workers=2)
+        pool.assert_called_with(2)
+        assert ret == {'/dev/sdb': {'result': 'deployed'},
+                       '/dev/sdc': {'result': 'deployed'},
+                       '/dev/sdd': {'result': 'deployed'}}
+
+    @patch('srv.salt._modules.osd._deploy_device')
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_serial_reports_failures(self, configured, deploy_device):
+        configured.return_value = ['/dev/sdb', '/dev/sdc']
+        deploy_device.side_effect = [{'result': 'failed', 'prepare': 1, 'activate': 0},
+                                     {'result': 'deployed'}]
+        ret = osd.deploy()
+        assert ret['/dev/sdb']['result'] == 'failed'
+        assert ret['/dev/sdc']['result'] == 'deployed'
+
+    @patch('srv.salt._modules.osd._deploy_device')
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_serial_raises_immediately(self, configured, deploy_device):
+        configured.return_value = ['/dev/sdb', '/dev/sdc']
+        deploy_device.side_effect = [RuntimeError("boom"), {'result': 'deployed'}]
+        with pytest.raises(RuntimeError) as excinfo:
+            osd.deploy()
+        assert deploy_device.call_count == 1
+        assert str(excinfo.value) == "boom"
+
+    @patch('srv.salt._modules.osd._deploy_device')
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_parallel_raises_after_all_devices(self, configured, deploy_device):
+        configured.return_value = ['/dev/sdb', '/dev/sdc', '/dev/sdd']
+        results = {'/dev/sdb': {'result': 'failed', 'prepare': 0, 'activate': 1},
+                   '/dev/sdc': {'result': 'deployed'}}
+
+        def _deploy(device):
+            if device == '/dev/sdd':
+                raise RuntimeError("boom")
+            return results[device]
+        deploy_device.side_effect = _deploy
+        with pytest.raises(RuntimeError) as excinfo:
+            osd.deploy(parallel=True)
+        assert deploy_device.call_count == 3
+        assert '/dev/sdb: activate returned 1' in str(excinfo.value)
+        assert '/dev/sdd: boom' in str(excinfo.value)
+
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_lvm_parallel(self, configured):
+        configured.return_value = ['/dev/sdb', '/dev/sdc']
+        osd.__salt__ = {'helper.run': mock.Mock(return_value=(0, '/dev/sdx', ''))}
+        ret = osd.deploy_lvm(parallel=True)
+        assert ret['/dev/sdb']['result'] == 'prepared'
+        assert ret['/dev/sdc']['prepare'] == 0
+        assert osd.__salt__['helper.run'].call_count == 5
+        osd.__salt__['helper.run'].assert_called_with(['ceph-volume', 'lvm', 'activate', '--all'])
+
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_lvm_serial_prepare_fails(self, configured):
+        configured.return_value = ['/dev/sdb', '/dev/sdc']
+        osd.__salt__ = {'helper.run': mock.Mock(side_effect=[(0, '/dev/sdx', ''),
+                                                             (1, '', 'error'),
+                                                             (0, '/dev/sdy', ''),
+                                                             (0, '', ''),
+                                                             (1, '', 'error')])}
+        ret = osd.deploy_lvm()
+        assert ret['/dev/sdb']['result'] == 'failed'
+        assert ret['/dev/sdc']['result'] == 'prepared'
+        osd.__salt__['helper.run'].assert_called_with(['ceph-volume', 'lvm', 'activate', '--all'])
+
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_lvm_parallel_prepare_fails(self, configured):
+        configured.return_value = ['/dev/sdb']
+        osd.__salt__ = {'helper.run': mock.Mock(side_effect=[(0, '/dev/sdx', ''),
+                                                             (1, '', 'error'),
+                                                             (0, '', '')])}
+        with pytest.raises(RuntimeError) as excinfo:
+            osd.deploy_lvm(parallel=True)
+        assert osd.__salt__['helper.run'].call_count == 3
+        assert '/dev/sdb: prepare returned 1' in str(excinfo.value)
+        osd.__salt__['helper.run'].assert_called_with(['ceph-volume', 'lvm', 'activate', '--all'])
+
+    @patch('srv.salt._modules.osd.configured')
+    def test_deploy_lvm_parallel_activate_fails(self, configured):
+        configured.return_value = []
+        osd.__salt__ = {'helper.run': mock.Mock(return_value=(1, '', 'error'))}
+        assert osd.deploy_lvm() == {}
+        with pytest.raises(RuntimeError) as excinfo:
+            osd.deploy_lvm(parallel=True)
+        assert 'activate returned 1' in str(excinfo.value)
@@ -2,6 +2,7 @@ import pytest
 import sys
 sys.path.insert(0, 'srv/salt/_modules')
 from srv.salt._modules import wait
+from srv.salt._utils import backoff
 from mock import MagicMock, mock
 
 DEFAULT_MODULE = wait
@@ -12,8 +13,9 @@ class TestHealthStatusCheck(object):
     """ Unittests for HealthStatusCheck """
     @pytest.fixture()
     def wait(self):
-        wait.rados = MagicMock()
-        yield wait
+        utils = {'rados_pool.connect': MagicMock()}
+        with mock.patch.object(wait, '__utils__', utils, create=True):
+            yield wait
 
     @mock.patch('srv.salt._modules.wait.time')
     def test_just(self, time_mock, wait):
@@ -26,3 +28,42 @@ class TestHealthStatusCheck(object):
         kwargs = {'status': "HEALTH_OK", 'delay': 7}
         wait.just(**kwargs)
         time_mock.sleep.assert_called_with(7)
+
+
+class TestWait(object):
+
+    @pytest.fixture()
+    def check(self):
+        utils = {'rados_pool.connect': MagicMock(),
+                 'backoff.backoff': backoff.backoff}
+        with mock.patch.object(wait, '__utils__', utils, create=True):
+            yield wait.HealthStatusCheck(status='HEALTH_OK', timeout=60, delay=8)
+
+    def _statuses(self, check, statuses):
+        cluster = check.cluster
+        cluster.mon_command.side_effect = [
+            (0, '{{"status": "{}"}}'.format(status), '') for status in statuses]
+        return cluster
+
+    @mock.patch('srv.salt._utils.backoff.time')
+    def test_backs_off_while_unchanged(self, time_mock, check):
+        self._statuses(check, ['HEALTH_WARN'] * 4 + ['HEALTH_OK'] * 2)
+        assert check.wait() is None
+        sleeps = [call[0][0] for call in time_mock.sleep.call_args_list]
+        assert sleeps == [1, 2, 4, 8, 8]
+
+    @mock.patch('srv.salt._utils.backoff.time')
+    def test_flap_resets_interval(self, time_mock, check):
+        self._statuses(check, ['HEALTH_WARN', 'HEALTH_WARN', 'HEALTH_OK',
+                               'HEALTH_WARN', 'HEALTH_OK', 'HEALTH_OK'])
+        check.wait()
+        sleeps = [call[0][0] for call in time_mock.sleep.call_args_list]
+        assert sleeps == [1, 2, 8, 1, 8]
+
+    @mock.patch('srv.salt._utils.backoff.time')
+    def test_timeout(self, time_mock, check):
+        self._statuses(check, ['HEALTH_WARN'] * 20)
+        with pytest.raises(RuntimeError) as excinfo:
+            check.wait()
+        assert 'Timeout expired' in str(excinfo.value)
+        assert sum(call[0][0] for call in time_mock.sleep.call_args_list) == 60
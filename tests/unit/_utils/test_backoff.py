@@ -0,0 +1,52 @@
+import pytest
+from mock import patch
+from srv.salt._utils import backoff
+
+
+class TestBackoff():
+
+    @patch('time.sleep')
+    def test_doubles_up_to_delay(self, sleep):
+        schedule = backoff.backoff(60, 12)
+        for _ in range(6):
+            schedule.sleep()
+        assert [call[0][0] for call in sleep.call_args_list] == [1, 2, 4, 8, 12, 12]
+
+    @patch('time.sleep')
+    def test_reset(self, sleep):
+        schedule = backoff.backoff(60, 12)
+        schedule.sleep()
+        schedule.sleep()
+        schedule.reset()
+        assert schedule.waited == 0
+        schedule.sleep()
+        assert sleep.call_args[0][0] == 1
+
+    @patch('time.sleep')
+    def test_reset_keeps_window(self, sleep):
+        schedule = backoff.backoff(60, 12)
+        schedule.sleep()
+        schedule.sleep()
+        schedule.reset(window=False)
+        assert schedule.waited == 3
+        schedule.sleep()
+        assert sleep.call_args[0][0] == 1
+
+    @patch('time.sleep')
+    def test_explicit_interval(self, sleep):
+        schedule = backoff.backoff(60, 12)
+        schedule.sleep(8)
+        schedule.sleep()
+        assert [call[0][0] for call in sleep.call_args_list] == [8, 1]
+        assert schedule.waited == 9
+
+    @patch('time.sleep')
+    def test_expires(self, sleep):
+        schedule = backoff.backoff(10, 6)
+        while not schedule.expired():
+            schedule.sleep()
+        assert [call[0][0] for call in sleep.call_args_list] == [1, 2, 4, 3]
+
+    def test_delay_is_zero(self):
+        with pytest.raises(ValueError):
+            backoff.backoff(10, 0)
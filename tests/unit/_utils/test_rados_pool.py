@@ -0,0 +1,74 @@
+import errno
+import pytest
+from mock import patch, MagicMock
+from srv.salt._utils import rados_pool
+
+
+class TestRadosPool(object):
+
+    @pytest.fixture()
+    def rados(self):
+        with patch.object(rados_pool, 'rados', create=True) as rados:
+            rados.Rados.return_value.state = 'connected'
+            rados.Rados.return_value.get_fsid.return_value = 'fsid'
+            yield rados
+
+    def test_reuses_connection(self, rados):
+        pool = rados_pool.RadosPool()
+        first = pool.get('/etc/ceph/ceph.conf')
+        second = pool.get('/etc/ceph/ceph.conf')
+        assert first is second
+        assert rados.Rados.return_value.connect.call_count == 1
+
+    def test_keyed_by_credentials(self, rados):
+        pool = rados_pool.RadosPool()
+        pool.get('/etc/ceph/ceph.conf')
+        pool.get('/etc/ceph/ceph.conf', keyring='/keyring', client='client.storage')
+        assert rados.Rados.call_count == 2
+        rados.Rados.assert_called_with(conffile='/etc/ceph/ceph.conf',
+                                       conf={'keyring': '/keyring'},
+                                       name='client.storage')
+
+    def test_reconnects_when_unhealthy(self, rados):
+        pool = rados_pool.RadosPool()
+        cluster = pool.get('/etc/ceph/ceph.conf')
+        cluster.state = 'shutdown'
+        pool.get('/etc/ceph/ceph.conf')
+        assert cluster.shutdown.call_count == 1
+        assert rados.Rados.call_count == 2
+
+    def test_drop(self, rados):
+        pool = rados_pool.RadosPool()
+        cluster = pool.get('/etc/ceph/ceph.conf')
+        pool.drop('/etc/ceph/ceph.conf')
+        assert cluster.shutdown.call_count == 1
+        assert pool.connections == {}
+
+
+class TestConnection(object):
+
+    @pytest.fixture()
+    def cluster(self):
+        with patch.object(rados_pool, '_POOL', MagicMock()) as pool:
+            yield pool.get.return_value
+
+    def test_retries_on_exception(self, cluster):
+        cluster.mon_command.side_effect = [IOError("timed out"), (0, b'{}', '')]
+        conn = rados_pool.connect('/etc/ceph/ceph.conf')
+        assert conn.mon_command('{}', b'') == (0, b'{}', '')
+        rados_pool._POOL.drop.assert_called_once_with('/etc/ceph/ceph.conf', None, None)
+
+    @pytest.mark.parametrize('code', [errno.EAGAIN, errno.ETIMEDOUT])
+    def test_retries_on_negative_rc(self, cluster, code):
+        cluster.mon_command.side_effect = [(-code, b'', 'busy'), (0, b'{}', '')]
+        conn = rados_pool.connect('/etc/ceph/ceph.conf')
+        assert conn.mon_command('{}', b'') == (0, b'{}', '')
+        assert cluster.mon_command.call_count == 2
+
+    def test_returns_other_errors(self, cluster):
+        cluster.mon_command.return_value = (-errno.ENOENT, b'', 'missing')
+        conn = rados_pool.connect('/etc/ceph/ceph.conf', keyring='/keyring',
+                                  client='client.admin')
+        assert conn.mon_command('{}', b'') == (-errno.ENOENT, b'', 'missing')
+        assert cluster.mon_command.call_count == 1
+        assert rados_pool._POOL.drop.call_count == 0
@@ -0,0 +1,131 @@
+import sys
+import pytest
+import yaml
+from mock import patch
+sys.path.insert(0, 'srv/modules/pillar')
+import stack
+
+
+@pytest.fixture
+def stackdir(tmpdir):
+    tmpdir.join('stack.cfg').write("global.yml\nminions/{{ minion_id }}.yml\n")
+    tmpdir.join('global.yml').write("cluster: ceph\nroles:\n  - storage\n")
+    tmpdir.mkdir('minions')
+    tmpdir.join('minions', 'data1.yml').write("fsid: {{ pillar['fsid'] }}\n")
+    stack.__opts__ = {}
+    stack.__salt__ = {}
+    stack.__grains__ = {}
+    stack._bytecode_cache.clear()
+    stack._yaml_cache.clear()
+    return tmpdir
+
+
+class TestStackCache():
+
+    def test_process_stack_cfg(self, stackdir):
+        cfg = str(stackdir.join('stack.cfg'))
+        ret = stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+        assert ret == {'cluster': 'ceph', 'roles': ['storage'], 'fsid': 'abc'}
+
+    def test_yaml_parsed_once(self, stackdir):
+        cfg = str(stackdir.join('stack.cfg'))
+        with patch.object(stack.yaml, 'safe_load', wraps=stack.yaml.safe_load) as safe_load:
+            stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+            first = safe_load.call_count
+            stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+            # only the stack cfg itself is parsed again
+            assert safe_load.call_count == first + 1
+
+    def test_render_inputs_change(self, stackdir):
+        cfg = str(stackdir.join('stack.cfg'))
+        stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+        ret = stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'def'})
+        assert ret['fsid'] == 'def'
+
+    def test_template_change(self, stackdir):
+        cfg = str(stackdir.join('stack.cfg'))
+        stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+        stackdir.join('global.yml').write("cluster: other\n")
+        ret = stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+        assert ret['cluster'] == 'other'
+
+    def test_cached_copy_not_shared(self, stackdir):
+        cfg = str(stackdir.join('stack.cfg'))
+        ret = stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+        ret['roles'].append('mon')
+        ret = stack._process_stack_cfg(cfg, {}, 'data1', {'fsid': 'abc'})
+        assert ret['roles'] == ['storage']
+
+
+class TestLRUCache():
+
+    def test_evicts_least_recently_used(self):
+        cache = stack._LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+
+class TestMergeList():
+
+    def test_merge_last(self):
+        assert stack._merge_list([1, 2], [3, 4]) == [1, 2, 3, 4]
+
+    def test_merge_first(self):
+        assert stack._merge_list([1, 2], [{'__': 'merge-first'}, 3, 4]) == [3, 4, 1, 2]
+
+    def test_overwrite(self):
+        assert stack._merge_list([1, 2], [{'__': 'overwrite'}, 3]) == [3]
+
+    def test_remove(self):
+        ret = stack._merge_list(['tom', 'root', 'mat'], [{'__': 'remove'}, 'mat', 'tom'])
+        assert ret == ['root']
+
+    def test_remove_unhashable(self):
+        ret = stack._merge_list([{'a': 1}, ['b'], 'c', {'d': 2}],
+                                [{'__': 'remove'}, {'a': 1}, ['b']])
+        assert ret == ['c', {'d': 2}]
+
+    def test_remove_keeps_duplicates_order(self):
+        ret = stack._merge_list([3, 1, 2, 1, 3], [{'__': 'remove'}, 2])
+        assert ret == [3, 1, 1, 3]
+
+    def test_unknown_strategy(self):
+        with pytest.raises(Exception):
+            stack._merge_list([], [{'__': 'merge-sideways'}])
+
+    def test_merge_dict_lists(self):
+        merged = {}
+        for osd in range(1000):
+            merged = stack._merge_dict(merged, {'osds': ['/dev/sd{}'.format(osd)]})
+        merged = stack._merge_dict(merged, {'osds': [{'__': 'remove'}] +
+                                            ['/dev/sd{}'.format(osd) for osd in range(500)]})
+        assert merged['osds'] == ['/dev/sd{}'.format(osd) for osd in range(500, 1000)]
+
+    def test_merge_dict_merge_first(self):
+        merged = stack._merge_dict({'users': {'tom': {'roles': ['sysadmin']}}},
+                                   {'users': {'__': 'merge-first',
+                                              'tom': {'roles': ['developer']}}})
+        assert merged == {'users': {'tom': {'roles': ['developer', 'sysadmin']}}}
+
+    @pytest.mark.parametrize("second", [
+        {'a': [2]},
+        {'a': [{'__': 'merge-first'}, 2]},
+        {'a': [{'__': 'remove'}, 1]},
+    ])
+    def test_merge_dict_aliased_list(self, second):
+        first = yaml.safe_load("a: &x [1]\nb: *x\n")
+        merged = stack._merge_dict({}, first)
+        merged = stack._merge_dict(merged, second)
+        assert merged['b'] == [1]
+
+    def test_merge_dict_aliased_overwrite(self):
+        merged = stack._merge_dict({}, {'a': [1]})
+        merged = stack._merge_dict(merged, yaml.safe_load(
+            "a: &x [{__: overwrite}, 2]\nb: *x\n"))
+        merged = stack._merge_dict(merged, {'a': [3]})
+        assert merged == {'a': [2, 3], 'b': [2]}
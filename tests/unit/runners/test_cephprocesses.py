@@ -17,11 +17,68 @@ class TestCephProcesses():
         roles = ['mon']
 
         local = localclient.return_value
-        local.cmd.return_value = result
-
-        status = cephprocesses._status(search, roles, False)
+        local.run_job.return_value = {'jid': '1', 'minions': list(result)}
+        local.get_iter_returns.return_value = iter(
+            [None] + [{minion: {'ret': result[minion]}} for minion in result])
+        utils = {'snapshot.pillar':
+                 lambda search, key, default: {'mon1.ceph': ['mon'],
+                                               'mon2.ceph': ['mon'],
+                                               'mon3.ceph': ['mon']}}
+
+        with patch.object(cephprocesses, '__opts__', {'timeout': 5}, create=True), \
+                patch.object(cephprocesses, '__utils__', utils, create=True):
+            status = cephprocesses._status(search, roles, False)
         assert status['mon'] == result
 
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_status_publishes_all_roles_first(self, localclient):
+        search = "I@cluster:ceph"
+        roles = ['mon', 'storage']
+        calls = []
+
+        def run_job(tgt, *args, **kwargs):
+            calls.append('publish')
+            return {'jid': tgt, 'minions': []}
+
+        def get_iter_returns(jid, minions, **kwargs):
+            calls.append('subscribe')
+            yield None
+            calls.append('collect')
+            yield {jid: {'ret': True}}
+
+        local = localclient.return_value
+        local.run_job.side_effect = run_job
+        local.get_iter_returns.side_effect = get_iter_returns
+        utils = {'snapshot.pillar':
+                 lambda search, key, default: {'mon1.ceph': ['mon'],
+                                               'data1.ceph': ['storage']}}
+
+        with patch.object(cephprocesses, '__opts__', {'timeout': 5}, create=True), \
+                patch.object(cephprocesses, '__utils__', utils, create=True):
+            status = cephprocesses._status(search, roles, False)
+        assert calls[:2] == ['publish', 'publish']
+        assert local.run_job.call_count == 2
+        assert status['mon'] == {"I@cluster:ceph and I@roles:mon": True}
+        assert status['storage'] == {"I@cluster:ceph and I@roles:storage": True}
+
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_status_skips_unassigned_roles(self, localclient):
+        search = "I@cluster:ceph"
+        roles = ['mon', 'rgw']
+
+        local = localclient.return_value
+        local.run_job.return_value = {'jid': '1', 'minions': ['mon1.ceph']}
+        local.get_iter_returns.return_value = iter([{'mon1.ceph': {'ret': True}}])
+        utils = {'snapshot.pillar':
+                 lambda search, key, default: {'mon1.ceph': ['mon']}}
+
+        with patch.object(cephprocesses, '__opts__', {'timeout': 5}, create=True), \
+                patch.object(cephprocesses, '__utils__', utils, create=True):
+            status = cephprocesses._status(search, roles, False)
+        assert status['rgw'] == {}
+        assert status['mon'] == {'mon1.ceph': True}
+        assert local.run_job.call_count == 1
+
     @patch('srv.modules.runners.cephprocesses._status', autospec=True)
     @patch('srv.modules.runners.cephprocesses._cached_roles', autospec=True)
     def test_check(self, cachedroles, status):
@@ -1,4 +1,6 @@
 from mock import patch, MagicMock, mock_open
+import hashlib
+import os
 import pytest
 from pyfakefs import fake_filesystem as fake_fs
 
@@ -169,3 +171,114 @@ class TestChanged():
     def test_igw(self, rcc_mock, salt_mock):
         changed.igw()
         rcc_mock.assert_called
+
+
+class TestChecksums():
+    """
+    Testing the checksum engine with real files
+    """
+
+    def test_file(self, tmpdir):
+        conf = tmpdir.join('rgw.conf')
+        conf.write('foo=bar')
+        checksums = changed.Checksums(str(tmpdir.join('manifest.json')))
+        assert checksums.file(str(conf)) == '06ad47d8e64bd28de537b62ff85357c4'
+
+    def test_file_streamed(self, tmpdir):
+        conf = tmpdir.join('rgw.conf')
+        conf.write('x' * (changed.BLOCK_SIZE * 2 + 1))
+        checksums = changed.Checksums(str(tmpdir.join('manifest.json')))
+        assert checksums.file(str(conf)) == hashlib.md5(b'x' * (changed.BLOCK_SIZE * 2 + 1)).hexdigest()
+
+    def test_file_missing(self, tmpdir):
+        checksums = changed.Checksums(str(tmpdir.join('manifest.json')))
+        assert checksums.file(str(tmpdir.join('missing.conf'))) is None
+
+    def test_manifest_skips_unchanged(self, tmpdir):
+        conf = tmpdir.join('rgw.conf')
+        conf.write('foo=bar')
+        manifest = str(tmpdir.join('manifest.json'))
+        checksums = changed.Checksums(manifest)
+        md5 = checksums.file(str(conf))
+        checksums.save()
+
+        with patch('srv.modules.runners.changed.open', create=True) as open_mock:
+            open_mock.side_effect = open
+            checksums = changed.Checksums(manifest)
+            assert checksums.file(str(conf)) == md5
+        # Only the manifest was read
+        assert open_mock.call_count == 1
+
+    def test_manifest_detects_change(self, tmpdir):
+        conf = tmpdir.join('rgw.conf')
+        conf.write('foo=bar')
+        manifest = str(tmpdir.join('manifest.json'))
+        checksums = changed.Checksums(manifest)
+        md5 = checksums.file(str(conf))
+        checksums.save()
+
+        conf.write('foo=baz')
+        os.utime(str(conf), (0, 12345))
+        assert changed.Checksums(manifest).file(str(conf)) != md5
+
+    def test_role(self, tmpdir):
+        tmpdir.join('rgw.conf').write('foo=bar')
+        role = changed.Role(role_name='rgw', conf_dir=str(tmpdir) + '/',
+                            rgw_configurations=[])
+        checksums = changed.Checksums(str(tmpdir.join('manifest.json')))
+        expected = hashlib.md5('06ad47d8e64bd28de537b62ff85357c4'.encode('ascii')).hexdigest()
+        assert checksums.role(role) == expected
+
+    def test_save_unchanged(self, tmpdir):
+        manifest = tmpdir.join('manifest.json')
+        changed.Checksums(str(manifest)).save()
+        assert not manifest.exists()
+
+
+class TestAll():
+    """
+    Testing the single pass over all roles
+    """
+
+    @pytest.fixture
+    def tree(self, tmpdir):
+        conf_dir = tmpdir.mkdir('ceph.conf.d')
+        checksum_dir = tmpdir.mkdir('ceph.conf.checksum')
+        for name in ['mon', 'osd', 'rgw', 'global']:
+            conf_dir.join(name + '.conf').write(name)
+
+        def _roles(rgw_configurations):
+            return [changed.Role(role_name=name, conf_dir=str(conf_dir) + '/',
+                                 rgw_configurations=rgw_configurations)
+                    for name in ['mon', 'rgw', 'global']]
+
+        with patch.object(changed, 'CHECKSUM_DIR', str(checksum_dir) + '/'), \
+                patch.object(changed, '_roles', side_effect=_roles), \
+                patch.object(changed, '_rgw_configurations', return_value=['rgw']) as rgw, \
+                patch('salt.client.LocalClient', autospec=True) as localclient:
+            yield conf_dir, rgw, localclient
+
+    def test_first_run(self, tree):
+        conf_dir, rgw, localclient = tree
+        ret = changed.all_()
+        assert ret == {'mon': True, 'rgw': True, 'global': True}
+        assert rgw.call_count == 1
+
+    def test_second_run(self, tree):
+        conf_dir, rgw, localclient = tree
+        changed.all_()
+        localclient.return_value.cmd.reset_mock()
+        assert changed.all_() == {'mon': False, 'rgw': False, 'global': False}
+        assert not localclient.return_value.cmd.called
+
+    def test_dependency_shared(self, tree):
+        """
+        A change of global.conf restarts both the rgw and global roles
+        """
+        conf_dir, rgw, localclient = tree
+        changed.all_()
+        conf_dir.join('global.conf').write('changed')
+        assert changed.all_() == {'mon': False, 'rgw': True, 'global': True}
+        localclient.return_value.cmd.assert_called_with(
+            'I@cluster:ceph and I@roles:global', 'grains.setval',
+            ['restart_global', True], tgt_type="compound")
@@ -164,3 +164,150 @@ class TestFileQueue():
 
 
 
+
+
+class TestJournalQueue():
+    '''
+    This class tests the JournalQueue backend for the salt runner
+    '''
+
+    @pytest.fixture(autouse=True)
+    def fire_event(self):
+        with patch('srv.modules.runners.filequeue.FileQueue._fire_event', autospec=True) as fire_event:
+            filequeue._INDEXES.clear()
+            yield fire_event
+
+    def test_backend(self, dirpath):
+        '''
+        Verify that backend=journal selects the journal
+        '''
+        fq = filequeue._filequeue(root_dir=dirpath, backend='journal')
+        shutil.rmtree(dirpath)
+        assert isinstance(fq, filequeue.JournalQueue)
+
+    def test_backend_options_not_settings(self, dirpath):
+        '''
+        Verify that the backend options stay out of the event data
+        '''
+        journal = filequeue._filequeue(root_dir=dirpath, backend='journal',
+                                       compact_minimum=8)
+        files = filequeue._filequeue(root_dir=dirpath, backend='files',
+                                     compact_minimum=8)
+        shutil.rmtree(dirpath)
+        assert journal.compact_minimum == 8
+        for fq in [journal, files]:
+            assert 'backend' not in fq.settings
+            assert 'compact_minimum' not in fq.settings
+
+    def test_items_order(self, dirpath):
+        '''
+        Verify that items keep the order of additions without delays
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath)
+        for item in ['red', 'blue', 'green']:
+            fq.touch(item)
+        fq.touch('red')
+        files = fq.items()
+        ls = fq.ls()
+        shutil.rmtree(dirpath)
+        assert files == ['blue', 'green', 'red']
+        assert ls == ['blue', 'green', 'red']
+
+    def test_shared_between_instances(self, dirpath):
+        '''
+        Verify that a new instance reads the journal
+        '''
+        filequeue.JournalQueue(root_dir=dirpath).touch('red')
+        filequeue._INDEXES.clear()
+        fq = filequeue.JournalQueue(root_dir=dirpath)
+        checked = fq.check('red')
+        shutil.rmtree(dirpath)
+        assert checked == True
+
+    def test_remove(self, dirpath):
+        '''
+        Verify that remove works
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath)
+        fq.touch("red")
+        fq.touch("blue")
+        ret = fq.remove('red')
+        missing = fq.remove('red')
+        files = fq.ls()
+        shutil.rmtree(dirpath)
+        assert ret and not missing and files == ['blue']
+
+    def test_duplicate_fail(self, dirpath):
+        '''
+        Verify that duplicate_fail is honored
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath, duplicate_fail=True)
+        first = fq.touch("lock")
+        second = fq.touch("lock")
+        shutil.rmtree(dirpath)
+        assert first == True and second == False
+
+    def test_empty_and_vacate(self, dirpath):
+        '''
+        Verify that empty and vacate match the files backend
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath)
+        empty = fq.empty()
+        fq.touch("red")
+        fq.touch("blue")
+        occupied = fq.vacate('red')
+        vacated = fq.vacate('blue')
+        shutil.rmtree(dirpath)
+        assert empty == True and occupied == None and vacated == True
+
+    def test_compaction(self, dirpath):
+        '''
+        Verify that the journal is rewritten and still replays correctly
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath, compact_minimum=8)
+        for count in range(100):
+            fq.touch("item{}".format(count))
+            if count % 2:
+                fq.remove("item{}".format(count))
+        with open(fq.journal) as journal:
+            records = len(journal.readlines())
+        filequeue._INDEXES.clear()
+        files = filequeue.JournalQueue(root_dir=dirpath).items()
+        shutil.rmtree(dirpath)
+        assert records < 110
+        assert files == ["item{}".format(count) for count in range(0, 100, 2)]
+
+    def test_other_process_compaction(self, dirpath):
+        '''
+        Verify that a cached index notices a journal rewritten elsewhere
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath, compact_minimum=4)
+        fq.touch("red")
+        cached = filequeue._INDEXES[fq.journal]
+        # another process compacts the journal
+        del filequeue._INDEXES[fq.journal]
+        other = filequeue.JournalQueue(root_dir=dirpath, compact_minimum=4)
+        for count in range(10):
+            other.touch("blue")
+        filequeue._INDEXES[fq.journal] = cached
+        files = filequeue.JournalQueue(root_dir=dirpath).items()
+        shutil.rmtree(dirpath)
+        assert files == ['red', 'blue']
+
+    def test_partial_record(self, dirpath):
+        '''
+        Verify that an interrupted write is discarded
+        '''
+        fq = filequeue.JournalQueue(root_dir=dirpath)
+        fq.touch("red")
+        with open(fq.journal, "a") as journal:
+            journal.write("+ bl")
+        filequeue._INDEXES.clear()
+        fq = filequeue.JournalQueue(root_dir=dirpath)
+        files = fq.items()
+        fq.touch("blue")
+        filequeue._INDEXES.clear()
+        again = filequeue.JournalQueue(root_dir=dirpath).items()
+        shutil.rmtree(dirpath)
+        assert files == ['red']
+        assert again == ['red', 'blue']
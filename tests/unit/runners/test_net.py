@@ -0,0 +1,117 @@
+from mock import patch, MagicMock
+from srv.modules.runners import net
+from srv.modules.utils import networks
+
+
+class TestMatrix():
+
+    results = {'data2.ceph': {'10.0.0.1': {'rc': 0, 'sent': 1, 'received': 1,
+                                           'min': 0.2, 'avg': 0.2, 'max': 0.2,
+                                           'mdev': 0.0, 'mtu': 9000},
+                              '10.0.1.1': {'rc': 1, 'sent': 1, 'received': 0,
+                                           'min': None, 'avg': None, 'max': None,
+                                           'mdev': None, 'mtu': None}},
+               'data1.ceph': {'10.0.0.2': {'rc': 0, 'sent': 1, 'received': 1,
+                                           'min': 0.4, 'avg': 0.4, 'max': 0.4,
+                                           'mdev': 0.0, 'mtu': 1500}},
+               'data3.ceph': 'multi.ping_stats is not available.'}
+    labels = {'10.0.0.1': '10.0.0.0/24', '10.0.0.2': '10.0.0.0/24',
+              '10.0.1.1': '10.0.1.0/24'}
+
+    def test_matrix(self):
+        columns = net._matrix(self.results, self.labels)
+        assert list(columns) == net.MATRIX_COLUMNS
+        assert columns['source'] == ['data1.ceph', 'data2.ceph', 'data2.ceph']
+        assert columns['destination'] == ['10.0.0.2', '10.0.0.1', '10.0.1.1']
+        assert columns['loss'] == [0.0, 0.0, 100.0]
+        assert columns['mtu'] == [1500, 9000, None]
+
+    def test_percentiles(self):
+        columns = net._matrix(self.results, self.labels)
+        ret = net._percentiles(columns, 'network')
+        assert ret['10.0.0.0/24']['count'] == 2
+        assert ret['10.0.0.0/24']['p50'] == 0.30000000000000004
+        assert ret['10.0.0.0/24']['max'] == 0.4
+        assert ret['10.0.1.0/24'] == {'count': 1, 'failed': 1, 'p50': None,
+                                      'p90': None, 'p99': None, 'max': None}
+
+    def test_percentile(self):
+        assert net._percentile([1, 2, 3, 4, 5], 50) == 3
+        assert net._percentile([1, 2, 3, 4, 5], 90) == 4.6
+        assert net._percentile([7], 99) == 7
+
+    def test_csv(self):
+        columns = net._matrix(self.results, self.labels)
+        lines = net._csv(columns).splitlines()
+        assert lines[0] == 'source,destination,network,rc,loss,min,avg,max,mdev,mtu'
+        assert lines[3] == 'data2.ceph,10.0.1.1,10.0.1.0/24,1,100.0,,,,,'
+
+    def test_subnet_labels(self):
+        interfaces = {'data1.ceph': {'eth0': {'inet': [{'address': '10.0.0.2',
+                                                        'netmask': '255.255.255.0'}]},
+                                     'eth1': {'inet': [{'address': '10.0.1.2',
+                                                        'netmask': '255.255.255.0'}]},
+                                     'lo': {'inet': [{'address': '127.0.0.1',
+                                                      'netmask': '255.0.0.0'}]}},
+                      'data2.ceph': {'eth0': {'inet': [{'address': '10.0.0.1',
+                                                        'netmask': '255.255.255.0'}]},
+                                     'eth1': {}},
+                      'data3.ceph': 'network.interfaces is not available.'}
+        local = MagicMock()
+        local.cmd.return_value = interfaces
+        utils = {'networks.classify': networks.classify,
+                 'networks.interface_network': networks.interface_network}
+        with patch.object(net, '__utils__', utils, create=True):
+            labels = net._subnet_labels(local, '*', ['10.0.0.1', '10.0.0.2',
+                                                     '10.0.1.2', '192.168.0.1'])
+        assert labels == {'10.0.0.1': '10.0.0.0/24', '10.0.0.2': '10.0.0.0/24',
+                          '10.0.1.2': '10.0.1.0/24'}
+
+
+class TestIperf():
+
+    def test_tournament_meets_everyone_once(self):
+        addresses = ['a1', 'b1', 'c1', 'd1', 'e1']
+        owners = {address: address[0] for address in addresses}
+        rounds = net._tournament(addresses, owners)
+        assert len(rounds) == 5
+        met = set()
+        for pairs in rounds:
+            busy = [address for pair in pairs for address in pair]
+            assert len(busy) == len(set(busy))
+            met.update(frozenset(pair) for pair in pairs)
+        assert len(met) == 10
+
+    def test_tournament_skips_same_minion(self):
+        owners = {'a1': 'a', 'a2': 'a', 'b1': 'b', 'b2': 'b'}
+        rounds = net._tournament(['a1', 'a2', 'b1', 'b2'], owners)
+        pairs = [pair for pairs in rounds for pair in pairs]
+        assert len(pairs) == 4
+        assert all(owners[first] != owners[second] for first, second in pairs)
+
+    def test_ports(self):
+        owners = {'a1': 'a', 'a2': 'a', 'b1': 'b'}
+        assert net._ports(['a1', 'a2', 'b1'], owners) == {'a1': 0, 'a2': 1, 'b1': 0}
+
+    def test_bandwidth(self):
+        owners = {'10.0.0.1': 'a', '10.0.0.2': 'b', '10.0.0.3': 'c'}
+
+        def _cmd_iter(tgt, fun, args, tgt_type):
+            for minion in tgt:
+                ret = []
+                for client, server, _, _ in args[0][minion]:
+                    ret.append({'server': server, 'client': client, 'succeeded': True,
+                                'filter': '{} Mbits/sec'.format(int(server[-1]) * 100)})
+                yield {minion: {'ret': ret}}
+
+        local = MagicMock()
+        local.cmd_iter.side_effect = _cmd_iter
+        result, matrix = net._bandwidth(local, sorted(owners), owners)
+        assert local.cmd_iter.call_count == 3
+        assert local.cmd.call_args_list[0][0][:3] == (['a', 'b', 'c'],
+                                                      'multi.prepare_iperf_server', [1])
+        assert matrix['10.0.0.2'] == {'10.0.0.1': 200.0, '10.0.0.3': 200.0}
+        assert result == {'10.0.0.1': 100, '10.0.0.2': 200, '10.0.0.3': 300}
+
+    def test_mbits_failed(self):
+        assert net._mbits({'succeeded': False, 'failed': True}) == 0
@@ -19,3 +19,122 @@ class TestReplace():
         result = replace._find_host(9, osd_list)
         assert result == ""
 
+
+
+class TestDrain():
+
+    tree = {'nodes': [{'id': -1, 'name': 'default', 'type': 'root',
+                       'children': [-2, -5]},
+                      {'id': -2, 'name': 'rack1', 'type': 'rack',
+                       'children': [-3, -4]},
+                      {'id': -5, 'name': 'rack2', 'type': 'rack',
+                       'children': [-6]},
+                      {'id': -3, 'name': 'data1', 'type': 'host',
+                       'children': [0, 1]},
+                      {'id': -4, 'name': 'data2', 'type': 'host',
+                       'children': [2]},
+                      {'id': -6, 'name': 'data3', 'type': 'host',
+                       'children': [3]}]}
+    hosts = {'0': 'data1.ceph', '1': 'data1.ceph',
+             '2': 'data2.ceph', '3': 'data3.ceph', '9': 'data4.ceph'}
+
+    def test_failure_domains(self):
+        result = replace._failure_domains(self.tree, self.hosts, 'rack')
+        assert result == {'0': 'rack1', '1': 'rack1', '2': 'rack1',
+                          '3': 'rack2', '9': 'data4.ceph'}
+
+    def test_next_osd_prefers_idle_domain(self):
+        from collections import OrderedDict
+        domains = {'0': 'a', '1': 'a', '2': 'b'}
+        pending = OrderedDict([('a', ['1']), ('b', ['2'])])
+        assert replace._next_osd(pending, ['0'], domains) == '2'
+        assert replace._next_osd(pending, ['0', '2'], domains) == '1'
+        assert not pending
+
+    @patch('time.sleep')
+    def test_drain_batches(self, sleep):
+        from collections import OrderedDict
+        hosts = OrderedDict([('0', 'data1.ceph'), ('1', 'data1.ceph'),
+                             ('2', 'data2.ceph')])
+        statuses = [{'safe': [], 'pgs': {'0': 10, '2': 12}},
+                    {'safe': [2], 'pgs': {'0': 4, '2': 0}},
+                    {'safe': [0, 1], 'pgs': {'0': 0, '1': 0}}]
+        drained = []
+
+        def _cmd(tgt, fun, args=None, tgt_type='glob'):
+            if fun == 'osd.tree_from_master':
+                return {'admin.ceph': self.tree}
+            if fun == 'osd.zero_weight':
+                drained.append(args[0])
+            if fun == 'osd.drain_status':
+                return {'admin.ceph': statuses.pop(0)}
+            return {tgt: ''}
+
+        local = MagicMock()
+        local.cmd.side_effect = _cmd
+        ready = list(replace._drain(local, 'admin.ceph', hosts, {'batch': 2}))
+        # one OSD per host first, the second on data1 once osd.2 is done
+        assert drained == ['0', '2', '1']
+        assert ready == ['2', '0', '1']
+        assert sleep.call_count == 1
+
+    @patch('time.sleep')
+    @patch('time.time')
+    def test_drain_timeout(self, now, sleep):
+        hosts = {'0': 'data1.ceph'}
+        clock = [0]
+
+        def _sleep(delay):
+            clock[0] += delay
+
+        now.side_effect = lambda: clock[0]
+        sleep.side_effect = _sleep
+        local = MagicMock()
+        local.cmd.return_value = {'admin.ceph': {'safe': [], 'pgs': {'0': 10}}}
+        ready = list(replace._drain(local, 'admin.ceph', hosts,
+                                    {'timeout': 30, 'delay': 10}))
+        assert ready == []
+        assert clock[0] == 30
+
+    @patch('time.sleep')
+    @patch('time.time')
+    def test_drain_timeout_extended_by_progress(self, now, sleep):
+        hosts = {'0': 'data1.ceph'}
+        clock = [0]
+        statuses = [{'safe': [], 'pgs': {'0': 10}},
+                    {'safe': [], 'pgs': {'0': 8}},
+                    {'safe': [], 'pgs': {'0': 6}},
+                    {'safe': [0], 'pgs': {'0': 0}}]
+
+        def _sleep(delay):
+            clock[0] += delay
+
+        def _cmd(tgt, fun, args=None, tgt_type='glob'):
+            if fun == 'osd.drain_status':
+                return {'admin.ceph': statuses.pop(0)}
+            return {tgt: ''}
+
+        now.side_effect = lambda: clock[0]
+        sleep.side_effect = _sleep
+        local = MagicMock()
+        local.cmd.side_effect = _cmd
+        ready = list(replace._drain(local, 'admin.ceph', hosts,
+                                    {'timeout': 15, 'delay': 10}))
+        assert ready == ['0']
+
+    @patch('time.sleep')
+    @patch('time.time')
+    def test_drain_status_failed(self, now, sleep):
+        hosts = {'0': 'data1.ceph'}
+        clock = [0]
+
+        def _sleep(delay):
+            clock[0] += delay
+
+        now.side_effect = lambda: clock[0]
+        sleep.side_effect = _sleep
+        local = MagicMock()
+        local.cmd.return_value = {'admin.ceph': "ERROR: osd.drain_status is not available"}
+        ready = list(replace._drain(local, 'admin.ceph', hosts,
+                                    {'timeout': 20, 'delay': 10}))
+        assert ready == []
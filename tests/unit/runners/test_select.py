@@ -0,0 +1,105 @@
+from mock import patch, MagicMock
+from srv.modules.runners import select
+
+
+class TestSelectFrom():
+
+    def _utils(self, configurations, assigned, grains):
+        def _pillar(search, key, default=''):
+            if search == "I@roles:master":
+                return {'admin.ceph': configurations}
+            return assigned
+        utils = {'snapshot.pillar': MagicMock(side_effect=_pillar),
+                 'snapshot.grains': MagicMock(return_value=grains),
+                 'snapshot.minions': MagicMock(return_value=list(assigned))}
+        return utils
+
+    def test_from_configurations(self):
+        assigned = {'rgw1.ceph': ['rgw'],
+                    'rgw2.ceph': ['silver'],
+                    'rgw3.ceph': ['silver', 'gold']}
+        grains = {'rgw1.ceph': {'host': 'rgw1', 'fqdn': 'rgw1.ceph'},
+                  'rgw2.ceph': {'host': 'rgw2', 'fqdn': 'rgw2.ceph'},
+                  'rgw3.ceph': {'host': 'rgw3', 'fqdn': 'rgw3.ceph'}}
+        utils = self._utils(['silver', 'gold'], assigned, grains)
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.from_('rgw_configurations', 'rgw', attr='host, fqdn')
+        assert ret == [['silver', 'rgw2', 'rgw2.ceph'],
+                       ['silver', 'rgw3', 'rgw3.ceph'],
+                       ['gold', 'rgw3', 'rgw3.ceph']]
+
+    def test_from_single_query(self):
+        assigned = {'rgw{}.ceph'.format(i): ['role{}'.format(i)] for i in range(20)}
+        grains = {minion: {'host': minion} for minion in assigned}
+        configurations = ['role{}'.format(i) for i in range(20)]
+        utils = self._utils(configurations, assigned, grains)
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.from_('rgw_configurations', 'rgw', 'host')
+        assert len(ret) == 20
+        assert utils['snapshot.grains'].call_count == 1
+        # master pillar and one batched role query
+        assert utils['snapshot.pillar'].call_count == 2
+
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_from_default_role(self, localclient):
+        assigned = {'rgw1.ceph': ['rgw']}
+        grains = {'rgw1.ceph': {'host': 'rgw1'}}
+        utils = self._utils('', assigned, grains)
+        localclient.return_value.cmd.return_value = {'rgw1.ceph': 'rgw1.ceph'}
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.from_('rgw_configurations', 'rgw', 'host')
+        assert ret == [['rgw', 'rgw1']]
+
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_from_no_minions(self, localclient):
+        utils = self._utils('', {}, {})
+        localclient.return_value.cmd.return_value = {}
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.from_('rgw_configurations', 'rgw', 'host', 'fqdn')
+        assert ret == [[None, None, None]]
+
+
+class TestSelectMinions():
+
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_minions_responding(self, localclient):
+        localclient.return_value.cmd.return_value = {'mon1.ceph': 'mon1.ceph'}
+        utils = {'snapshot.minions': MagicMock(return_value=['mon1.ceph', 'mon2.ceph'])}
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.minions(roles='mon')
+        assert ret == ['mon1.ceph']
+        assert utils['snapshot.minions'].call_count == 0
+
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_minions_cached(self, localclient):
+        utils = {'snapshot.minions': MagicMock(return_value=['mon1.ceph', 'mon2.ceph'])}
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.minions(cached=True, roles='mon')
+        assert ret == ['mon1.ceph', 'mon2.ceph']
+        utils['snapshot.minions'].assert_called_once_with("I@roles:mon")
+        assert localclient.return_value.cmd.call_count == 0
+
+    @patch('salt.client.LocalClient', autospec=True)
+    def test_minions_host_missing_grain(self, localclient):
+        localclient.return_value.cmd.return_value = {'mon1.ceph': 'mon1.ceph',
+                                                     'mon2.ceph': 'mon2.ceph'}
+        utils = {'snapshot.grains': MagicMock(return_value={'mon1.ceph': 'mon1'})}
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.minions(host=True, roles='mon')
+        assert sorted(ret) == ['mon1', 'mon2.ceph']
+
+    def test_attr_host_missing_grain(self):
+        utils = {'snapshot.pillar': MagicMock(return_value={'mon1.ceph': 'a',
+                                                            'mon2.ceph': 'b'}),
+                 'snapshot.grains': MagicMock(return_value={'mon1.ceph': 'mon1'})}
+
+        with patch.object(select, '__utils__', utils, create=True):
+            ret = select.attr(host=True, attr='public_network', roles='mon')
+        assert sorted(ret) == [['mon1', 'a'], ['mon2.ceph', 'b']]
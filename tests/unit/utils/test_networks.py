@@ -0,0 +1,51 @@
+import ipaddress
+from srv.modules.utils import networks
+
+
+class TestClassifier():
+
+    def test_longest_prefix(self):
+        classifier = networks.Classifier(['10.0.0.0/8', '10.1.0.0/16'])
+        assert classifier.network('10.1.2.3') == '10.1.0.0/16'
+        assert classifier.network('10.2.0.1') == '10.0.0.0/8'
+        assert classifier.network('192.168.0.1') is None
+
+    def test_ipv6(self):
+        classifier = networks.Classifier(['fd00::/64', '10.0.0.0/24'])
+        assert classifier.network('fd00::1') == 'fd00::/64'
+        assert classifier.network('fe80::1%eth0') is None
+        assert classifier.network('fd00:0:0:1::1') is None
+
+    def test_invalid_address(self):
+        assert networks.Classifier(['10.0.0.0/24']).network('hostname') is None
+
+    def test_host_bits(self):
+        classifier = networks.Classifier(['10.0.0.5/24'])
+        assert classifier.network('10.0.0.200') == '10.0.0.5/24'
+
+    def test_network_objects(self):
+        network = ipaddress.ip_network(u'10.0.0.0/24')
+        assert networks.Classifier([network]).network('10.0.0.1') is network
+
+
+class TestNetworks():
+
+    def test_classify(self):
+        ret = networks.classify(['10.0.0.1', '10.0.1.1', '127.0.0.1'],
+                                '10.0.0.0/24, 10.0.1.0/24')
+        assert ret == {'10.0.0.1': '10.0.0.0/24', '10.0.1.1': '10.0.1.0/24',
+                       '127.0.0.1': None}
+
+    def test_matching(self):
+        ret = networks.matching([b'10.0.1.1', '10.0.0.1', '10.0.0.2'], '10.0.0.0/24')
+        assert ret == ['10.0.0.1', '10.0.0.2']
+
+    def test_classifier_reused(self):
+        networks._CLASSIFIERS.clear()
+        networks.matching(['10.0.0.1'], '10.0.0.0/24')
+        networks.matching(['10.0.0.2'], '10.0.0.0/24')
+        assert len(networks._CLASSIFIERS) == 1
+
+    def test_interface_network(self):
+        ret = networks.interface_network('10.0.0.5', '255.255.255.0')
+        assert ret == ipaddress.ip_network(u'10.0.0.0/24')
@@ -0,0 +1,67 @@
+from mock import patch
+from srv.modules.utils import snapshot
+
+
+class TestSnapshot():
+
+    @patch('salt.utils.master.MasterPillarUtil', autospec=True)
+    def test_cached_pillar(self, pillarutil):
+        pillarutil.return_value.get_minion_pillar.return_value = {
+            'data1.ceph': {'roles': ['storage']}}
+
+        snap = snapshot.Snapshot({})
+        ret = snap.data('pillar', 'I@roles:storage')
+        assert ret == {'data1.ceph': {'roles': ['storage']}}
+
+    @patch('salt.utils.master.MasterPillarUtil', autospec=True)
+    def test_memoized(self, pillarutil):
+        pillarutil.return_value.get_minion_grains.return_value = {
+            'data1.ceph': {'host': 'data1'}}
+
+        snap = snapshot.Snapshot({})
+        snap.data('grains', 'I@roles:storage')
+        snap.data('grains', 'I@roles:storage')
+        assert pillarutil.return_value.get_minion_grains.call_count == 1
+
+    @patch('salt.utils.master.MasterPillarUtil', autospec=True)
+    def test_expired(self, pillarutil):
+        pillarutil.return_value.get_minion_grains.return_value = {
+            'data1.ceph': {'host': 'data1'}}
+
+        snap = snapshot.Snapshot({}, ttl=0)
+        snap.data('grains', 'I@roles:storage')
+        snap.data('grains', 'I@roles:storage')
+        assert pillarutil.return_value.get_minion_grains.call_count == 2
+
+    @patch('salt.utils.master.MasterPillarUtil', autospec=True)
+    def test_invalidate(self, pillarutil):
+        pillarutil.return_value.get_minion_grains.return_value = {
+            'data1.ceph': {'host': 'data1'}}
+
+        snap = snapshot.Snapshot({})
+        snap.data('grains', 'I@roles:storage')
+        snap.invalidate()
+        snap.data('grains', 'I@roles:storage')
+        assert pillarutil.return_value.get_minion_grains.call_count == 2
+
+    @patch('salt.client.LocalClient', autospec=True)
+    @patch('salt.utils.master.MasterPillarUtil', autospec=True)
+    def test_live_fallback(self, pillarutil, localclient):
+        pillarutil.return_value.get_minion_pillar.return_value = {
+            'data1.ceph': {}}
+        localclient.return_value.cmd.return_value = {
+            'data1.ceph': {'roles': ['storage']}}
+
+        snap = snapshot.Snapshot({})
+        ret = snap.data('pillar', 'I@roles:storage')
+        assert ret == {'data1.ceph': {'roles': ['storage']}}
+        localclient.return_value.cmd.assert_called_with('I@roles:storage',
+                                                        'pillar.items',
+                                                        tgt_type='compound')
+
+    def test_traverse(self):
+        data = {'rgw_configurations': {'rgw': {'users': ['admin']}}}
+        assert snapshot._traverse(data, 'rgw_configurations:rgw:users', '') == ['admin']
+
+    def test_traverse_missing(self):
+        assert snapshot._traverse({}, 'roles', []) == []